@@ -1,92 +1,164 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
 from typing import List, Optional
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from backend.db import engine, async_session, get_async_db  # engine: lo reutilizan los scripts de creación de tablas
+from backend.core.reports.pagination import (
+    MAX_PAGE_SIZE, STREAM_BATCH_ROWS, decode_cursor, encode_cursor, ndjson_response,
+)
+from backend.core.database.call_stats import daily_stats_query, group_by_period
 from backend.db_call_details import Base, CallDetails, Call
 import os
 
-import os
-from backend.config import DATABASE_URL
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-Session = sessionmaker(bind=engine)
-
 router = APIRouter()
 
 from fastapi import Request
 
 @router.get("/llamadas-por-dia")
-def llamadas_por_dia(pin: Optional[str] = Query(None)):
-    session = Session()
-    from sqlalchemy import func
-    q = session.query(Call.date, func.count(Call.id))
-    if pin:
-        q = q.filter(Call.pin_emitter == pin)
-    q = q.group_by(Call.date).order_by(Call.date)
+async def llamadas_por_dia(pin: Optional[str] = Query(None), session: AsyncSession = Depends(get_async_db)):
+    # Del resumen diario (call_stats_daily): no recorre la tabla calls
+    rows = await session.execute(daily_stats_query(pin))
     results = [
-        {"fecha": row[0], "llamadas": row[1]} for row in q.all()
+        {"fecha": row.date, "llamadas": int(row.llamadas)} for row in rows.all()
     ]
-    session.close()
     return results
 
+@router.get("/llamadas-estadisticas")
+async def llamadas_estadisticas(
+    pin: Optional[str] = Query(None),
+    periodo: str = Query("dia", pattern="^(dia|semana|mes)$"),
+    desde: Optional[str] = Query(None, description="Fecha inicial YYYY-MM-DD"),
+    hasta: Optional[str] = Query(None, description="Fecha final YYYY-MM-DD"),
+    session: AsyncSession = Depends(get_async_db),
+):
+    """
+    Llamadas, duración total (segundos) y riesgo máximo por día, semana (desde el lunes) o mes,
+    de un PIN o de todos, leídos del resumen diario
+    """
+    rows = await session.execute(daily_stats_query(pin, desde, hasta))
+    return group_by_period(rows.all(), periodo)
+
 # --- NUEVO ENDPOINT PARA LLAMADAS POR PIN ---
 
+# Caracteres de la transcripción que se leen para el resumen (el texto completo sólo si se pide)
+RESUMEN_CHARS = 200
+
+def _llamadas_query(pin: str, include_transcript: bool, cursor: Optional[str]):
+    """Llamadas de un PIN de la más reciente a la más antigua, con orden estable (fecha, id)"""
+    columns = [
+        Call.id, Call.pin_emitter, Call.date, Call.hora, Call.phone_number, CallDetails.duration,
+        func.substr(CallDetails.transcript, 1, RESUMEN_CHARS).label("resumen"),
+    ]
+    if include_transcript:
+        columns.append(CallDetails.transcript)
+    q = select(*columns).join(CallDetails, Call.id == CallDetails.call_id)
+    q = q.where(Call.pin_emitter == pin)
+    if cursor:
+        fecha, call_id = decode_cursor(cursor, 2)
+        q = q.where(or_(Call.date < fecha, and_(Call.date == fecha, Call.id < call_id)))
+    return q.order_by(Call.date.desc(), Call.id.desc())
+
+def _llamada_item(row, include_transcript: bool) -> dict:
+    # Construir nombre base para archivos
+    base_name = f"{row.pin_emitter}_{row.date}"
+    if row.hora:
+        base_name += f"_{row.hora}"
+    # Buscar archivos en /client/
+    audio_path = f"/client/{base_name}.wav"
+    pdf_path = f"/client/{base_name}.pdf"
+    # Si no existen, poner None
+    audio_url = audio_path if os.path.exists(os.path.abspath(os.path.join(os.path.dirname(__file__), f"../{audio_path}"))) else None
+    pdf_url = pdf_path if os.path.exists(os.path.abspath(os.path.join(os.path.dirname(__file__), f"../{pdf_path}"))) else None
+    # Resumen: usar los primeros 200 caracteres de la transcripción como ejemplo
+    resumen = (row.resumen + "...") if row.resumen else None
+    item = {
+        "id": row.id,
+        "fecha": row.date,
+        "hora": row.hora,
+        "duracion": row.duration,
+        "telefono": row.phone_number,
+        "resumen": resumen,
+        "pdf_url": pdf_url,
+        "audio_url": audio_url
+    }
+    if include_transcript:
+        item["transcripcion"] = row.transcript
+    return item
+
+def _llamada_items(rows, include_transcript: bool) -> List[dict]:
+    """Ítems de una tanda de filas; consulta el disco (wav/pdf): llamarla con run_in_threadpool"""
+    return [_llamada_item(row, include_transcript) for row in rows]
+
 @router.get("/llamadas")
-def get_llamadas_by_pin(pin: str):
-    session = Session()
-    # Buscar llamadas por PIN
-    q = session.query(Call, CallDetails).join(CallDetails, Call.id == CallDetails.call_id)
-    q = q.filter(Call.pin_emitter == pin)
-    q = q.order_by(Call.date.desc())
-    results = []
-    for call, details in q.all():
-        # Construir nombre base para archivos
-        base_name = f"{call.pin_emitter}_{call.date}"
-        if call.hora:
-            base_name += f"_{call.hora}"
-        # Buscar archivos en /client/
-        audio_path = f"/client/{base_name}.wav"
-        pdf_path = f"/client/{base_name}.pdf"
-        # Si no existen, poner None
-        audio_url = audio_path if os.path.exists(os.path.abspath(os.path.join(os.path.dirname(__file__), f"../{audio_path}"))) else None
-        pdf_url = pdf_path if os.path.exists(os.path.abspath(os.path.join(os.path.dirname(__file__), f"../{pdf_path}"))) else None
-        # Resumen: usar los primeros 200 caracteres de la transcripción como ejemplo
-        resumen = (details.transcript[:200] + "...") if details.transcript else None
-        results.append({
-            "id": call.id,
-            "fecha": call.date,
-            "hora": call.hora,
-            "duracion": details.duration,
-            "telefono": call.phone_number,
-            "resumen": resumen,
-            "pdf_url": pdf_url,
-            "audio_url": audio_url
-        })
-    session.close()
-    return JSONResponse(content={"llamadas": results})
+async def get_llamadas_by_pin(
+    pin: str,
+    limit: Optional[int] = Query(None, gt=0, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    include_transcript: bool = Query(False),
+    formato: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+):
+    """
+    Llamadas de un PIN, de la más reciente a la más antigua.
+    Sin `limit` devuelve todas; con `limit` devuelve una página y `next_cursor` para pedir la
+    siguiente con `cursor`. `include_transcript=true` agrega el texto completo de la transcripción
+    (por defecto sólo se lee el resumen). `format=ndjson` transmite una llamada por línea y, con
+    `limit`, una última línea {"next_cursor": ...}.
+    """
+    q = _llamadas_query(pin, include_transcript, cursor)
+    if formato == "ndjson":
+        if limit:
+            q = q.limit(limit + 1)
+
+        async def items():
+            # Sesión propia: la respuesta se sigue escribiendo después de que termina el endpoint.
+            # Los ítems de cada tanda se arman fuera del event loop (verifican wav/pdf en disco)
+            async with async_session() as stream_session:
+                result = await stream_session.stream(q.execution_options(yield_per=STREAM_BATCH_ROWS))
+                async for rows in result.partitions():
+                    for item in await run_in_threadpool(_llamada_items, rows, include_transcript):
+                        yield item
+
+        return ndjson_response(items(), limit=limit,
+                               cursor_of=lambda item: encode_cursor(item["fecha"], item["id"]))
+
+    # Sin Depends(get_async_db): la ruta NDJSON no la usaría y retendría una conexión del pool
+    async with async_session() as session:
+        if limit:
+            rows = (await session.execute(q.limit(limit + 1))).all()
+            page = rows[:limit]
+            next_cursor = encode_cursor(page[-1].date, page[-1].id) if len(rows) > limit else None
+        else:
+            page = (await session.execute(q)).all()
+            next_cursor = None
+    content = {"llamadas": await run_in_threadpool(_llamada_items, page, include_transcript)}
+    if limit:
+        content["next_cursor"] = next_cursor
+    return JSONResponse(content=content)
 
 @router.get("/api/calls/enriched")
-def get_enriched_calls(
+async def get_enriched_calls(
     pin_emitter: Optional[str] = Query(None),
     phone_number: Optional[str] = Query(None),
     min_risk: Optional[int] = Query(None),
     max_risk: Optional[int] = Query(None),
     limit: int = Query(50, gt=0, le=200),
+    session: AsyncSession = Depends(get_async_db),
 ):
-    session = Session()
-    q = session.query(Call, CallDetails).join(CallDetails, Call.id == CallDetails.call_id)
+    q = select(Call, CallDetails).join(CallDetails, Call.id == CallDetails.call_id)
     if pin_emitter:
-        q = q.filter(Call.pin_emitter == pin_emitter)
+        q = q.where(Call.pin_emitter == pin_emitter)
     if phone_number:
-        q = q.filter(Call.phone_number == phone_number)
+        q = q.where(Call.phone_number == phone_number)
     if min_risk is not None:
-        q = q.filter(CallDetails.risk_level >= min_risk)
+        q = q.where(CallDetails.risk_level >= min_risk)
     if max_risk is not None:
-        q = q.filter(CallDetails.risk_level <= max_risk)
+        q = q.where(CallDetails.risk_level <= max_risk)
     q = q.order_by(CallDetails.created_at.desc()).limit(limit)
 
     results = []
-    for call, details in q.all():
+    for call, details in (await session.execute(q)).all():
         results.append({
             "id": call.id,
             "pin_emitter": call.pin_emitter,
@@ -101,5 +173,4 @@ def get_enriched_calls(
             "risk_factors": details.risk_factors,
             "created_at": details.created_at,
         })
-    session.close()
     return {"calls": results}
@@ -1,23 +1,35 @@
-from bertopic import BERTopic
-from transformers import pipeline
-import spacy
-import nltk
-# Asegura que el recurso 'punkt' esté disponible
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-from nltk.tokenize import sent_tokenize
+from backend.core.model_registry import get_model_registry
 
-# Load models
-nlp = spacy.load("en_core_web_sm")
-summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
+SUMMARIZER_MODEL_NAME = "facebook/bart-large-cnn"
+
+def _load_summarizer():
+    from transformers import pipeline
+    return pipeline("summarization", model=SUMMARIZER_MODEL_NAME)
+
+# Los modelos se cargan al primer reporte, no al importar el router
+get_model_registry().register(f"summarizer:{SUMMARIZER_MODEL_NAME}", _load_summarizer)
+
+_punkt_ready = False
+
+def _sent_tokenize(text: str):
+    global _punkt_ready
+    import nltk
+    # Asegura que el recurso 'punkt' esté disponible (sólo se comprueba la primera vez)
+    if not _punkt_ready:
+        try:
+            nltk.data.find('tokenizers/punkt')
+        except LookupError:
+            nltk.download('punkt')
+        _punkt_ready = True
+    from nltk.tokenize import sent_tokenize
+    return sent_tokenize(text)
 
 # Function to extract main topic
 def extract_main_topic(transcription_text: str) -> str:
-    sentences = sent_tokenize(transcription_text)
+    sentences = _sent_tokenize(transcription_text)
     if len(sentences) < 2:
         return "Tema no identificado"
+    from bertopic import BERTopic
     topic_model = BERTopic()
     topics, _ = topic_model.fit_transform(sentences)
     main_topic = topic_model.get_topic(topics[0])
@@ -27,6 +39,7 @@ def extract_main_topic(transcription_text: str) -> str:
 
 # Function to summarize text
 def summarize_text(transcription_text: str) -> str:
+    summarizer = get_model_registry().get(f"summarizer:{SUMMARIZER_MODEL_NAME}")
     chunks = [transcription_text[i:i+1000] for i in range(0, len(transcription_text), 1000)]
     summaries = [summarizer(chunk, max_length=100, min_length=25, do_sample=False)[0]['summary_text'] for chunk in chunks]
     return " ".join(summaries)
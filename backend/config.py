@@ -6,8 +6,124 @@ load_dotenv()
 
 # Configuración centralizada
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///backend/transcripts.db")
+# URL del motor asíncrono; vacía = la misma DATABASE_URL con el driver async
+# (sqlite -> aiosqlite, postgresql -> asyncpg, mysql -> aiomysql)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+# Pool de conexiones compartido por todos los routers
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Aplicar al arrancar las migraciones pendientes del esquema (backend/core/database/migrations.py)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
 JWT_SECRET = os.getenv("JWT_SECRET", "super-secret-key")
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")  # Obligatoria para cifrado
 AUDIO_UPLOAD_DIR = os.getenv("AUDIO_UPLOAD_DIR", "./secure_audio")
 
+# Pool de inferencia Whisper para /stream/fragment
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL_NAME", "base")
+# Backend de inferencia: torch (fp32 en CPU), torch-int8 (cuantización dinámica) o
+# faster-whisper (CTranslate2, WHISPER_COMPUTE_TYPE: int8, int8_float32, float16...)
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "torch").lower()
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+WHISPER_QUEUE_SIZE = int(os.getenv("WHISPER_QUEUE_SIZE", "32"))
+# Micro-batching: fragmentos por lote y ventana de espera para agruparlos
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+WHISPER_BATCH_WINDOW_MS = int(os.getenv("WHISPER_BATCH_WINDOW_MS", "100"))
+# Guardar el WAV crudo de cada fragmento en TRANSCRIPTS_DIR (en segundo plano)
+PERSIST_FRAGMENT_AUDIO = os.getenv("PERSIST_FRAGMENT_AUDIO", "true").lower() in ("1", "true", "yes")
+
+# Segunda pasada con un modelo más grande sólo para fragmentos con frases de riesgo o con
+# confianza baja (avg_logprob promedio menor al umbral); modelo vacío la desactiva
+WHISPER_REPASS_MODEL = os.getenv("WHISPER_REPASS_MODEL", "small")
+WHISPER_REPASS_WORKERS = int(os.getenv("WHISPER_REPASS_WORKERS", "1"))
+WHISPER_REPASS_QUEUE_SIZE = int(os.getenv("WHISPER_REPASS_QUEUE_SIZE", "16"))
+REPASS_LOGPROB_THRESHOLD = float(os.getenv("REPASS_LOGPROB_THRESHOLD", "-0.8"))
+
+# Sesiones de transcripción continua por llamada (/stream/session)
+# Audio nuevo acumulado antes de decodificar, cola de la ventana que se vuelve a decodificar
+# en la siguiente pasada, texto previo usado como prompt y expiración de sesiones inactivas
+STREAM_DECODE_SECONDS = float(os.getenv("STREAM_DECODE_SECONDS", "5"))
+STREAM_OVERLAP_SECONDS = float(os.getenv("STREAM_OVERLAP_SECONDS", "1.5"))
+STREAM_PROMPT_CHARS = int(os.getenv("STREAM_PROMPT_CHARS", "200"))
+STREAM_SESSION_TTL_SECONDS = float(os.getenv("STREAM_SESSION_TTL_SECONDS", "300"))
+
+# Detección de voz antes de transcribir: umbral absoluto de energía (dBFS), agresividad de
+# webrtcvad (0-3, si está instalado), margen alrededor de la voz y duración mínima de voz (ms)
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() in ("1", "true", "yes")
+VAD_ENERGY_DB = float(os.getenv("VAD_ENERGY_DB", "-45"))
+VAD_AGGRESSIVENESS = int(os.getenv("VAD_AGGRESSIVENESS", "2"))
+VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", "200"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "250"))
+
+# Transcripción por lotes (batch_transcribe.py): procesos (0 = núcleos / hilos por proceso),
+# hilos de torch por proceso, reintentos por archivo y manifiesto de archivos ya transcritos
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "0"))
+BATCH_THREADS_PER_WORKER = int(os.getenv("BATCH_THREADS_PER_WORKER", "2"))
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", "2"))
+BATCH_MANIFEST_PATH = os.getenv(
+    "BATCH_MANIFEST_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_manifest.jsonl")
+)
+
+# Caché de resultados de transcripción por hash del audio + modelo + idioma + opciones
+TRANSCRIPTION_CACHE_ENABLED = os.getenv("TRANSCRIPTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TRANSCRIPTION_CACHE_DB_PATH = os.getenv(
+    "TRANSCRIPTION_CACHE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcription_cache.db")
+)
+TRANSCRIPTION_CACHE_MAX_MB = float(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", "512"))
+
+# Detector de frases de riesgo: stemming ligero de plurales/género al comparar palabras
+RISK_MATCHER_STEMMING = os.getenv("RISK_MATCHER_STEMMING", "false").lower() in ("1", "true", "yes")
+
+# Base SQLite principal (llamadas, catálogo de transcripciones)
+TRANSCRIPTS_DB_PATH = os.getenv(
+    "TRANSCRIPTS_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcripts.db")
+)
+# Conexiones SQLite (backend/core/database/sqlite_setup.py): espera ante bloqueos, sincronía del
+# WAL y memoria mapeada por conexión (bytes; 0 la desactiva)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Hilo escritor único por base: escrituras por transacción (se agrupan las que esperan en la cola
+# mientras se confirma el lote anterior) y espera opcional para juntar más
+SQLITE_WRITER_BATCH_SIZE = int(os.getenv("SQLITE_WRITER_BATCH_SIZE", "200"))
+SQLITE_WRITER_WINDOW_MS = int(os.getenv("SQLITE_WRITER_WINDOW_MS", "0"))
+# Segundos entre revisiones del directorio de transcripciones cuando no hay watchdog
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "5"))
+
+# Caché persistente de texto extraído de reportes PDF
+PDF_CACHE_DB_PATH = os.getenv(
+    "PDF_CACHE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdf_text_cache.db")
+)
+
+# Asistente LLM local (Ollama) y recuperación de contexto para /api/ollama/query
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "300"))
+# Palabras por fragmento de transcripción y solapamiento entre fragmentos consecutivos
+RAG_CHUNK_WORDS = int(os.getenv("RAG_CHUNK_WORDS", "120"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "20"))
+# Fragmentos candidatos y presupuesto aproximado de tokens del contexto enviado al modelo
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "12"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "3000"))
+# Reordenar candidatos con embeddings (paraphrase-multilingual-MiniLM-L12-v2) además de BM25
+RAG_USE_EMBEDDINGS = os.getenv("RAG_USE_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+
+# Registro de modelos: presupuesto de memoria (MB, 0 = sin límite) y expulsión por inactividad (s, 0 = nunca)
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "4096"))
+MODEL_IDLE_TTL_SECONDS = float(os.getenv("MODEL_IDLE_TTL_SECONDS", "1800"))
+# Tras una carga fallida no se reintenta durante este tiempo (s, 0 = reintentar en cada petición)
+MODEL_FAILURE_TTL_SECONDS = float(os.getenv("MODEL_FAILURE_TTL_SECONDS", "300"))
+
+# Análisis IA por lotes (/analyze/transcription): textos por lote de spaCy y del pipeline de sentimiento
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", "64"))
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "16"))
+
+# Perfilado de arranque: árbol de tiempos de import, carga de modelos y primera petición
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+STARTUP_PROFILE_PATH = os.getenv(
+    "STARTUP_PROFILE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_profile.json")
+)
+
 # Puedes agregar aquí otras variables de entorno necesarias, por ejemplo SMTP, GCS, etc.
@@ -1,6 +1,14 @@
-from transformers import pipeline
 from typing import Dict, Any, List
 import re
+from backend.core.model_registry import get_model_registry
+
+SENTIMENT_MODEL_NAME = 'distilbert-base-uncased'
+
+def _load_sentiment_pipeline():
+    from transformers import pipeline
+    return pipeline('sentiment-analysis', model=SENTIMENT_MODEL_NAME)
+
+get_model_registry().register(f"sentiment:{SENTIMENT_MODEL_NAME}", _load_sentiment_pipeline)
 
 class ContentAnalyzer:
     def __init__(self):
@@ -24,9 +32,11 @@ class ContentAnalyzer:
                 r'(?i)burner|phone|secure|encrypted'
             ]
         }
-        
-        # Initialize sentiment analysis
-        self.sentiment = pipeline('sentiment-analysis', model='distilbert-base-uncased')
+
+    @property
+    def sentiment(self):
+        """Sentiment pipeline, loaded from the model registry on first use"""
+        return get_model_registry().get(f"sentiment:{SENTIMENT_MODEL_NAME}")
     
     def analyze_conversation(self, text: str) -> Dict[str, Any]:
         """Analyze conversation content for risks"""
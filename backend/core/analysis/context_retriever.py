@@ -0,0 +1,215 @@
+"""
+Recuperación de contexto para el asistente LLM de SENTINELA
+En lugar de concatenar el texto completo de todos los reportes que coinciden con la pregunta,
+selecciona los fragmentos más relevantes del índice de búsqueda (BM25 de FTS5 y, opcionalmente,
+embeddings paraphrase-multilingual-MiniLM-L12-v2) hasta llenar un presupuesto de tokens.
+"""
+
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from backend.config import RAG_TOP_K, RAG_CONTEXT_TOKENS, RAG_USE_EMBEDDINGS
+from backend.core.analysis.text_normalizer import normalize_token, TOKEN_RE
+from backend.core.model_registry import get_model_registry
+from backend.core.reports.search_index import get_search_index
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+
+MESES = {
+    "enero": "01", "febrero": "02", "marzo": "03", "abril": "04", "mayo": "05", "junio": "06",
+    "julio": "07", "agosto": "08", "septiembre": "09", "octubre": "10", "noviembre": "11", "diciembre": "12",
+}
+
+# Nombres y alias que el asistente reconocía como filtro explícito
+NOMBRES_CONOCIDOS = re.compile(
+    r"(Juan|María|Pedro|Pérez|López|Doña Mari|El Chino|El Ingeniero|El Primo|La Tía|La Güera)", re.IGNORECASE
+)
+
+# Palabras vacías que no aportan a la búsqueda (ya normalizadas: minúsculas y sin acentos)
+STOPWORDS = {
+    "a", "al", "algo", "algun", "alguna", "alguno", "ante", "como", "con", "cual", "cuales", "cuando",
+    "cuanto", "cuantos", "de", "del", "desde", "donde", "dos", "el", "ella", "ellos", "en", "entre", "era",
+    "es", "esa", "ese", "eso", "esta", "estan", "este", "esto", "fue", "fueron", "ha", "habia", "han", "hay",
+    "hazme", "la", "las", "le", "les", "llamada", "llamadas", "lo", "los", "me", "mi", "muy", "no", "nos",
+    "o", "para", "pero", "por", "que", "quien", "quienes", "se", "ser", "si", "sin", "sobre", "son", "su",
+    "sus", "te", "tiene", "todo", "todos", "tu", "un", "una", "uno", "unos", "y", "ya", "dame", "dime",
+    "pin", "ano", "mes", "dia", "reporte", "reportes", "telefono", "numero",
+} | set(MESES)
+
+YEAR_RE = re.compile(r"\b(20\d{2})\b")
+ISO_DATE_RE = re.compile(r"\b(20\d{2})-(\d{2})-(\d{2})\b")
+DAY_MONTH_RE = re.compile(r"\b(3[01]|[12]\d|0?[1-9])\s+de\s+(" + "|".join(MESES) + r")\b", re.IGNORECASE)
+MONTH_RE = re.compile(r"\b(" + "|".join(MESES) + r")\b", re.IGNORECASE)
+PHONE_RE = re.compile(r"\+?\d{10,}")
+NUMBER_RE = re.compile(r"\b\d{3,}\b")
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación de tokens del LLM (~4 caracteres por token)"""
+    return max(1, len(text) // 4)
+
+
+def parse_query_filters(prompt: str) -> Dict[str, Any]:
+    """Criterios explícitos de la pregunta: PIN, fecha (año/mes/día), teléfono y nombre"""
+    filters: Dict[str, Any] = {"pin": None, "year": None, "month": None, "day": None,
+                               "phone": None, "name": None, "labels": []}
+    iso = ISO_DATE_RE.search(prompt)
+    if iso:
+        filters["year"], filters["month"], filters["day"] = iso.groups()
+    else:
+        year = YEAR_RE.search(prompt)
+        if year:
+            filters["year"] = year.group(1)
+        day_month = DAY_MONTH_RE.search(prompt)
+        month = day_month or MONTH_RE.search(prompt)
+        if month:
+            month = month.group(2) if day_month else month.group(1)
+            filters["month"] = MESES[month.lower()]
+        if day_month:
+            filters["day"] = day_month.group(1).zfill(2)
+    phone = PHONE_RE.search(prompt)
+    if phone:
+        filters["phone"] = phone.group(0).lstrip("+")
+    # El PIN es el primer número de 3+ dígitos que no es el año ni el teléfono
+    for m in NUMBER_RE.finditer(ISO_DATE_RE.sub(" ", prompt)):
+        number = m.group(0)
+        if number != filters["year"] and not (filters["phone"] and number in filters["phone"]):
+            filters["pin"] = number
+            break
+    name = NOMBRES_CONOCIDOS.search(prompt)
+    if name:
+        filters["name"] = name.group(0)
+
+    for key, label in (("pin", "PIN"), ("year", "año"), ("month", "mes"), ("day", "día"),
+                       ("phone", "teléfono"), ("name", "nombre")):
+        if filters[key]:
+            filters["labels"].append(f"{label} {filters[key]}")
+    return filters
+
+
+def date_pattern(filters: Dict[str, Any]) -> Optional[str]:
+    """Patrón LIKE de fecha YYYY-MM-DD con '_' en las partes no especificadas"""
+    if not (filters["year"] or filters["month"] or filters["day"]):
+        return None
+    return f"{filters['year'] or '____'}-{filters['month'] or '__'}-{filters['day'] or '__'}"
+
+
+def query_terms(prompt: str) -> List[str]:
+    """Términos de búsqueda de la pregunta (sin palabras vacías ni números de filtro)"""
+    terms = []
+    for token in TOKEN_RE.findall(prompt):
+        norm = normalize_token(token)
+        if len(norm) < 3 or norm in STOPWORDS or norm.isdigit() or norm in terms:
+            continue
+        terms.append(norm)
+    return terms
+
+
+def _load_embedder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+get_model_registry().register(f"sentence-transformer:{EMBEDDING_MODEL_NAME}", _load_embedder)
+
+
+def _get_embedder():
+    """SentenceTransformer compartido del registro de modelos (None si no se puede cargar)"""
+    try:
+        return get_model_registry().get(f"sentence-transformer:{EMBEDDING_MODEL_NAME}")
+    except Exception as e:
+        logger.warning(f"⚠️ Embeddings no disponibles, se usa sólo BM25: {e}")
+        return None
+
+
+class ContextRetriever:
+    """Selecciona los fragmentos de transcripción más relevantes para una pregunta"""
+
+    def __init__(self, top_k: int = RAG_TOP_K, token_budget: int = RAG_CONTEXT_TOKENS,
+                 use_embeddings: bool = RAG_USE_EMBEDDINGS):
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.use_embeddings = use_embeddings
+
+    def _rerank(self, prompt: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Combinar BM25 normalizado con la similitud coseno de los embeddings"""
+        embedder = _get_embedder()
+        if embedder is None or len(candidates) < 2:
+            return candidates
+        vectors = embedder.encode([prompt] + [c["body"] for c in candidates], normalize_embeddings=True)
+        similarities = vectors[1:] @ vectors[0]
+        max_score = max(c["score"] for c in candidates) or 1.0
+        for candidate, similarity in zip(candidates, similarities):
+            candidate["score"] = 0.5 * (candidate["score"] / max_score) + 0.5 * float(similarity)
+        return sorted(candidates, key=lambda c: c["score"], reverse=True)
+
+    def retrieve(self, prompt: str, directory: str) -> Dict[str, Any]:
+        """
+        Contexto para la pregunta dentro del presupuesto de tokens.
+        Devuelve {"context", "filtros", "chunks", "tokens"}; "context" queda vacío si no hay coincidencias.
+        """
+        index = get_search_index()
+        index.sync(directory)
+        filters = parse_query_filters(prompt)
+        terms = query_terms(prompt)
+        search = dict(
+            pin=filters["pin"], date_like=date_pattern(filters), phone=filters["phone"],
+            required_phrases=[filters["name"]] if filters["name"] else [], limit=self.top_k * 4,
+        )
+        candidates = []
+        if terms:
+            candidates = index.chunk_candidates(" OR ".join(f'"{t}"' for t in terms), **search)
+        if not candidates:
+            # Preguntas sin términos de contenido ("resumen del 10 de abril"): lo más reciente del filtro
+            candidates = index.chunk_candidates(None, **search)
+        if self.use_embeddings and terms:
+            candidates = self._rerank(prompt, candidates)
+
+        selected, used = [], 0
+        for chunk in candidates:
+            cost = estimate_tokens(chunk["body"])
+            if used + cost > self.token_budget:
+                continue
+            selected.append(chunk)
+            used += cost
+            if len(selected) >= self.top_k:
+                break
+        return {
+            "context": self.format_context(selected),
+            "filtros": filters["labels"],
+            "chunks": selected,
+            "tokens": used,
+        }
+
+    @staticmethod
+    def format_context(chunks: List[Dict[str, Any]]) -> str:
+        """Agrupar los fragmentos por documento, en orden cronológico"""
+        parts = []
+        current_doc = None
+        last_seq = None
+        for chunk in sorted(chunks, key=lambda c: (c["date"] or "", c["time"] or "", c["doc_id"], c["seq"])):
+            if chunk["doc_id"] != current_doc:
+                source = os.path.basename(chunk["path"]) if chunk["path"] else f"llamada con {chunk['phone'] or 'número desconocido'}"
+                parts.append(f"\n--- {source} | PIN {chunk['pin'] or '?'} | {chunk['date'] or ''} "
+                             f"{chunk['time'] or ''} ---")
+                current_doc, last_seq = chunk["doc_id"], None
+            elif last_seq is not None and chunk["seq"] != last_seq + 1:
+                parts.append("[…]")
+            parts.append(chunk["body"])
+            last_seq = chunk["seq"]
+        return "\n".join(parts).strip()
+
+
+_context_retriever_instance: Optional[ContextRetriever] = None
+
+
+def get_context_retriever() -> ContextRetriever:
+    """Obtener instancia única del recuperador de contexto"""
+    global _context_retriever_instance
+    if _context_retriever_instance is None:
+        _context_retriever_instance = ContextRetriever()
+    return _context_retriever_instance
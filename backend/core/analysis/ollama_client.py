@@ -0,0 +1,77 @@
+"""
+Cliente HTTP de Ollama para SENTINELA
+Reutiliza una sola requests.Session con pool de conexiones hacia el servidor local del LLM
+y permite obtener la respuesta completa o ir recibiéndola por partes (stream).
+"""
+
+import json
+import logging
+import threading
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.config import OLLAMA_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaClient:
+    """Cliente de /api/generate con sesión HTTP compartida"""
+
+    def __init__(self, base_url: str = OLLAMA_URL, model: str = OLLAMA_MODEL,
+                 timeout: float = OLLAMA_TIMEOUT, pool_size: int = 8):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, prompt: str, stream: bool) -> requests.Response:
+        response = self.session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model, "prompt": prompt, "stream": stream},
+            # (conexión, lectura): la lectura espera a que el modelo genere
+            timeout=(5, self.timeout),
+            stream=stream,
+        )
+        response.raise_for_status()
+        return response
+
+    def generate(self, prompt: str) -> str:
+        """Respuesta completa del modelo"""
+        return self._post(prompt, stream=False).json().get("response", "")
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """Partes de la respuesta a medida que el modelo las genera (NDJSON de Ollama)"""
+        with self._post(prompt, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
+
+    def close(self):
+        self.session.close()
+
+
+_ollama_client_instance: Optional[OllamaClient] = None
+_instance_lock = threading.Lock()
+
+
+def get_ollama_client() -> OllamaClient:
+    """Obtener instancia única del cliente de Ollama"""
+    global _ollama_client_instance
+    if _ollama_client_instance is None:
+        with _instance_lock:
+            if _ollama_client_instance is None:
+                _ollama_client_instance = OllamaClient()
+    return _ollama_client_instance
@@ -0,0 +1,176 @@
+"""
+Detector de frases de riesgo para SENTINELA
+Autómata Aho–Corasick compilado una sola vez a partir de risk_phrases_corrected.json:
+encuentra todas las frases (con posición y categoría) en una sola pasada lineal sobre el texto,
+sin importar cuántas frases tenga el diccionario.
+El autómata trabaja sobre tokens normalizados (sin acentos, minúsculas, stemming opcional),
+por lo que las frases sólo coinciden con palabras completas.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from backend.config import RISK_MATCHER_STEMMING
+from backend.core.analysis.text_normalizer import normalize_phrase, tokenize
+
+RISK_PHRASES_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "data", "risk_phrases_corrected.json")
+)
+DEFAULT_PHRASES_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "..", "config", "frases_peligrosas.json")
+)
+
+DEFAULT_CATEGORY = "general"
+
+PhraseInput = Union[str, Tuple[str, str]]
+
+
+def load_risk_phrases(path: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Cargar frases como pares (frase, categoría).
+    Acepta el formato {"flat": [...], "categories": {...}} o una lista simple de frases.
+    """
+    if path is None:
+        path = RISK_PHRASES_PATH if os.path.exists(RISK_PHRASES_PATH) else DEFAULT_PHRASES_PATH
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return [(phrase, DEFAULT_CATEGORY) for phrase in data]
+    pairs = []
+    seen = set()
+    for category, phrases in data.get("categories", {}).items():
+        for phrase in phrases:
+            pairs.append((phrase, category))
+            seen.add(normalize_phrase(phrase))
+    for phrase in data.get("flat", []):
+        if normalize_phrase(phrase) not in seen:
+            pairs.append((phrase, DEFAULT_CATEGORY))
+    return pairs
+
+
+class PhraseMatcher:
+    """Autómata Aho–Corasick sobre tokens normalizados (coincidencia por palabras completas)"""
+
+    def __init__(self, phrases: Iterable[PhraseInput], stem: bool = False):
+        self.stem = stem
+        self.phrases: List[str] = []
+        self.categories: List[str] = []
+        self._lengths: List[int] = []
+        # goto[estado] -> {token: estado}; fail y out_link forman el autómata
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._out_link: List[int] = [0]
+        index: Dict[Tuple[str, ...], int] = {}
+        for item in phrases:
+            phrase, category = (item, DEFAULT_CATEGORY) if isinstance(item, str) else item
+            key = normalize_phrase(phrase, stem)
+            if not key or key in index:
+                continue
+            index[key] = len(self.phrases)
+            self.phrases.append(phrase.strip())
+            self.categories.append(category)
+            self._lengths.append(len(key))
+            self._insert(key, index[key])
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def _insert(self, key: Tuple[str, ...], phrase_id: int):
+        state = 0
+        for token in key:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._out_link.append(0)
+                self._goto[state][token] = nxt
+            state = nxt
+        self._out[state].append(phrase_id)
+
+    def _build(self):
+        """Calcular enlaces de fallo y de salida en recorrido BFS"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                fail_state = self._fail[nxt]
+                self._out_link[nxt] = fail_state if self._out[fail_state] else self._out_link[fail_state]
+
+    def find_all(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Todas las ocurrencias en el texto, ordenadas por posición.
+        Cada resultado: {"phrase", "category", "text", "start", "end"}; las posiciones
+        y "text" corresponden al texto original tal como llegó.
+        """
+        matches = []
+        if not text or not self.phrases:
+            return matches
+        tokens = tokenize(text, self.stem)
+        goto, fail, out, out_link = self._goto, self._fail, self._out, self._out_link
+        state = 0
+        for pos, (token, _, end) in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            hit = state if out[state] else out_link[state]
+            while hit:
+                for phrase_id in out[hit]:
+                    start = tokens[pos - self._lengths[phrase_id] + 1][1]
+                    matches.append({
+                        "phrase": self.phrases[phrase_id],
+                        "category": self.categories[phrase_id],
+                        "text": text[start:end],
+                        "start": start,
+                        "end": end,
+                    })
+                hit = out_link[hit]
+        matches.sort(key=lambda m: (m["start"], -m["end"]))
+        return matches
+
+    def matched_phrases(self, text: str) -> List[str]:
+        """Frases distintas encontradas, en orden de primera aparición"""
+        seen = {}
+        for match in self.find_all(text):
+            seen.setdefault(match["phrase"], None)
+        return list(seen)
+
+
+_risk_matcher: Optional[PhraseMatcher] = None
+_risk_matcher_lock = threading.Lock()
+
+
+def get_risk_matcher() -> PhraseMatcher:
+    """Obtener el autómata compartido de frases de riesgo (se compila la primera vez)"""
+    global _risk_matcher
+    matcher = _risk_matcher
+    if matcher is None:
+        with _risk_matcher_lock:
+            if _risk_matcher is None:
+                _risk_matcher = PhraseMatcher(load_risk_phrases(), stem=RISK_MATCHER_STEMMING)
+            matcher = _risk_matcher
+    return matcher
+
+
+def reload_risk_matcher(phrases: Optional[Iterable[PhraseInput]] = None) -> PhraseMatcher:
+    """
+    Recompilar el autómata y reemplazarlo de forma atómica.
+    Las búsquedas en curso terminan con la versión anterior; las nuevas usan la recién compilada.
+    """
+    global _risk_matcher
+    matcher = PhraseMatcher(load_risk_phrases() if phrases is None else phrases, stem=RISK_MATCHER_STEMMING)
+    with _risk_matcher_lock:
+        _risk_matcher = matcher
+    return matcher
@@ -0,0 +1,59 @@
+"""
+Normalización de texto en español para SENTINELA
+Tokeniza conservando las posiciones originales y normaliza cada token: plegado de acentos (NFKD),
+minúsculas y, opcionalmente, un stemming ligero de plurales y género. Así "levantón", "Levanton"
+y "levantones" producen el mismo token y las frases se comparan por palabras completas.
+"""
+
+import re
+import unicodedata
+from typing import List, Tuple
+
+# Letras/dígitos incluyendo marcas combinantes (texto que llega en forma NFD)
+TOKEN_RE = re.compile(r"(?:[^\W_]|[\u0300-\u036f])+")
+
+_COMBINING_TILDE = "\u0303"
+
+# Sufijos que el stemming ligero elimina (plural primero, luego género)
+_PLURAL_SUFFIXES = ("es", "s")
+_GENDER_SUFFIXES = ("a", "o")
+_MIN_STEM_LENGTH = 4
+
+
+def fold_accents(token: str) -> str:
+    """Quitar acentos y diéresis (NFKD) conservando la ñ, que en español distingue palabras"""
+    decomposed = unicodedata.normalize("NFKD", token)
+    folded = []
+    for i, char in enumerate(decomposed):
+        if unicodedata.combining(char):
+            if char == _COMBINING_TILDE and i and decomposed[i - 1] in "nN":
+                folded[-1] = "ñ" if decomposed[i - 1] == "n" else "Ñ"
+            continue
+        folded.append(char)
+    return "".join(folded)
+
+
+def light_stem(token: str) -> str:
+    """Stemming ligero para español: plurales (-es, -s) y género (-a, -o)"""
+    for suffix in _PLURAL_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM_LENGTH:
+            token = token[: -len(suffix)]
+            break
+    if token.endswith(_GENDER_SUFFIXES) and len(token) - 1 >= _MIN_STEM_LENGTH:
+        token = token[:-1]
+    return token
+
+
+def normalize_token(token: str, stem: bool = False) -> str:
+    token = fold_accents(token).lower()
+    return light_stem(token) if stem else token
+
+
+def tokenize(text: str, stem: bool = False) -> List[Tuple[str, int, int]]:
+    """Tokens normalizados como (token, inicio, fin), con posiciones sobre el texto original"""
+    return [(normalize_token(m.group(), stem), m.start(), m.end()) for m in TOKEN_RE.finditer(text)]
+
+
+def normalize_phrase(phrase: str, stem: bool = False) -> Tuple[str, ...]:
+    """Secuencia de tokens normalizados de una frase del diccionario"""
+    return tuple(token for token, _, _ in tokenize(phrase, stem))
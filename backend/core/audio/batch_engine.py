@@ -0,0 +1,334 @@
+"""
+Motor de transcripción por lotes para SENTINELA
+Transcribe directorios completos de audio en un pool de procesos dimensionado a los núcleos
+disponibles (un modelo Whisper por proceso). Un manifiesto JSONL registra cada archivo por su
+hash SHA-256, así una nueva corrida salta lo ya transcrito aunque el archivo se haya movido o
+renombrado, y un corte a mitad de la noche se reanuda donde quedó. Los fallos se reintentan y el
+progreso se informa en archivos/min y horas de audio por hora.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from backend.config import (
+    WHISPER_MODEL_NAME, WHISPER_BACKEND, BATCH_WORKERS, BATCH_THREADS_PER_WORKER, BATCH_RETRIES, BATCH_MANIFEST_PATH,
+)
+from backend.core.audio import inference_pool
+from backend.core.audio.pcm import SAMPLE_RATE
+from backend.core.audio.transcription_cache import audio_hash, get_transcription_cache
+from backend.core.audio.vad import get_vad
+from backend.core.audio.whisper_backends import backend_label, load_audio
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".flac", ".m4a")
+# Segundos entre líneas de progreso
+PROGRESS_INTERVAL = 30.0
+
+
+def available_cpus() -> int:
+    """Núcleos que este proceso puede usar (respeta afinidad/cgroups en Linux)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers(threads_per_worker: int = BATCH_THREADS_PER_WORKER) -> int:
+    if BATCH_WORKERS > 0:
+        return BATCH_WORKERS
+    return max(1, available_cpus() // max(1, threads_per_worker))
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discover_audio(paths: Iterable[str], recursive: bool = True) -> List[str]:
+    """Archivos de audio en las rutas dadas (archivos sueltos o directorios), en orden estable"""
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            found.append(os.path.abspath(path))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            found.extend(os.path.abspath(os.path.join(root, f)) for f in sorted(files)
+                         if f.lower().endswith(AUDIO_EXTENSIONS))
+            if not recursive:
+                break
+    return found
+
+
+def _init_batch_worker(model_name: str, backend: str, threads: int):
+    """Inicializador de cada proceso: carga el modelo limitado a `threads` hilos"""
+    inference_pool._init_worker(model_name, backend=backend, cpu_threads=max(1, threads))
+
+
+def _transcribe_file_job(path: str, model_name: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Transcribe un archivo dentro del proceso worker; incluye la duración del audio.
+    Igual que /stream/fragment: sin voz no se decodifica, se recortan los silencios de los bordes
+    y se consulta la caché de transcripciones por el hash del audio recortado.
+    """
+    audio = load_audio(path)
+    duration = len(audio) / SAMPLE_RATE
+    speech = get_vad().trim(audio)
+    if speech is None:
+        return {"text": "", "language": "", "segments": [], "duration": duration}
+    cache = get_transcription_cache()
+    digest = audio_hash(speech)
+    result = cache.get(digest, model_name, options)
+    if result is None:
+        result = inference_pool._transcribe_job(speech, options)
+        cache.put(digest, model_name, options, result)
+    result["duration"] = duration
+    return result
+
+
+class BatchManifest:
+    """
+    Manifiesto JSONL de solo-anexar: una línea por archivo terminado o fallido.
+    La clave es (sha256, modelo, opciones); la última línea de cada clave es la vigente.
+    """
+
+    def __init__(self, path: str = BATCH_MANIFEST_PATH):
+        self.path = path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(sha256: str, model_name: str, options: Dict[str, Any]) -> str:
+        return f"{sha256}:{model_name}:{json.dumps(options, sort_keys=True)}"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Línea truncada por un corte a mitad de escritura
+                self._entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(key)
+
+    def is_done(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry["status"] == "done"
+
+    def record(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[entry["key"]] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BatchProgress:
+    """Contadores de la corrida y tasas de rendimiento"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.started = time.monotonic()
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.retried = 0
+        self.audio_seconds = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max(1e-6, time.monotonic() - self.started)
+        pending = self.total - self.done - self.skipped - self.failed
+        files_per_min = self.done / elapsed * 60
+        return {
+            "total": self.total,
+            "done": self.done,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "retried": self.retried,
+            "pending": pending,
+            "elapsed_seconds": round(elapsed, 1),
+            "files_per_min": round(files_per_min, 2),
+            "audio_hours": round(self.audio_seconds / 3600, 3),
+            # Horas de audio transcritas por hora de reloj (>1 = más rápido que tiempo real)
+            "audio_hours_per_hour": round(self.audio_seconds / elapsed, 2),
+            "eta_minutes": round(pending / files_per_min, 1) if files_per_min else None,
+        }
+
+    def log(self):
+        s = self.snapshot()
+        logger.info(
+            f"📊 {s['done'] + s['skipped'] + s['failed']}/{s['total']} archivos "
+            f"({s['done']} transcritos, {s['skipped']} ya en manifiesto, {s['failed']} fallidos) | "
+            f"{s['files_per_min']} archivos/min | {s['audio_hours_per_hour']} h audio/h"
+            + (f" | ETA {s['eta_minutes']} min" if s["eta_minutes"] is not None else "")
+        )
+
+
+class BatchTranscriber:
+    """Transcripción paralela, reanudable y con reintentos de una lista de archivos"""
+
+    def __init__(self, model_name: str = WHISPER_MODEL_NAME, workers: Optional[int] = None,
+                 threads_per_worker: int = BATCH_THREADS_PER_WORKER, retries: int = BATCH_RETRIES,
+                 manifest_path: str = BATCH_MANIFEST_PATH, backend: str = WHISPER_BACKEND, **options):
+        self.model_name = model_name
+        self.backend = backend
+        # Nombre usado en el manifiesto y la caché (incluye el backend si no es torch)
+        self.label = backend_label(model_name, backend)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.workers = max(1, workers or default_workers(self.threads_per_worker))
+        self.retries = max(0, retries)
+        self.options = {"fp16": False, **options}
+        self.manifest = BatchManifest(manifest_path)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_batch_worker,
+            initargs=(self.model_name, self.backend, self.threads_per_worker),
+        )
+
+    def run(self, paths: Iterable[str],
+            on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Transcribir los archivos. `on_result(entry)` se llama (en este proceso) por cada archivo
+        transcrito en esta corrida; los ya presentes en el manifiesto se saltan sin llamarlo.
+        Devuelve {"results": una entrada por archivo en el orden recibido, "progress": métricas}.
+        """
+        paths = list(paths)
+        progress = BatchProgress(len(paths))
+        results: Dict[str, Dict[str, Any]] = {}
+        queue: List[Dict[str, Any]] = []
+
+        for path in paths:
+            try:
+                sha256 = file_sha256(path)
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudo leer {path}: {e}")
+                results[path] = {"path": path, "status": "failed", "error": str(e)}
+                progress.failed += 1
+                continue
+            key = BatchManifest.key(sha256, self.label, self.options)
+            if self.manifest.is_done(key):
+                results[path] = {**self.manifest.get(key), "path": path, "status": "skipped"}
+                progress.skipped += 1
+                continue
+            queue.append({"path": path, "sha256": sha256, "key": key, "attempts": 0})
+
+        logger.info(f"🚀 Lote: {len(queue)} archivos por transcribir ({progress.skipped} ya en el manifiesto) "
+                    f"con {self.workers} procesos '{self.label}' x {self.threads_per_worker} hilos")
+        if queue:
+            self._process(queue, results, progress, on_result)
+        progress.log()
+        return {"results": [results[p] for p in paths], "progress": progress.snapshot()}
+
+    def _process(self, queue: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]],
+                 progress: BatchProgress, on_result: Optional[Callable[[Dict[str, Any]], None]]):
+        # Pocos trabajos en vuelo por worker: memoria acotada y reintentos que no esperan al final
+        max_in_flight = self.workers * 2
+        executor = self._executor()
+        in_flight: Dict[Any, Dict[str, Any]] = {}
+        last_log = time.monotonic()
+        try:
+            while queue or in_flight:
+                while queue and len(in_flight) < max_in_flight:
+                    item = queue.pop(0)
+                    item["attempts"] += 1
+                    in_flight[executor.submit(_transcribe_file_job, item["path"], self.label, self.options)] = item
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    item = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        broken = True
+                        self._failed(item, e, queue, results, progress)
+                        continue
+                    except Exception as e:
+                        self._failed(item, e, queue, results, progress)
+                        continue
+                    entry = self._done(item, result, results, progress)
+                    if on_result is not None:
+                        try:
+                            on_result(entry)
+                        except Exception:
+                            logger.exception(f"Error procesando el resultado de {item['path']}")
+                if broken:
+                    # Un worker murió (memoria, señal): se levanta un pool nuevo y se reintenta lo pendiente
+                    logger.warning("⚠️ Pool de procesos roto; reiniciando workers")
+                    for item in in_flight.values():
+                        item["attempts"] -= 1
+                        queue.insert(0, item)
+                    in_flight.clear()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = self._executor()
+                if time.monotonic() - last_log >= PROGRESS_INTERVAL:
+                    progress.log()
+                    last_log = time.monotonic()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _done(self, item: Dict[str, Any], result: Dict[str, Any], results: Dict[str, Dict[str, Any]],
+              progress: BatchProgress) -> Dict[str, Any]:
+        entry = {
+            "key": item["key"],
+            "sha256": item["sha256"],
+            "path": item["path"],
+            "model": self.model_name,
+            "status": "done",
+            "attempts": item["attempts"],
+            "text": result.get("text", "").strip(),
+            "language": result.get("language", ""),
+            "duration": round(result.get("duration", 0.0), 2),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.manifest.record(entry)
+        results[item["path"]] = {**entry, "segments": result.get("segments", [])}
+        progress.done += 1
+        progress.audio_seconds += entry["duration"]
+        return results[item["path"]]
+
+    def _failed(self, item: Dict[str, Any], error: Exception, queue: List[Dict[str, Any]],
+                results: Dict[str, Dict[str, Any]], progress: BatchProgress):
+        if item["attempts"] <= self.retries:
+            progress.retried += 1
+            logger.warning(f"🔁 Reintentando {os.path.basename(item['path'])} "
+                           f"(intento {item['attempts']}/{self.retries + 1}): {error}")
+            queue.append(item)
+            return
+        logger.error(f"❌ {item['path']} falló tras {item['attempts']} intentos: {error}")
+        entry = {
+            "key": item["key"],
+            "sha256": item["sha256"],
+            "path": item["path"],
+            "model": self.model_name,
+            "status": "failed",
+            "attempts": item["attempts"],
+            "error": str(error),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        # Los fallidos quedan registrados pero se vuelven a intentar en la siguiente corrida
+        self.manifest.record(entry)
+        results[item["path"]] = entry
+        progress.failed += 1
@@ -0,0 +1,334 @@
+"""
+Pool de inferencia Whisper para SENTINELA
+Ejecuta las transcripciones en procesos dedicados para no bloquear el event loop de uvicorn,
+con un número configurable de workers y una cola acotada para aplicar back-pressure.
+Los fragmentos que llegan casi al mismo tiempo se agrupan (micro-batching) y se decodifican
+juntos en una sola pasada del modelo.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.config import (
+    WHISPER_MODEL_NAME, WHISPER_BACKEND, WHISPER_WORKERS, WHISPER_QUEUE_SIZE,
+    WHISPER_BATCH_SIZE, WHISPER_BATCH_WINDOW_MS,
+    WHISPER_REPASS_MODEL, WHISPER_REPASS_WORKERS, WHISPER_REPASS_QUEUE_SIZE,
+)
+from backend.core.audio.transcription_cache import audio_hash, get_transcription_cache
+from backend.core.audio.whisper_backends import backend_label, load_backend
+
+logger = logging.getLogger(__name__)
+
+# Opciones de transcribe() que pueden expresarse como DecodingOptions de un lote
+BATCHABLE_OPTIONS = {"language", "task", "fp16"}
+
+# Duración máxima (segundos) de un clip para decodificarlo dentro de un lote
+BATCH_MAX_SECONDS = 30
+
+# Backend (modelo) cargado una sola vez dentro de cada proceso worker
+_worker_model = None
+
+
+def _init_worker(model_name: str, backend: str = WHISPER_BACKEND, cpu_threads: int = 0):
+    """Inicializador de cada proceso: carga el modelo Whisper en memoria"""
+    global _worker_model
+    _worker_model = load_backend(model_name, backend=backend, cpu_threads=cpu_threads)
+
+
+def _transcribe_job(audio: Any, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Transcribe un fragmento dentro del proceso worker"""
+    return _worker_model.transcribe(audio, **options)
+
+
+def _transcribe_batch_job(audios: List[Any], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Decodifica varios fragmentos en una sola pasada: cada clip se rellena a 30 s,
+    se apilan los espectrogramas mel y se llama a whisper.decode() con el lote completo.
+    Los clips más largos que la ventana de Whisper se transcriben por separado, igual que todos
+    los clips con backends que no exponen un modelo openai-whisper (faster-whisper).
+    """
+    if not _worker_model.supports_batch:
+        return [_transcribe_job(audio, options) for audio in audios]
+
+    import torch
+    import whisper
+
+    model = _worker_model.model
+    results: List[Optional[Dict[str, Any]]] = [None] * len(audios)
+    mels, batch_index, durations = [], [], []
+    for i, audio in enumerate(audios):
+        samples = whisper.load_audio(audio) if isinstance(audio, str) else audio
+        duration = len(samples) / whisper.audio.SAMPLE_RATE
+        if duration > BATCH_MAX_SECONDS:
+            results[i] = _transcribe_job(samples, options)
+            continue
+        padded = whisper.pad_or_trim(samples)
+        mels.append(whisper.log_mel_spectrogram(padded, n_mels=model.dims.n_mels))
+        batch_index.append(i)
+        durations.append(duration)
+
+    if mels:
+        mel = torch.stack(mels).to(model.device)
+        decode_options = whisper.DecodingOptions(
+            language=options.get("language"),
+            task=options.get("task", "transcribe"),
+            fp16=options.get("fp16", False),
+            without_timestamps=True,
+        )
+        decoded = whisper.decode(model, mel, decode_options)
+        for i, duration, res in zip(batch_index, durations, decoded):
+            text = res.text
+            # Mismo criterio de silencio que whisper.transcribe()
+            if res.no_speech_prob > 0.6 and res.avg_logprob < -1.0:
+                text = ""
+            results[i] = {
+                "text": text,
+                "language": res.language,
+                "segments": [{
+                    "id": 0,
+                    "start": 0.0,
+                    "end": round(duration, 2),
+                    "text": text,
+                    "avg_logprob": res.avg_logprob,
+                    "no_speech_prob": res.no_speech_prob,
+                    "compression_ratio": res.compression_ratio,
+                    "temperature": res.temperature,
+                }] if text else [],
+            }
+    return results
+
+
+class QueueFullError(Exception):
+    """La cola de inferencia está llena; el cliente debe reintentar más tarde"""
+
+
+class MicroBatcher:
+    """
+    Agrupa fragmentos que llegan dentro de una ventana corta (o hasta `max_batch` clips)
+    y los envía al pool como un solo trabajo. Cada llamador recibe su propio resultado.
+    """
+
+    def __init__(self, pool: "InferencePool", max_batch: int, window_ms: int):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self._groups: Dict[Tuple, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Tuple, asyncio.TimerHandle] = {}
+        self.batches = 0
+        self.batched_items = 0
+
+    async def add(self, audio: Any, options: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        self.pool._reserve(1)
+        key = tuple(sorted(options.items()))
+        waiter = loop.create_future()
+        group = self._groups.setdefault(key, [])
+        group.append((audio, waiter))
+        if len(group) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await waiter
+
+    def _flush(self, key: Tuple):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(key, [])
+        if not group:
+            return
+        audios = [audio for audio, _ in group]
+        waiters = [waiter for _, waiter in group]
+        self.batches += 1
+        self.batched_items += len(group)
+        try:
+            future = self.pool._submit_reserved(_transcribe_batch_job, len(group), audios, dict(key))
+        except Exception as e:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+
+        def _deliver(done: asyncio.Future):
+            if done.cancelled():
+                error = asyncio.CancelledError()
+            else:
+                error = done.exception()
+            for i, waiter in enumerate(waiters):
+                if waiter.done():
+                    continue
+                if error is not None:
+                    waiter.set_exception(error)
+                else:
+                    waiter.set_result(done.result()[i])
+
+        asyncio.wrap_future(future).add_done_callback(_deliver)
+
+
+class InferencePool:
+    """Pool de procesos con cola acotada para transcripción con Whisper"""
+
+    def __init__(self, model_name: str = WHISPER_MODEL_NAME, workers: int = WHISPER_WORKERS,
+                 queue_size: int = WHISPER_QUEUE_SIZE, batch_size: int = WHISPER_BATCH_SIZE,
+                 batch_window_ms: int = WHISPER_BATCH_WINDOW_MS, backend: str = WHISPER_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        # Clave de la caché: los resultados de un backend cuantizado no se mezclan con los de torch
+        self.cache_name = backend_label(model_name, backend)
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.batch_size = max(1, batch_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._batcher = MicroBatcher(self, self.batch_size, batch_window_ms) if self.batch_size > 1 else None
+
+    @property
+    def capacity(self) -> int:
+        """Fragmentos admitidos a la vez: un lote por worker más los que esperan en cola"""
+        return self.workers * self.batch_size + self.queue_size
+
+    def start(self):
+        """Levantar los procesos worker (idempotente)"""
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"🚀 Iniciando pool Whisper '{self.model_name}' ({self.backend}) con {self.workers} workers "
+                            f"(lotes de hasta {self.batch_size} fragmentos)")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.backend),
+                )
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _reserve(self, count: int):
+        """Reservar lugares en la cola o lanzar QueueFullError"""
+        with self._lock:
+            if self._pending + count > self.capacity:
+                self._rejected += count
+                raise QueueFullError(
+                    f"Cola de inferencia llena ({self._pending}/{self.capacity} fragmentos en curso)"
+                )
+            self._pending += count
+
+    def _release(self, count: int, completed: bool = True):
+        with self._lock:
+            self._pending -= count
+            if completed:
+                self._completed += count
+
+    def _submit_reserved(self, fn, count: int, *args) -> Future:
+        """Enviar un trabajo cuyos `count` lugares ya fueron reservados"""
+        self.start()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(count, completed=False)
+            raise
+        future.add_done_callback(lambda _f: self._release(count))
+        return future
+
+    def submit(self, audio: Any, **options) -> Future:
+        """
+        Encolar una transcripción individual. Lanza QueueFullError si la cola está llena.
+        `audio` puede ser una ruta de archivo o un arreglo de audio a 16 kHz.
+        """
+        self._reserve(1)
+        return self._submit_reserved(_transcribe_job, 1, audio, options)
+
+    def submit_batch(self, audios: List[Any], **options) -> Future:
+        """Encolar varios fragmentos como un solo lote; el resultado es una lista en el mismo orden"""
+        self._reserve(len(audios))
+        return self._submit_reserved(_transcribe_batch_job, len(audios), list(audios), options)
+
+    async def transcribe(self, audio: Any, **options) -> Dict[str, Any]:
+        """
+        Versión asíncrona: espera el resultado sin bloquear el event loop.
+        Antes de encolar se consulta la caché de transcripciones (audio en memoria, sin prompt).
+        Si el micro-batching está activo y las opciones lo permiten, el fragmento se agrupa
+        con otros que lleguen dentro de la ventana configurada.
+        """
+        digest = None
+        cache = get_transcription_cache()
+        # Las decodificaciones con prompt dependen del contexto de la llamada y no se repiten
+        if cache.enabled and isinstance(audio, np.ndarray) and "initial_prompt" not in options:
+            # Hash y consulta a SQLite fuera del event loop (la consulta también escribe last_access)
+            digest, cached = await asyncio.to_thread(self._cached_result, cache, audio, options)
+            if cached is not None:
+                return cached
+        if self._batcher is not None and set(options) <= BATCHABLE_OPTIONS:
+            self.start()
+            result = await self._batcher.add(audio, options)
+        else:
+            result = await asyncio.wrap_future(self.submit(audio, **options))
+        if digest is not None:
+            await asyncio.to_thread(cache.put, digest, self.cache_name, options, result)
+        return result
+
+    def _cached_result(self, cache, audio: np.ndarray, options: Dict[str, Any]):
+        digest = audio_hash(audio)
+        return digest, cache.get(digest, self.cache_name, options)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del pool y de la caché (consulta SQLite: desde el event loop, en un hilo)"""
+        with self._lock:
+            stats = {
+                "model": self.model_name,
+                "backend": self.backend,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "batch_size": self.batch_size,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "running": self._executor is not None,
+            }
+        stats["cache"] = get_transcription_cache().stats()
+        if self._batcher is not None:
+            stats["batches"] = self._batcher.batches
+            stats["avg_batch_size"] = (
+                round(self._batcher.batched_items / self._batcher.batches, 2) if self._batcher.batches else 0
+            )
+        return stats
+
+
+_inference_pool_instance: Optional[InferencePool] = None
+
+
+def get_inference_pool() -> InferencePool:
+    """Obtener instancia única del pool de inferencia"""
+    global _inference_pool_instance
+    if _inference_pool_instance is None:
+        _inference_pool_instance = InferencePool()
+    return _inference_pool_instance
+
+
+_repass_pool_instance: Optional[InferencePool] = None
+
+
+def get_repass_pool() -> InferencePool:
+    """
+    Pool del modelo grande para la segunda pasada (sólo fragmentos de riesgo o baja confianza).
+    Procesos propios y sin micro-batching: no compite con la cola de los fragmentos en vivo.
+    """
+    global _repass_pool_instance
+    if _repass_pool_instance is None:
+        _repass_pool_instance = InferencePool(
+            model_name=WHISPER_REPASS_MODEL, workers=WHISPER_REPASS_WORKERS,
+            queue_size=WHISPER_REPASS_QUEUE_SIZE, batch_size=1,
+        )
+    return _repass_pool_instance
@@ -0,0 +1,79 @@
+"""
+Decodificación de audio en memoria para SENTINELA
+Convierte los bytes WAV/PCM recibidos por la API directamente en un arreglo float32 a 16 kHz,
+sin escribir archivos temporales ni lanzar ffmpeg (formato que espera Whisper).
+"""
+
+import io
+import subprocess
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Factores de normalización por ancho de muestra (bytes)
+_PCM_DTYPES = {
+    1: (np.uint8, 128.0, 128.0),
+    2: (np.int16, 0.0, 32768.0),
+    4: (np.int32, 0.0, 2147483648.0),
+}
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """PCM crudo int16 little-endian mono -> float32 en [-1, 1]"""
+    usable = len(data) - (len(data) % 2)
+    return np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Remuestreo lineal; suficiente para voz telefónica hacia 16 kHz"""
+    if source_rate == target_rate or len(audio) == 0:
+        return audio.astype(np.float32, copy=False)
+    target_len = int(round(len(audio) * target_rate / source_rate))
+    positions = np.linspace(0, len(audio) - 1, num=target_len)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def _decode_wav(data: bytes) -> np.ndarray:
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    if width not in _PCM_DTYPES:
+        raise ValueError(f"Ancho de muestra no soportado: {width * 8} bits")
+    dtype, offset, scale = _PCM_DTYPES[width]
+    samples = np.frombuffer(frames, dtype=np.dtype(dtype).newbyteorder("<"))
+    audio = (samples.astype(np.float32) - offset) / scale
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return resample(audio, rate)
+
+
+def _decode_with_ffmpeg(data: bytes) -> np.ndarray:
+    """Último recurso para formatos comprimidos: ffmpeg por tuberías, sin archivos temporales"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "pipe:1",
+    ]
+    out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    return pcm16_to_float32(out)
+
+
+def decode_audio_bytes(data: bytes) -> np.ndarray:
+    """
+    Decodificar bytes de audio a float32 mono 16 kHz.
+    - WAV PCM (8/16/32 bits, cualquier tasa y canales): decodificado en memoria con numpy.
+    - Sin cabecera RIFF: se asume PCM int16 mono a 16 kHz (flujo crudo del grabador).
+    - Otros contenedores (mp3, ogg, WAV float...): ffmpeg vía stdin/stdout.
+    Bloquea mientras corre ffmpeg: desde código async llamarla con asyncio.to_thread/run_in_threadpool.
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            return _decode_wav(data)
+        except (wave.Error, ValueError):
+            return _decode_with_ffmpeg(data)
+    if data[:3] == b"ID3" or data[:4] in (b"OggS", b"fLaC") or data[:2] == b"\xff\xfb":
+        return _decode_with_ffmpeg(data)
+    return pcm16_to_float32(data)
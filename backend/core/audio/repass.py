@@ -0,0 +1,255 @@
+"""
+Transcripción en dos niveles para SENTINELA
+Todo el audio pasa primero por el modelo rápido (WHISPER_MODEL_NAME). Sólo los fragmentos cuyo
+texto contiene frases de riesgo, o cuya confianza promedio (avg_logprob) es baja, se vuelven a
+transcribir en segundo plano con el modelo grande (WHISPER_REPASS_MODEL). El texto mejorado
+reemplaza la línea del _Ttranscripcion.txt, se reindexa y se recalculan sus alertas.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.config import WHISPER_REPASS_MODEL, REPASS_LOGPROB_THRESHOLD
+from backend.core.analysis.phrase_matcher import get_risk_matcher
+from backend.core.audio.inference_pool import QueueFullError, get_repass_pool
+from backend.core.audio.transcription_cache import audio_hash, get_transcription_cache
+from backend.core.audio.whisper_backends import backend_label
+from backend.core.reports.search_index import FRAGMENT_LINE_RE, index_transcript_fragment
+from backend.core.reports.transcript_catalog import register_transcript_file
+
+logger = logging.getLogger(__name__)
+
+# Re-pasadas recientes que se conservan para consulta
+RECENT_RESULTS = 500
+
+REASON_RISK = "riesgo"
+REASON_LOW_CONFIDENCE = "baja_confianza"
+
+
+def average_logprob(result: Dict[str, Any]) -> Optional[float]:
+    """avg_logprob de los segmentos de Whisper ponderado por su duración (None si no hay datos)"""
+    total, weight = 0.0, 0.0
+    for segment in result.get("segments", []):
+        logprob = segment.get("avg_logprob")
+        if logprob is None:
+            continue
+        duration = max(0.01, float(segment.get("end", 0.0)) - float(segment.get("start", 0.0)))
+        total += float(logprob) * duration
+        weight += duration
+    return total / weight if weight else None
+
+
+def repass_reason(text: str, alertas: List[str], avg_logprob: Optional[float]) -> Optional[str]:
+    """Motivo para una segunda pasada con el modelo grande, o None si el primer texto es suficiente"""
+    if not WHISPER_REPASS_MODEL or not text.strip():
+        return None
+    if alertas:
+        return REASON_RISK
+    if avg_logprob is not None and avg_logprob < REPASS_LOGPROB_THRESHOLD:
+        return REASON_LOW_CONFIDENCE
+    return None
+
+
+# Las líneas nuevas y los reemplazos de un _Ttranscripcion.txt no deben intercalarse: un
+# fragmento agregado mientras se reescribe el archivo se perdería. Un lock por archivo, así la
+# reescritura de una llamada no frena a las demás; se libera cuando nadie lo está usando
+_transcript_file_locks: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+_transcript_file_locks_guard = threading.Lock()
+
+
+def _transcript_file_lock(path: str):
+    key = os.path.abspath(path)
+    with _transcript_file_locks_guard:
+        lock = _transcript_file_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _transcript_file_locks[key] = lock
+        return lock
+
+
+def append_transcript_line(path: str, line: str):
+    """
+    Agregar una línea a un _Ttranscripcion.txt. Puede esperar a una reescritura del mismo archivo:
+    desde código async llamarla con asyncio.to_thread/run_in_threadpool.
+    """
+    with _transcript_file_lock(path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line if line.endswith("\n") else line + "\n")
+
+
+def replace_transcript_line(path: str, hora: str, old_text: str, new_text: str) -> bool:
+    """
+    Reemplazar el texto de la línea [hora] de un _Ttranscripcion.txt (conservando el idioma)
+    con escritura atómica. Devuelve False si la línea ya no está.
+    """
+    with _transcript_file_lock(path):
+        return _replace_line(path, hora, old_text, new_text)
+
+
+def _replace_line(path: str, hora: str, old_text: str, new_text: str) -> bool:
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    replaced = False
+    for i, line in enumerate(lines):
+        m = FRAGMENT_LINE_RE.match(line.rstrip("\n"))
+        if m and m.group("time") == hora and m.group("text").strip() == old_text.strip():
+            lang = f"({m.group('lang')}) " if m.group("lang") else ""
+            lines[i] = f"[{hora}] {lang}{new_text.strip()}\n"
+            replaced = True
+            break
+    if not replaced:
+        return False
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(tmp, path)
+    return True
+
+
+class RepassScheduler:
+    """Encola segundas pasadas en el pool del modelo grande y aplica sus resultados"""
+
+    def __init__(self):
+        # Un solo hilo aplica los resultados: las reescrituras de un mismo archivo no se pisan
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="repass-writer")
+        self._lock = threading.Lock()
+        self.recent: deque = deque(maxlen=RECENT_RESULTS)
+        self.scheduled = 0
+        self.completed = 0
+        self.improved = 0
+        self.dropped = 0
+        self.failed = 0
+        self.by_reason: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(WHISPER_REPASS_MODEL)
+
+    def schedule(self, audio: np.ndarray, pin: str, transcript_file: str, fecha: str, hora: str,
+                 first_text: str, reason: Optional[str], language: Optional[str] = None) -> bool:
+        """
+        Encolar la segunda pasada de un fragmento ya guardado con el texto `first_text`.
+        No bloquea: la consulta a la caché y el envío al pool se hacen en el hilo de resultados;
+        si la cola del modelo grande está llena el fragmento conserva su primer texto (se cuenta
+        en `dropped`). Se puede llamar desde el event loop o desde un hilo.
+        """
+        if reason is None or not self.enabled:
+            return False
+        options: Dict[str, Any] = {"fp16": False}
+        if language:
+            options["language"] = language
+        job = {"pin": pin, "path": transcript_file, "fecha": fecha, "hora": hora, "first_text": first_text,
+               "reason": reason, "scheduled_at": time.time()}
+        with self._lock:
+            self.scheduled += 1
+            self.by_reason[reason] = self.by_reason.get(reason, 0) + 1
+        self._writer.submit(self._dispatch, audio, job, options)
+        return True
+
+    def _dispatch(self, audio: np.ndarray, job: Dict[str, Any], options: Dict[str, Any]):
+        """Hilo de resultados: resolver desde la caché o enviar al pool del modelo grande"""
+        pin, hora = job["pin"], job["hora"]
+        cache = get_transcription_cache()
+        digest = audio_hash(audio)
+        cache_name = backend_label(WHISPER_REPASS_MODEL)
+        cached = cache.get(digest, cache_name, options)
+        if cached is not None:
+            self._apply(job, cached)
+            return
+        try:
+            future = get_repass_pool().submit(audio, **options)
+        except QueueFullError:
+            with self._lock:
+                self.dropped += 1
+            logger.info(f"⏳ Cola de segunda pasada llena; {pin} {hora} conserva el texto del primer modelo")
+            return
+
+        def _done(f: Future):
+            if f.cancelled() or f.exception() is not None:
+                with self._lock:
+                    self.failed += 1
+                logger.warning(f"⚠️ Segunda pasada fallida para {pin} {hora}: {f.exception() if not f.cancelled() else 'cancelada'}")
+                return
+            result = f.result()
+            cache.put(digest, cache_name, options, result)
+            self._writer.submit(self._apply, job, result)
+
+        future.add_done_callback(_done)
+
+    def _apply(self, job: Dict[str, Any], result: Dict[str, Any]):
+        text = result.get("text", "").strip()
+        matcher = get_risk_matcher()
+        entry = {
+            **job,
+            "model": WHISPER_REPASS_MODEL,
+            "text": text,
+            "alertas_previas": matcher.matched_phrases(job["first_text"]),
+            "alertas": matcher.matched_phrases(text),
+            "replaced": False,
+            "finished_at": time.time(),
+        }
+        try:
+            if text and text != job["first_text"].strip():
+                entry["replaced"] = replace_transcript_line(job["path"], job["hora"], job["first_text"], text)
+                if entry["replaced"]:
+                    register_transcript_file(job["path"])
+                    index_transcript_fragment(job["path"], job["pin"], job["fecha"], job["hora"], text,
+                                              replaces=job["first_text"])
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo reemplazar la transcripción de {job['path']} {job['hora']}: {e}")
+        with self._lock:
+            self.completed += 1
+            if entry["replaced"]:
+                self.improved += 1
+            self.recent.append(entry)
+        if entry["replaced"]:
+            logger.info(f"🔁 Segunda pasada ({job['reason']}) {job['pin']} {job['hora']}: "
+                        f"alertas {entry['alertas_previas']} -> {entry['alertas']}")
+
+    def results(self, pin: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Segundas pasadas más recientes primero (opcionalmente de un PIN)"""
+        with self._lock:
+            entries = list(self.recent)
+        if pin:
+            entries = [e for e in entries if e["pin"] == pin]
+        return entries[::-1][:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "model": WHISPER_REPASS_MODEL,
+                "logprob_threshold": REPASS_LOGPROB_THRESHOLD,
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "improved": self.improved,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "by_reason": dict(self.by_reason),
+            }
+        if self.enabled:
+            stats["pool"] = get_repass_pool().stats()
+        return stats
+
+
+_repass_scheduler_instance: Optional[RepassScheduler] = None
+_instance_lock = threading.Lock()
+
+
+def get_repass_scheduler() -> RepassScheduler:
+    """Obtener instancia única del planificador de segundas pasadas"""
+    global _repass_scheduler_instance
+    if _repass_scheduler_instance is None:
+        with _instance_lock:
+            if _repass_scheduler_instance is None:
+                _repass_scheduler_instance = RepassScheduler()
+    return _repass_scheduler_instance
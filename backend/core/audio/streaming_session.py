@@ -0,0 +1,306 @@
+"""
+Sesiones de transcripción continua para SENTINELA
+Una sesión por llamada recibe el audio en trozos (abrir / enviar / cerrar) y lo decodifica con
+una ventana deslizante: cada pasada cubre el audio nuevo más una cola de solapamiento con la
+anterior, usa el texto ya confirmado como prompt de Whisper y sólo confirma las palabras que no
+caen en esa cola. Las palabras repetidas en el solapamiento se descartan por su marca de tiempo,
+así no se cortan palabras en el borde de un fragmento ni se transcribe dos veces el mismo audio.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.config import (
+    STREAM_DECODE_SECONDS, STREAM_OVERLAP_SECONDS, STREAM_PROMPT_CHARS, STREAM_SESSION_TTL_SECONDS,
+)
+from backend.core.audio.inference_pool import get_inference_pool
+from backend.core.audio.pcm import SAMPLE_RATE
+from backend.core.audio.vad import get_vad
+
+logger = logging.getLogger(__name__)
+
+# Ventana máxima que se envía a Whisper (su contexto es de 30 s)
+MAX_WINDOW_SECONDS = 28.0
+# Audio restante mínimo que vale la pena decodificar al cerrar la sesión
+MIN_TAIL_SECONDS = 0.3
+# Segmentos cuyo audio se retiene hasta publicarlos
+MAX_PENDING_SEGMENT_AUDIO = 8
+
+
+class SessionNotFoundError(KeyError):
+    """La sesión no existe, ya se cerró o expiró por inactividad"""
+
+
+def _words_from_result(result: Dict[str, Any], offset: float) -> List[Dict[str, Any]]:
+    """Palabras con marcas de tiempo absolutas (segundos desde el inicio de la llamada)"""
+    words = []
+    for segment in result.get("segments", []):
+        for word in segment.get("words", []):
+            text = word.get("word", "")
+            if not text.strip():
+                continue
+            words.append({
+                "word": text,
+                "start": round(offset + float(word["start"]), 2),
+                "end": round(offset + float(word["end"]), 2),
+                "probability": word.get("probability"),
+                "avg_logprob": segment.get("avg_logprob"),
+            })
+    return words
+
+
+def _join_words(words: List[Dict[str, Any]]) -> str:
+    return "".join(w["word"] for w in words).strip()
+
+
+def _words_logprob(words: List[Dict[str, Any]]) -> Optional[float]:
+    """avg_logprob de los segmentos de Whisper de las palabras, ponderado por palabra"""
+    values = [w["avg_logprob"] for w in words if w.get("avg_logprob") is not None]
+    return round(float(np.mean(values)), 3) if values else None
+
+
+class StreamingSession:
+    """Estado de una llamada en curso: audio pendiente, texto confirmado y segmentos emitidos"""
+
+    def __init__(self, pin: str, language: Optional[str] = None,
+                 decode_seconds: float = STREAM_DECODE_SECONDS,
+                 overlap_seconds: float = STREAM_OVERLAP_SECONDS,
+                 prompt_chars: int = STREAM_PROMPT_CHARS):
+        self.session_id = uuid.uuid4().hex
+        self.pin = pin
+        self.language = language
+        self.decode_seconds = decode_seconds
+        self.overlap_seconds = overlap_seconds
+        self.prompt_chars = prompt_chars
+        self.started_at = datetime.now()
+        self.last_activity = time.monotonic()
+        self.closed = False
+        self.detected_language: Optional[str] = language
+        # Audio aún no descartado; `offset` es su posición (s) dentro de la llamada
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._offset = 0.0
+        self._new_samples = 0
+        self._committed_until = 0.0
+        self._lock = asyncio.Lock()
+        self.segments: List[Dict[str, Any]] = []
+        # Audio de los segmentos confirmados que aún no se publicaron (para la segunda pasada)
+        self._segment_audio: Dict[int, np.ndarray] = {}
+        self.partial = ""
+        self.received_seconds = 0.0
+        self.decoded_seconds = 0.0
+        self.skipped_seconds = 0.0
+        self.decodes = 0
+
+    @property
+    def text(self) -> str:
+        return " ".join(s["text"] for s in self.segments).strip()
+
+    def _prompt(self) -> Optional[str]:
+        """Final del texto confirmado, como contexto para la siguiente decodificación"""
+        prompt = self.text[-self.prompt_chars:] if self.prompt_chars > 0 else ""
+        return prompt or None
+
+    def segment_time(self, seconds: float) -> datetime:
+        """Hora de reloj de un instante de la llamada"""
+        return self.started_at + timedelta(seconds=seconds)
+
+    async def push(self, audio: np.ndarray) -> Dict[str, Any]:
+        """
+        Agregar audio float32 a 16 kHz. Decodifica cuando se acumularon `decode_seconds` de audio
+        nuevo y devuelve {"final": segmentos confirmados en esta llamada, "partial": texto provisional}.
+        """
+        async with self._lock:
+            if self.closed:
+                raise SessionNotFoundError(self.session_id)
+            self.last_activity = time.monotonic()
+            audio = np.asarray(audio, dtype=np.float32)
+            self._audio = np.concatenate([self._audio, audio])
+            self._new_samples += len(audio)
+            self.received_seconds += len(audio) / SAMPLE_RATE
+            final: List[Dict[str, Any]] = []
+            if self._new_samples >= self.decode_seconds * SAMPLE_RATE:
+                final = await self._decode(final_pass=False)
+            return {"final": final, "partial": self.partial}
+
+    async def close(self) -> Dict[str, Any]:
+        """Decodificar el audio restante y confirmar todo; devuelve los últimos segmentos y el texto completo"""
+        async with self._lock:
+            final: List[Dict[str, Any]] = []
+            if not self.closed:
+                if len(self._audio) >= MIN_TAIL_SECONDS * SAMPLE_RATE:
+                    final = await self._decode(final_pass=True)
+                self.closed = True
+                self.partial = ""
+            return {"final": final, "partial": "", "text": self.text}
+
+    async def _decode(self, final_pass: bool) -> List[Dict[str, Any]]:
+        window_start = self._offset
+        window_end = self._offset + len(self._audio) / SAMPLE_RATE
+        limit = window_end if final_pass else window_end - self.overlap_seconds
+
+        # Ventana sin voz: no se decodifica y sólo se conserva la cola de solapamiento.
+        # Con voz, el silencio inicial no se envía a Whisper
+        vad = get_vad()
+        lead = 0
+        if vad.enabled:
+            regions = vad.speech_regions(self._audio)
+            if not regions:
+                vad.record(window_end - window_start, skipped=window_end - window_start)
+                self.skipped_seconds += window_end - window_start
+                self._new_samples = 0
+                self.partial = ""
+                self._discard_until(limit)
+                return []
+            lead = regions[0][0]
+        decode_start = window_start + lead / SAMPLE_RATE
+
+        options: Dict[str, Any] = {"fp16": False, "word_timestamps": True}
+        if self.language:
+            options["language"] = self.language
+        prompt = self._prompt()
+        if prompt:
+            options["initial_prompt"] = prompt
+
+        result = await get_inference_pool().transcribe(self._audio[lead:], **options)
+        self._new_samples = 0
+        self.decodes += 1
+        if vad.enabled:
+            vad.record(window_end - window_start, trimmed=lead / SAMPLE_RATE)
+            self.skipped_seconds += lead / SAMPLE_RATE
+        self.decoded_seconds += window_end - decode_start
+        if result.get("language"):
+            self.detected_language = result["language"]
+
+        # Descartar lo ya confirmado en la pasada anterior (re-decodificado por el solapamiento)
+        words = [w for w in _words_from_result(result, decode_start)
+                 if (w["start"] + w["end"]) / 2 > self._committed_until]
+        confirmed = [w for w in words if w["end"] <= limit]
+        pending = [w for w in words if w["end"] > limit]
+
+        segments = []
+        if confirmed:
+            self._committed_until = confirmed[-1]["end"]
+            segment = {
+                "index": len(self.segments),
+                "start": confirmed[0]["start"],
+                "end": confirmed[-1]["end"],
+                "text": _join_words(confirmed),
+                "language": self.detected_language,
+                "avg_logprob": _words_logprob(confirmed),
+            }
+            first = max(0, int((segment["start"] - window_start) * SAMPLE_RATE))
+            last = int((segment["end"] - window_start) * SAMPLE_RATE)
+            self._segment_audio[segment["index"]] = self._audio[first:last].copy()
+            while len(self._segment_audio) > MAX_PENDING_SEGMENT_AUDIO:
+                self._segment_audio.pop(min(self._segment_audio))
+            self.segments.append(segment)
+            segments.append(segment)
+        self.partial = _join_words(pending)
+
+        # Conservar sólo el audio que se vuelve a decodificar: desde la primera palabra pendiente
+        # (o la cola de solapamiento si no hay ninguna)
+        self._discard_until(min(limit, pending[0]["start"]) if pending else limit)
+        return segments
+
+    def pop_segment_audio(self, index: int) -> Optional[np.ndarray]:
+        """Audio de un segmento confirmado (se entrega una sola vez)"""
+        return self._segment_audio.pop(index, None)
+
+    def _discard_until(self, cut: float):
+        """Descartar el audio anterior al instante `cut`, sin pasar de lo que cabe en la ventana"""
+        window_start = self._offset
+        window_end = self._offset + len(self._audio) / SAMPLE_RATE
+        cut = max(cut, window_start, window_end - (MAX_WINDOW_SECONDS - self.decode_seconds))
+        drop = int(round((cut - window_start) * SAMPLE_RATE))
+        self._audio = self._audio[drop:]
+        self._offset = window_start + drop / SAMPLE_RATE
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "pin": self.pin,
+            "language": self.detected_language,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "received_seconds": round(self.received_seconds, 1),
+            "decoded_seconds": round(self.decoded_seconds, 1),
+            "vad_skipped_seconds": round(self.skipped_seconds, 1),
+            "decodes": self.decodes,
+            "segments": len(self.segments),
+            "idle_seconds": round(time.monotonic() - self.last_activity, 1),
+            "closed": self.closed,
+        }
+
+
+class StreamingSessionManager:
+    """Sesiones abiertas por id; las que quedan inactivas más de `ttl_seconds` se descartan"""
+
+    def __init__(self, ttl_seconds: float = STREAM_SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._sessions: Dict[str, StreamingSession] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.expired = 0
+
+    def open(self, pin: str, language: Optional[str] = None) -> StreamingSession:
+        self.expire_idle()
+        session = StreamingSession(pin, language=language)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self.opened += 1
+        logger.info(f"🎙️ Sesión de transcripción {session.session_id} abierta para PIN {pin}")
+        return session
+
+    def get(self, session_id: str) -> StreamingSession:
+        session = self._sessions.get(session_id)
+        if session is None or session.closed:
+            raise SessionNotFoundError(session_id)
+        return session
+
+    def remove(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def expire_idle(self) -> List[str]:
+        if self.ttl_seconds <= 0:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if now - s.last_activity > self.ttl_seconds]
+            for sid in expired:
+                self._sessions.pop(sid).closed = True
+            self.expired += len(expired)
+        for sid in expired:
+            logger.info(f"⌛ Sesión de transcripción {sid} expirada por inactividad")
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = [s.info() for s in self._sessions.values()]
+        return {
+            "open": len(sessions),
+            "opened": self.opened,
+            "expired": self.expired,
+            "ttl_seconds": self.ttl_seconds,
+            "sessions": sessions,
+        }
+
+
+_streaming_sessions_instance: Optional[StreamingSessionManager] = None
+_instance_lock = threading.Lock()
+
+
+def get_streaming_sessions() -> StreamingSessionManager:
+    """Obtener instancia única del administrador de sesiones de transcripción continua"""
+    global _streaming_sessions_instance
+    if _streaming_sessions_instance is None:
+        with _instance_lock:
+            if _streaming_sessions_instance is None:
+                _streaming_sessions_instance = StreamingSessionManager()
+    return _streaming_sessions_instance
@@ -2,7 +2,6 @@ from threading import Lock
 from collections import deque
 import numpy as np
 from scipy.spatial.distance import cosine
-import whisper
 import torch
 import torchaudio
 import time
@@ -10,16 +9,22 @@ from pathlib import Path
 import os
 from typing import Dict, Any, List, Optional
 from utils.crypto import encrypt_file, decrypt_file, secure_tempfile
+from backend.core.audio.transcription_cache import audio_hash, get_transcription_cache
+from backend.core.audio.whisper_backends import TranscriptionBackend, load_audio, load_backend
+from backend.config import WHISPER_BACKEND
 
 class AudioTranscriber:
-    def __init__(self, model_name: str = "base"):
+    def __init__(self, model_name: str = "base", backend: str = WHISPER_BACKEND):
         """
         Initialize the transcriber with the specified Whisper model.
         Args:
             model_name: The name of the Whisper model to use (tiny, base, small, medium, large)
+            backend: Inference backend (torch, torch-int8, faster-whisper); see whisper_backends
         """
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = whisper.load_model(model_name).to(self.device)
+        self.model_name = model_name
+        self.backend: TranscriptionBackend = load_backend(model_name, backend=backend)
+        self.model = self.backend.model
     
     def transcribe(self, audio_path: Path) -> Dict[str, Any]:
         """
@@ -33,8 +38,15 @@ class AudioTranscriber:
             decrypted_path_tuple = secure_tempfile()
             decrypted_path = decrypted_path_tuple[0] if isinstance(decrypted_path_tuple, tuple) else decrypted_path_tuple
             decrypt_file(str(audio_path), decrypted_path)
-            result = self.model.transcribe(decrypted_path)
+            audio = load_audio(decrypted_path)
             os.remove(decrypted_path)
+            # Same audio + model already transcribed elsewhere (live fragment, batch): reuse it
+            cache = get_transcription_cache()
+            digest = audio_hash(audio)
+            result = cache.get(digest, self.backend.label, {})
+            if result is None:
+                result = self.backend.transcribe(audio)
+                cache.put(digest, self.backend.label, {}, result)
             return {
                 "text": result.get("text", ""),
                 "segments": result.get("segments", []),
@@ -100,6 +112,21 @@ class RealTimeTranscriber:
                 return results
         return None
 
+    def open_session(self, pin: str, language: Optional[str] = None):
+        """
+        Open a per-call streaming session (open / push / close).
+        Unlike process_chunk, the session keeps an overlapping sliding window, passes the
+        confirmed text as the decoding prompt and only emits finalized, de-duplicated segments.
+        Decoding runs in the shared Whisper inference pool.
+        Args:
+            pin: PIN of the caller.
+            language: Optional language code; autodetected when omitted.
+        Returns:
+            StreamingSession; use `await session.push(audio)` and `await session.close()`.
+        """
+        from backend.core.audio.streaming_session import get_streaming_sessions
+        return get_streaming_sessions().open(pin, language=language)
+
     def _process_full(self, waveform: torch.Tensor) -> Dict[str, Any]:
         """
         Process buffered audio with voice matching.
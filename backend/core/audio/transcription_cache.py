@@ -0,0 +1,207 @@
+"""
+Caché de resultados de transcripción para SENTINELA
+El mismo audio suele transcribirse varias veces (fragmento en vivo, generación de alertas, scripts
+por lotes con otro modelo). Cada resultado (texto, segmentos e idioma) se guarda en SQLite con la
+clave (hash SHA-256 del audio PCM a 16 kHz, modelo, idioma, opciones de decodificación), así
+cualquier punto de entrada que reciba el mismo audio con la misma configuración lo reutiliza.
+Cuando la base supera TRANSCRIPTION_CACHE_MAX_MB se expulsan las entradas usadas hace más tiempo.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from backend.config import TRANSCRIPTION_CACHE_ENABLED, TRANSCRIPTION_CACHE_DB_PATH, TRANSCRIPTION_CACHE_MAX_MB
+from backend.core.database.sqlite_setup import connect
+from backend.core.database.sqlite_writer import get_sqlite_writer
+
+logger = logging.getLogger(__name__)
+
+# Al expulsar se baja hasta esta fracción del máximo, para no expulsar en cada inserción
+EVICT_TARGET_RATIO = 0.9
+# Opciones que no cambian el texto resultante y no forman parte de la clave
+IGNORED_OPTIONS = {"verbose"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcription_cache (
+    key TEXT PRIMARY KEY,
+    audio_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    language TEXT NOT NULL,
+    options TEXT NOT NULL,
+    text TEXT NOT NULL,
+    result_language TEXT,
+    segments TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_transcription_cache_last_access ON transcription_cache(last_access);
+CREATE INDEX IF NOT EXISTS idx_transcription_cache_audio ON transcription_cache(audio_hash);
+"""
+
+
+def audio_hash(audio: np.ndarray) -> str:
+    """SHA-256 de las muestras float32 (independiente del contenedor o nombre del archivo)"""
+    samples = np.ascontiguousarray(audio, dtype=np.float32)
+    return hashlib.sha256(samples.tobytes()).hexdigest()
+
+
+class TranscriptionCache:
+    """Resultados de Whisper por contenido de audio, respaldados por SQLite (una conexión por hilo)"""
+
+    def __init__(self, db_path: str = TRANSCRIPTION_CACHE_DB_PATH, max_mb: float = TRANSCRIPTION_CACHE_MAX_MB,
+                 enabled: bool = TRANSCRIPTION_CACHE_ENABLED):
+        self.db_path = db_path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.enabled = enabled
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._approx_bytes = 0
+        if self.enabled:
+            conn = self._connect()
+            conn.executescript(SCHEMA)
+            self._approx_bytes = self._total_bytes(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM transcription_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(digest: str, model_name: str, options: Dict[str, Any]) -> str:
+        opts = {k: v for k, v in options.items() if k not in IGNORED_OPTIONS}
+        language = opts.pop("language", None) or "auto"
+        return f"{digest}:{model_name}:{language}:{json.dumps(opts, sort_keys=True, default=str)}"
+
+    def get(self, digest: str, model_name: str, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Resultado guardado ({"text", "language", "segments"}) o None"""
+        if not self.enabled:
+            return None
+        key = self.make_key(digest, model_name, options)
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT text, result_language, segments FROM transcription_cache WHERE key = ?", (key,)
+        ).fetchone()
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        # Sólo orden de expulsión: se encola en el escritor único sin esperar el commit
+        now = time.time()
+        get_sqlite_writer(self.db_path).post(
+            lambda conn: conn.execute("UPDATE transcription_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                                      (now, key)),
+            "la actualización de la caché de transcripciones",
+        )
+        return {"text": row[0], "language": row[1] or "", "segments": json.loads(row[2]), "cached": True}
+
+    def put(self, digest: str, model_name: str, options: Dict[str, Any], result: Dict[str, Any]):
+        if not self.enabled:
+            return
+        key = self.make_key(digest, model_name, options)
+        segments = json.dumps(result.get("segments", []), ensure_ascii=False, default=float)
+        text = result.get("text", "")
+        size = len(segments.encode("utf-8")) + len(text.encode("utf-8")) + len(key)
+        now = time.time()
+        opts = {k: v for k, v in options.items() if k not in IGNORED_OPTIONS and k != "language"}
+        # Desde el escritor único: los hilos del pool de inferencia no se turnan el bloqueo de la base
+        get_sqlite_writer(self.db_path).execute(
+            "INSERT OR REPLACE INTO transcription_cache (key, audio_hash, model, language, options, text, "
+            "result_language, segments, size_bytes, created_at, last_access, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, digest, model_name, options.get("language") or "auto",
+             json.dumps(opts, sort_keys=True, default=str), text, result.get("language", ""),
+             segments, size, now, now),
+        )
+        with self._stats_lock:
+            self.stores += 1
+            self._approx_bytes += size
+            over = self.max_bytes > 0 and self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        """Expulsar las entradas menos usadas recientemente hasta quedar bajo el límite de tamaño"""
+        conn = self._connect()
+        total = self._total_bytes(conn)
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        removed = 0
+        if total > self.max_bytes:
+            victims, freed = [], 0
+            for key, size in conn.execute(
+                "SELECT key, size_bytes FROM transcription_cache ORDER BY last_access"
+            ):
+                if total - freed <= target:
+                    break
+                victims.append((key,))
+                freed += size
+            get_sqlite_writer(self.db_path).executemany("DELETE FROM transcription_cache WHERE key = ?", victims)
+            removed = len(victims)
+            total -= freed
+            logger.info(f"🧹 Caché de transcripciones: {removed} entradas expulsadas ({freed / 1048576:.1f} MB)")
+        with self._stats_lock:
+            self._approx_bytes = total
+            self.evictions += removed
+        return removed
+
+    def clear(self) -> int:
+        removed = get_sqlite_writer(self.db_path).execute("DELETE FROM transcription_cache")
+        with self._stats_lock:
+            self._approx_bytes = 0
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size = 0, 0
+        if self.enabled:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM transcription_cache"
+            ).fetchone()
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "db_path": self.db_path,
+                "entries": entries,
+                "size_mb": round(size / 1048576, 2),
+                "max_mb": round(self.max_bytes / 1048576, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+_transcription_cache_instance: Optional[TranscriptionCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_transcription_cache() -> TranscriptionCache:
+    """Obtener instancia única de la caché de transcripciones (una por proceso)"""
+    global _transcription_cache_instance
+    if _transcription_cache_instance is None:
+        with _instance_lock:
+            if _transcription_cache_instance is None:
+                _transcription_cache_instance = TranscriptionCache()
+    return _transcription_cache_instance
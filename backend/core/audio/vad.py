@@ -0,0 +1,159 @@
+"""
+Detección de actividad de voz (VAD) para SENTINELA
+Se ejecuta antes de encolar audio en el pool de Whisper: los fragmentos sin voz (silencio, ruido
+de línea, música de espera) se responden al instante con un resultado vacío y los que sí tienen voz
+se recortan a la región hablada. Usa webrtcvad si está instalado; si no, un detector de energía
+por tramas de 30 ms con umbral adaptado al ruido de fondo del propio fragmento.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.config import VAD_ENABLED, VAD_ENERGY_DB, VAD_AGGRESSIVENESS, VAD_PADDING_MS, VAD_MIN_SPEECH_MS
+from backend.core.audio.pcm import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+# Margen sobre el ruido de fondo (percentil 10 de la energía) para considerar una trama como voz
+NOISE_MARGIN_DB = 10.0
+# Silencios internos más cortos que esto no separan regiones de voz
+MERGE_GAP_MS = 300
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+
+def _frame_energy_db(audio: np.ndarray) -> np.ndarray:
+    frames = len(audio) // FRAME_SAMPLES
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    blocks = audio[:frames * FRAME_SAMPLES].reshape(frames, FRAME_SAMPLES)
+    rms = np.sqrt(np.mean(blocks.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def _energy_flags(audio: np.ndarray, energy_db: float) -> np.ndarray:
+    energy = _frame_energy_db(audio)
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    # Umbral sobre el ruido de fondo, sin pasar del pico menos el margen (habla continua sin pausas)
+    adaptive = min(float(np.percentile(energy, 10)) + NOISE_MARGIN_DB, float(energy.max()) - NOISE_MARGIN_DB)
+    return energy > max(energy_db, adaptive)
+
+
+def _webrtc_flags(audio: np.ndarray, aggressiveness: int, energy_db: float) -> np.ndarray:
+    detector = webrtcvad.Vad(aggressiveness)
+    frames = len(audio) // FRAME_SAMPLES
+    pcm = (np.clip(audio[:frames * FRAME_SAMPLES], -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    step = FRAME_SAMPLES * 2
+    flags = np.array([detector.is_speech(pcm[i * step:(i + 1) * step], SAMPLE_RATE) for i in range(frames)], dtype=bool)
+    # webrtcvad marca como voz el ruido de línea fuerte; se exige además un mínimo de energía absoluta
+    return flags & (_frame_energy_db(audio) > energy_db)
+
+
+class VoiceActivityDetector:
+    """Regiones con voz de un audio float32 a 16 kHz, con contadores de audio ahorrado"""
+
+    def __init__(self, enabled: bool = VAD_ENABLED, energy_db: float = VAD_ENERGY_DB,
+                 aggressiveness: int = VAD_AGGRESSIVENESS, padding_ms: int = VAD_PADDING_MS,
+                 min_speech_ms: int = VAD_MIN_SPEECH_MS):
+        self.enabled = enabled
+        self.energy_db = energy_db
+        self.aggressiveness = aggressiveness
+        self.padding = SAMPLE_RATE * padding_ms // 1000
+        self.min_speech_frames = max(1, min_speech_ms // FRAME_MS)
+        self.backend = "webrtcvad" if webrtcvad is not None else "energy"
+        self._lock = threading.Lock()
+        self.received_seconds = 0.0
+        self.skipped_seconds = 0.0
+        self.trimmed_seconds = 0.0
+        self.fragments = 0
+        self.skipped_fragments = 0
+
+    def speech_regions(self, audio: np.ndarray) -> List[Tuple[int, int]]:
+        """Regiones (muestra inicial, muestra final) con voz, con margen y huecos cortos unidos"""
+        if webrtcvad is not None:
+            flags = _webrtc_flags(audio, self.aggressiveness, self.energy_db)
+        else:
+            flags = _energy_flags(audio, self.energy_db)
+        regions: List[Tuple[int, int]] = []
+        merge_gap = MERGE_GAP_MS // FRAME_MS
+        start = None
+        for i, speech in enumerate(np.append(flags, False)):
+            if speech and start is None:
+                start = i
+            elif not speech and start is not None:
+                if regions and start - regions[-1][1] <= merge_gap:
+                    regions[-1] = (regions[-1][0], i)
+                else:
+                    regions.append((start, i))
+                start = None
+        regions = [(s, e) for s, e in regions if e - s >= self.min_speech_frames]
+        return [
+            (max(0, s * FRAME_SAMPLES - self.padding), min(len(audio), e * FRAME_SAMPLES + self.padding))
+            for s, e in regions
+        ]
+
+    def has_speech(self, audio: np.ndarray) -> bool:
+        return not self.enabled or bool(self.speech_regions(audio))
+
+    def trim(self, audio: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Audio recortado desde la primera hasta la última región con voz, o None si no hay voz.
+        Los silencios internos se conservan para no alterar el ritmo del habla.
+        """
+        seconds = len(audio) / SAMPLE_RATE
+        if not self.enabled:
+            return audio
+        regions = self.speech_regions(audio)
+        if not regions:
+            self.record(seconds, skipped=seconds)
+            return None
+        start, end = regions[0][0], regions[-1][1]
+        self.record(seconds, trimmed=(len(audio) - (end - start)) / SAMPLE_RATE)
+        return audio[start:end]
+
+    def record(self, seconds: float, skipped: float = 0.0, trimmed: float = 0.0):
+        """Contabilizar audio recibido, descartado por silencio completo o recortado en los bordes"""
+        with self._lock:
+            self.fragments += 1
+            self.received_seconds += seconds
+            self.trimmed_seconds += trimmed
+            if skipped:
+                self.skipped_fragments += 1
+                self.skipped_seconds += skipped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self.skipped_seconds + self.trimmed_seconds
+            return {
+                "enabled": self.enabled,
+                "backend": self.backend,
+                "fragments": self.fragments,
+                "skipped_fragments": self.skipped_fragments,
+                "received_seconds": round(self.received_seconds, 1),
+                "skipped_seconds": round(self.skipped_seconds, 1),
+                "trimmed_seconds": round(self.trimmed_seconds, 1),
+                "saved_ratio": round(saved / self.received_seconds, 3) if self.received_seconds else 0.0,
+            }
+
+
+_vad_instance: Optional[VoiceActivityDetector] = None
+_instance_lock = threading.Lock()
+
+
+def get_vad() -> VoiceActivityDetector:
+    """Obtener instancia única del detector de voz"""
+    global _vad_instance
+    if _vad_instance is None:
+        with _instance_lock:
+            if _vad_instance is None:
+                _vad_instance = VoiceActivityDetector()
+    return _vad_instance
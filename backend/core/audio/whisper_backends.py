@@ -0,0 +1,196 @@
+"""
+Backends de inferencia Whisper para SENTINELA
+Todos los puntos de transcripción (pool de fragmentos, segunda pasada, lotes, AudioTranscriber)
+cargan el modelo con load_backend() según WHISPER_BACKEND:
+  - torch:          openai-whisper en PyTorch (fp32 en CPU, fp16 en GPU)
+  - torch-int8:     openai-whisper con cuantización dinámica int8 de las capas lineales (CPU)
+  - faster-whisper: CTranslate2 con WHISPER_COMPUTE_TYPE (int8 por defecto en CPU)
+Cada backend devuelve el mismo diccionario {"text", "language", "segments"} que
+whisper.transcribe(), con "words" en los segmentos si se pidieron word_timestamps.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.config import WHISPER_BACKEND, WHISPER_COMPUTE_TYPE
+from backend.core.audio.pcm import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TORCH = "torch"
+BACKEND_TORCH_INT8 = "torch-int8"
+BACKEND_FASTER_WHISPER = "faster-whisper"
+BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_FASTER_WHISPER)
+
+# Opciones de whisper.transcribe() que faster-whisper acepta con el mismo nombre
+FASTER_WHISPER_OPTIONS = {
+    "language", "task", "initial_prompt", "word_timestamps", "temperature", "beam_size", "best_of",
+    "patience", "condition_on_previous_text", "compression_ratio_threshold", "no_speech_threshold",
+    "suppress_tokens", "without_timestamps",
+}
+FASTER_WHISPER_RENAMED = {"logprob_threshold": "log_prob_threshold"}
+
+
+def backend_label(model_name: str, backend: str = WHISPER_BACKEND) -> str:
+    """
+    Nombre del modelo para la caché de transcripciones: un modelo cuantizado no produce
+    exactamente el mismo texto, así que sus resultados no se mezclan con los de torch
+    """
+    return model_name if backend == BACKEND_TORCH else f"{model_name}@{backend}"
+
+
+def load_audio(path: str) -> np.ndarray:
+    """Leer un archivo de audio como float32 mono a 16 kHz con la librería del backend instalado"""
+    try:
+        import whisper
+        return whisper.load_audio(path)
+    except ImportError:
+        from faster_whisper import decode_audio
+        return decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+
+class TranscriptionBackend(ABC):
+    """Interfaz común: transcribe(audio, **opciones de whisper.transcribe) -> dict"""
+
+    name = ""
+    # True si expone un modelo openai-whisper (`self.model`) apto para whisper.decode() en lote
+    supports_batch = False
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.model: Any = None
+
+    @property
+    def label(self) -> str:
+        return backend_label(self.model_name, self.name)
+
+    @abstractmethod
+    def transcribe(self, audio: Any, **options) -> Dict[str, Any]:
+        """Transcribir un archivo o arreglo de audio a 16 kHz"""
+        pass
+
+
+class TorchWhisperBackend(TranscriptionBackend):
+    """openai-whisper en PyTorch"""
+
+    name = BACKEND_TORCH
+    supports_batch = True
+
+    def __init__(self, model_name: str, device: Optional[str] = None, cpu_threads: int = 0):
+        super().__init__(model_name)
+        import torch
+        import whisper
+        if cpu_threads > 0:
+            torch.set_num_threads(cpu_threads)
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = self._load(whisper, torch)
+
+    def _load(self, whisper, torch):
+        return whisper.load_model(self.model_name, device=self.device)
+
+    def transcribe(self, audio: Any, **options) -> Dict[str, Any]:
+        if self.device == "cpu":
+            options["fp16"] = False  # fp16 no existe en CPU; whisper lo degradaría con una advertencia
+        result = self.model.transcribe(audio, **options)
+        return {
+            "text": result.get("text", ""),
+            "language": result.get("language", ""),
+            "segments": result.get("segments", []),
+        }
+
+
+class QuantizedTorchWhisperBackend(TorchWhisperBackend):
+    """
+    openai-whisper con cuantización dinámica int8 (torch.quantization.quantize_dynamic) de las
+    capas lineales, donde se va casi todo el tiempo del codificador y el decodificador en CPU
+    """
+
+    name = BACKEND_TORCH_INT8
+
+    def __init__(self, model_name: str, device: Optional[str] = None, cpu_threads: int = 0):
+        # Los kernels int8 dinámicos sólo existen en CPU
+        super().__init__(model_name, device="cpu", cpu_threads=cpu_threads)
+
+    def _load(self, whisper, torch):
+        model = whisper.load_model(self.model_name, device="cpu")
+        # whisper.model.Linear sólo redefine forward() para convertir el dtype de los pesos, lo que
+        # en fp32 no hace nada; quantize_dynamic reconoce únicamente nn.Linear exacto
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+                module.__class__ = torch.nn.Linear
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """faster-whisper (CTranslate2) con pesos cuantizados según `compute_type`"""
+
+    name = BACKEND_FASTER_WHISPER
+
+    def __init__(self, model_name: str, device: Optional[str] = None, cpu_threads: int = 0,
+                 compute_type: str = WHISPER_COMPUTE_TYPE):
+        super().__init__(model_name)
+        from faster_whisper import WhisperModel
+        self.device = device or "auto"
+        self.compute_type = compute_type
+        self.model = WhisperModel(model_name, device=self.device, compute_type=compute_type,
+                                  cpu_threads=max(0, cpu_threads))
+
+    @staticmethod
+    def _options(options: Dict[str, Any]) -> Dict[str, Any]:
+        opts = {k: v for k, v in options.items() if k in FASTER_WHISPER_OPTIONS}
+        for old, new in FASTER_WHISPER_RENAMED.items():
+            if old in options:
+                opts[new] = options[old]
+        if isinstance(opts.get("temperature"), tuple):
+            opts["temperature"] = list(opts["temperature"])
+        return opts
+
+    def transcribe(self, audio: Any, **options) -> Dict[str, Any]:
+        if isinstance(audio, np.ndarray):
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+        segments_iter, info = self.model.transcribe(audio, **self._options(options))
+        segments: List[Dict[str, Any]] = []
+        for seg in segments_iter:  # Generador: la decodificación ocurre al recorrerlo
+            segment = {
+                "id": seg.id,
+                "seek": seg.seek,
+                "start": round(seg.start, 2),
+                "end": round(seg.end, 2),
+                "text": seg.text,
+                "tokens": list(seg.tokens),
+                "temperature": seg.temperature,
+                "avg_logprob": seg.avg_logprob,
+                "compression_ratio": seg.compression_ratio,
+                "no_speech_prob": seg.no_speech_prob,
+            }
+            if seg.words is not None:
+                segment["words"] = [
+                    {"word": w.word, "start": round(w.start, 2), "end": round(w.end, 2), "probability": w.probability}
+                    for w in seg.words
+                ]
+            segments.append(segment)
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "language": info.language or "",
+            "segments": segments,
+        }
+
+
+_BACKEND_CLASSES = {
+    BACKEND_TORCH: TorchWhisperBackend,
+    BACKEND_TORCH_INT8: QuantizedTorchWhisperBackend,
+    BACKEND_FASTER_WHISPER: FasterWhisperBackend,
+}
+
+
+def load_backend(model_name: str, backend: str = WHISPER_BACKEND, device: Optional[str] = None,
+                 cpu_threads: int = 0) -> TranscriptionBackend:
+    """Cargar el modelo `model_name` con el backend indicado (WHISPER_BACKEND por defecto)"""
+    if backend not in _BACKEND_CLASSES:
+        raise ValueError(f"WHISPER_BACKEND desconocido: {backend!r} (opciones: {', '.join(BACKENDS)})")
+    instance = _BACKEND_CLASSES[backend](model_name, device=device, cpu_threads=cpu_threads)
+    logger.info(f"🧠 Modelo Whisper '{model_name}' cargado con backend {backend}")
+    return instance
@@ -0,0 +1,363 @@
+"""
+Estadísticas diarias de llamadas (tabla call_stats_daily)
+Una fila por (PIN, fecha) con el número de llamadas, la duración total y el riesgo máximo. Lo
+mantienen triggers AFTER INSERT / UPDATE sobre calls / call_details, en la misma transacción que cada
+inserción y para cualquier escritor (ORM, sqlite3 directo, scripts en otros procesos); los
+gráficos por día, semana o mes leen unas pocas filas por PIN sin importar cuántas llamadas haya.
+Las migraciones 2 y 3 crean la tabla y los triggers; si el resumen se desincroniza (restauraciones,
+borrados), se reconstruye desde cero:
+
+    python -m backend.core.database.call_stats --rebuild
+"""
+
+import argparse
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+
+from backend.db_call_details import Call, CallDailyStats, CallDetails
+
+logger = logging.getLogger(__name__)
+
+STATS_TABLE = CallDailyStats.__table__
+PERIODS = ("dia", "semana", "mes")
+
+TRIGGER_NAMES = {
+    Call.__tablename__: ("call_stats_calls_ai",),
+    CallDetails.__tablename__: ("call_stats_call_details_ai", "call_stats_call_details_au"),
+}
+
+# Columnas del resumen en el orden de los INSERT de los triggers
+_STATS_COLUMNS = "pin_emitter, date, call_count, total_duration_seconds, max_risk_level"
+
+
+def _sqlite_duration(d: str) -> str:
+    """Segundos de una duración en SQL de SQLite (mismo criterio que duration_seconds)"""
+    rest = f"substr({d}, instr({d}, ':') + 1)"
+    head = f"CAST(substr({d}, 1, instr({d}, ':') - 1) AS INTEGER)"
+    return (
+        f"CASE WHEN {d} IS NULL OR {d} = '' THEN 0 "
+        f"WHEN instr({d}, ':') = 0 THEN MAX(0, CAST({d} AS INTEGER)) "
+        f"WHEN instr({rest}, ':') = 0 THEN {head} * 60 + CAST({rest} AS INTEGER) "
+        f"ELSE {head} * 3600 + CAST(substr({rest}, 1, instr({rest}, ':') - 1) AS INTEGER) * 60 "
+        f"+ CAST(substr({rest}, instr({rest}, ':') + 1) AS INTEGER) END"
+    )
+
+
+def _mysql_duration(d: str) -> str:
+    return (
+        f"CASE WHEN {d} REGEXP '^[0-9]+([.][0-9]+)?$' THEN FLOOR({d}) "
+        f"WHEN {d} REGEXP '^[0-9]+:[0-9]+([.][0-9]+)?$' "
+        f"THEN SUBSTRING_INDEX({d}, ':', 1) * 60 + FLOOR(SUBSTRING_INDEX({d}, ':', -1)) "
+        f"WHEN {d} REGEXP '^[0-9]+:[0-9]+:[0-9]+([.][0-9]+)?$' "
+        f"THEN SUBSTRING_INDEX({d}, ':', 1) * 3600 + SUBSTRING_INDEX(SUBSTRING_INDEX({d}, ':', 2), ':', -1) * 60 "
+        f"+ FLOOR(SUBSTRING_INDEX({d}, ':', -1)) ELSE 0 END"
+    )
+
+
+# Triggers que mantienen el resumen con cada INSERT en calls / call_details, venga de donde venga
+# (ORM, sqlite3 directo, otro proceso), y al cambiar la duración o el riesgo de un detalle (el
+# riesgo máximo del día se recalcula: pudo bajar). Por tabla: sentencias que los (re)crean.
+_SAME_DAY_MAX_RISK = (
+    "SELECT MAX(d.risk_level) FROM calls c2 JOIN call_details d ON d.call_id = c2.id "
+    "WHERE c2.pin_emitter = {pin} AND c2.date = {date}"
+)
+TRIGGER_SQL = {
+    "sqlite": {
+        Call.__tablename__: [
+            "DROP TRIGGER IF EXISTS call_stats_calls_ai",
+            f"""
+            CREATE TRIGGER call_stats_calls_ai AFTER INSERT ON calls BEGIN
+                INSERT INTO call_stats_daily ({_STATS_COLUMNS})
+                VALUES (NEW.pin_emitter, NEW.date, 1, 0, NULL)
+                ON CONFLICT (pin_emitter, date) DO UPDATE SET call_count = call_stats_daily.call_count + 1;
+            END
+            """,
+        ],
+        CallDetails.__tablename__: [
+            "DROP TRIGGER IF EXISTS call_stats_call_details_ai",
+            f"""
+            CREATE TRIGGER call_stats_call_details_ai AFTER INSERT ON call_details BEGIN
+                INSERT INTO call_stats_daily ({_STATS_COLUMNS})
+                SELECT c.pin_emitter, c.date, 0, {_sqlite_duration("NEW.duration")}, NEW.risk_level
+                FROM calls c WHERE c.id = NEW.call_id
+                ON CONFLICT (pin_emitter, date) DO UPDATE SET
+                    total_duration_seconds = call_stats_daily.total_duration_seconds + excluded.total_duration_seconds,
+                    max_risk_level = MAX(COALESCE(call_stats_daily.max_risk_level, excluded.max_risk_level),
+                                         COALESCE(excluded.max_risk_level, call_stats_daily.max_risk_level));
+            END
+            """,
+            "DROP TRIGGER IF EXISTS call_stats_call_details_au",
+            f"""
+            CREATE TRIGGER call_stats_call_details_au AFTER UPDATE OF duration, risk_level ON call_details BEGIN
+                UPDATE call_stats_daily SET
+                    total_duration_seconds = total_duration_seconds
+                        - ({_sqlite_duration("OLD.duration")}) + ({_sqlite_duration("NEW.duration")}),
+                    max_risk_level = ({_SAME_DAY_MAX_RISK.format(pin="call_stats_daily.pin_emitter",
+                                                                 date="call_stats_daily.date")})
+                WHERE pin_emitter = (SELECT c.pin_emitter FROM calls c WHERE c.id = NEW.call_id)
+                  AND date = (SELECT c.date FROM calls c WHERE c.id = NEW.call_id);
+            END
+            """,
+        ],
+    },
+    "postgresql": {
+        Call.__tablename__: [
+            f"""
+            CREATE OR REPLACE FUNCTION call_stats_calls_ai() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO call_stats_daily ({_STATS_COLUMNS})
+                VALUES (NEW.pin_emitter, NEW.date, 1, 0, NULL)
+                ON CONFLICT (pin_emitter, date) DO UPDATE SET call_count = call_stats_daily.call_count + 1;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS call_stats_calls_ai ON calls",
+            "CREATE TRIGGER call_stats_calls_ai AFTER INSERT ON calls "
+            "FOR EACH ROW EXECUTE PROCEDURE call_stats_calls_ai()",
+        ],
+        CallDetails.__tablename__: [
+            """
+            CREATE OR REPLACE FUNCTION call_stats_duration_seconds(d text) RETURNS integer AS $$
+                SELECT CASE
+                    WHEN btrim(d) ~ '^[0-9]+([.][0-9]+)?$' THEN trunc(btrim(d)::numeric)::integer
+                    WHEN btrim(d) ~ '^[0-9]+:[0-9]+([.][0-9]+)?$'
+                        THEN split_part(btrim(d), ':', 1)::integer * 60
+                             + trunc(split_part(btrim(d), ':', 2)::numeric)::integer
+                    WHEN btrim(d) ~ '^[0-9]+:[0-9]+:[0-9]+([.][0-9]+)?$'
+                        THEN split_part(btrim(d), ':', 1)::integer * 3600
+                             + split_part(btrim(d), ':', 2)::integer * 60
+                             + trunc(split_part(btrim(d), ':', 3)::numeric)::integer
+                    ELSE 0 END
+            $$ LANGUAGE sql IMMUTABLE
+            """,
+            f"""
+            CREATE OR REPLACE FUNCTION call_stats_call_details_ai() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO call_stats_daily ({_STATS_COLUMNS})
+                SELECT c.pin_emitter, c.date, 0, call_stats_duration_seconds(NEW.duration), NEW.risk_level
+                FROM calls c WHERE c.id = NEW.call_id
+                ON CONFLICT (pin_emitter, date) DO UPDATE SET
+                    total_duration_seconds = call_stats_daily.total_duration_seconds + EXCLUDED.total_duration_seconds,
+                    max_risk_level = GREATEST(call_stats_daily.max_risk_level, EXCLUDED.max_risk_level);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS call_stats_call_details_ai ON call_details",
+            "CREATE TRIGGER call_stats_call_details_ai AFTER INSERT ON call_details "
+            "FOR EACH ROW EXECUTE PROCEDURE call_stats_call_details_ai()",
+            f"""
+            CREATE OR REPLACE FUNCTION call_stats_call_details_au() RETURNS trigger AS $$
+            BEGIN
+                UPDATE call_stats_daily s SET
+                    total_duration_seconds = s.total_duration_seconds
+                        - call_stats_duration_seconds(OLD.duration) + call_stats_duration_seconds(NEW.duration),
+                    max_risk_level = ({_SAME_DAY_MAX_RISK.format(pin="s.pin_emitter", date="s.date")})
+                FROM calls c
+                WHERE c.id = NEW.call_id AND s.pin_emitter = c.pin_emitter AND s.date = c.date;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS call_stats_call_details_au ON call_details",
+            "CREATE TRIGGER call_stats_call_details_au AFTER UPDATE OF duration, risk_level ON call_details "
+            "FOR EACH ROW EXECUTE PROCEDURE call_stats_call_details_au()",
+        ],
+    },
+    "mysql": {
+        Call.__tablename__: [
+            "DROP TRIGGER IF EXISTS call_stats_calls_ai",
+            f"""
+            CREATE TRIGGER call_stats_calls_ai AFTER INSERT ON calls FOR EACH ROW
+                INSERT INTO call_stats_daily ({_STATS_COLUMNS})
+                VALUES (NEW.pin_emitter, NEW.date, 1, 0, NULL)
+                ON DUPLICATE KEY UPDATE call_count = call_count + 1
+            """,
+        ],
+        CallDetails.__tablename__: [
+            "DROP TRIGGER IF EXISTS call_stats_call_details_ai",
+            f"""
+            CREATE TRIGGER call_stats_call_details_ai AFTER INSERT ON call_details FOR EACH ROW
+                INSERT INTO call_stats_daily ({_STATS_COLUMNS})
+                SELECT c.pin_emitter, c.date, 0, {_mysql_duration("NEW.duration")}, NEW.risk_level
+                FROM calls c WHERE c.id = NEW.call_id
+                ON DUPLICATE KEY UPDATE
+                    total_duration_seconds = total_duration_seconds + VALUES(total_duration_seconds),
+                    max_risk_level = GREATEST(COALESCE(max_risk_level, VALUES(max_risk_level)),
+                                              COALESCE(VALUES(max_risk_level), max_risk_level))
+            """,
+            "DROP TRIGGER IF EXISTS call_stats_call_details_au",
+            f"""
+            CREATE TRIGGER call_stats_call_details_au AFTER UPDATE ON call_details FOR EACH ROW
+                UPDATE call_stats_daily s JOIN calls c
+                    ON c.id = NEW.call_id AND s.pin_emitter = c.pin_emitter AND s.date = c.date
+                SET s.total_duration_seconds = s.total_duration_seconds
+                        - ({_mysql_duration("OLD.duration")}) + ({_mysql_duration("NEW.duration")}),
+                    s.max_risk_level = ({_SAME_DAY_MAX_RISK.format(pin="c.pin_emitter", date="c.date")})
+            """,
+        ],
+    },
+}
+
+
+def duration_seconds(duration: Any) -> int:
+    """Segundos de una duración de call_details ("hh:mm:ss", "mm:ss" o número); 0 si no se entiende"""
+    if duration is None or duration == "":
+        return 0
+    if isinstance(duration, (int, float)):
+        return max(0, int(duration))
+    try:
+        seconds = 0.0
+        for part in str(duration).strip().split(":"):
+            seconds = seconds * 60 + float(part)
+        return max(0, int(seconds))
+    except ValueError:
+        return 0
+
+
+def _existing_triggers(conn: Connection) -> set:
+    if conn.dialect.name == "sqlite":
+        sql = "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    elif conn.dialect.name == "postgresql":
+        sql = "SELECT trigger_name FROM information_schema.triggers WHERE trigger_schema = current_schema()"
+    else:
+        sql = "SELECT trigger_name FROM information_schema.triggers WHERE trigger_schema = DATABASE()"
+    return {row[0] for row in conn.exec_driver_sql(sql)}
+
+
+def install_call_stats_triggers(conn: Connection) -> List[str]:
+    """(Re)crear los triggers del resumen en las tablas calls / call_details que existan"""
+    statements = TRIGGER_SQL.get(conn.dialect.name)
+    if statements is None:
+        raise ValueError(f"Sin triggers de call_stats_daily para el dialecto {conn.dialect.name}")
+    tables = set(inspect(conn).get_table_names())
+    installed = []
+    for table, sqls in statements.items():
+        if table not in tables:
+            continue  # Se instalan al crear la tabla (ensure_call_stats desde db_call_details)
+        for sql in sqls:
+            conn.exec_driver_sql(sql)
+        installed.extend(TRIGGER_NAMES[table])
+    return installed
+
+
+def rebuild_call_stats(conn: Connection) -> int:
+    """
+    Recalcular call_stats_daily desde calls / call_details e instalar los triggers que lo
+    mantienen; devuelve las filas (PIN, fecha)
+    """
+    # CreateTable directo: no dispara el evento after_create que vuelve a llamar a esta función
+    conn.execute(CreateTable(STATS_TABLE, if_not_exists=True))
+    install_call_stats_triggers(conn)
+    conn.execute(STATS_TABLE.delete())
+    tables = set(inspect(conn).get_table_names())
+    if Call.__tablename__ not in tables:
+        return 0
+    if CallDetails.__tablename__ in tables:
+        q = select(Call.pin_emitter, Call.date, CallDetails.duration, CallDetails.risk_level) \
+            .outerjoin(CallDetails, Call.id == CallDetails.call_id)
+    else:
+        q = select(Call.pin_emitter, Call.date)
+    totals: Dict[tuple, Dict[str, Any]] = {}
+    for row in conn.execute(q.execution_options(yield_per=5000)):
+        fila = totals.setdefault((row.pin_emitter, row.date), {
+            "pin_emitter": row.pin_emitter, "date": row.date,
+            "call_count": 0, "total_duration_seconds": 0, "max_risk_level": None,
+        })
+        fila["call_count"] += 1
+        fila["total_duration_seconds"] += duration_seconds(getattr(row, "duration", None))
+        risk = getattr(row, "risk_level", None)
+        if risk is not None and (fila["max_risk_level"] is None or risk > fila["max_risk_level"]):
+            fila["max_risk_level"] = risk
+    if totals:
+        conn.execute(STATS_TABLE.insert(), list(totals.values()))
+    return len(totals)
+
+
+def ensure_call_stats(conn: Connection):
+    """
+    Dejar el resumen listo en esta base: si falta la tabla o algún trigger de una tabla existente
+    (base nueva, creada por un script o anterior a los triggers), se reconstruye completo
+    """
+    tables = set(inspect(conn).get_table_names())
+    expected = {name for t in TRIGGER_NAMES if t in tables for name in TRIGGER_NAMES[t]}
+    if STATS_TABLE.name in tables and expected <= _existing_triggers(conn):
+        return
+    filas = rebuild_call_stats(conn)
+    logger.info(f"📊 Resumen diario de llamadas reconstruido ({filas} filas)")
+
+
+def rebuild(engine: Optional[Engine] = None) -> int:
+    if engine is None:
+        from backend.db import engine
+    with engine.begin() as conn:
+        return rebuild_call_stats(conn)
+
+
+def daily_stats_query(pin: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None):
+    """Totales por fecha (de uno o de todos los PINs) leídos del resumen, en orden cronológico"""
+    t = CallDailyStats
+    q = select(
+        t.date,
+        func.sum(t.call_count).label("llamadas"),
+        func.sum(t.total_duration_seconds).label("duracion_total"),
+        func.max(t.max_risk_level).label("riesgo_max"),
+    )
+    if pin:
+        q = q.where(t.pin_emitter == pin)
+    if start:
+        q = q.where(t.date >= start)
+    if end:
+        q = q.where(t.date <= end)
+    return q.group_by(t.date).order_by(t.date)
+
+
+def _period_key(date: str, period: str) -> str:
+    """Inicio del periodo de una fecha: la misma fecha, el lunes de su semana o "AAAA-MM" """
+    if period == "mes":
+        return date[:7]
+    if period == "semana":
+        try:
+            day = datetime.strptime(date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return date
+        return (day - timedelta(days=day.weekday())).strftime("%Y-%m-%d")
+    return date
+
+
+def group_by_period(rows: Iterable[Any], period: str = "dia") -> List[Dict[str, Any]]:
+    """Agrupar las filas de daily_stats_query() por día, semana (desde el lunes) o mes"""
+    if period not in PERIODS:
+        raise ValueError(f"Periodo desconocido: {period!r} (opciones: {', '.join(PERIODS)})")
+    grouped: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for row in rows:
+        key = _period_key(row.date, period)
+        item = grouped.setdefault(key, {"periodo": key, "llamadas": 0, "duracion_total": 0, "riesgo_max": None})
+        item["llamadas"] += int(row.llamadas or 0)
+        item["duracion_total"] += int(row.duracion_total or 0)
+        if row.riesgo_max is not None and (item["riesgo_max"] is None or row.riesgo_max > item["riesgo_max"]):
+            item["riesgo_max"] = row.riesgo_max
+    return list(grouped.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen diario de llamadas (call_stats_daily)")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcular el resumen desde calls / call_details")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not args.rebuild:
+        parser.print_help()
+        return
+    filas = rebuild()
+    print(f"✅ Resumen diario reconstruido: {filas} filas (PIN, fecha)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Migraciones versionadas del esquema principal de SENTINELA
+Cada migración tiene un número de versión y se aplica una sola vez; las aplicadas quedan en la
+tabla schema_migrations. create_all() crea las tablas nuevas con sus índices, pero no toca las
+tablas que ya existen: los cambios sobre bases en producción (índices, columnas) van aquí.
+
+    python -m backend.core.database.migrations            # aplicar pendientes
+    python -m backend.core.database.migrations --status   # ver versión actual
+"""
+
+import argparse
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+def _create_model_indexes(conn: Connection, models, names):
+    """
+    Crear los índices `names` declarados en los modelos (si su tabla existe y el índice no) y
+    actualizar las estadísticas del planificador de esas tablas para que los empiece a usar
+    """
+    existing_tables = set(inspect(conn).get_table_names())
+    touched = []
+    for model in models:
+        table = model.__table__
+        if table.name not in existing_tables:
+            continue  # create_all() creará la tabla ya con sus índices
+        for index in table.indexes:
+            if index.name in names:
+                index.create(bind=conn, checkfirst=True)
+                logger.info(f"🗂️ Índice {index.name} listo en {table.name}")
+                touched.append(table.name)
+    for table_name in dict.fromkeys(touched):
+        if conn.dialect.name in ("sqlite", "postgresql"):
+            conn.exec_driver_sql(f"ANALYZE {table_name}")
+        elif conn.dialect.name == "mysql":
+            conn.exec_driver_sql(f"ANALYZE TABLE {table_name}")
+
+
+def _m001_calls_indexes(conn: Connection):
+    from backend.db_call_details import Call, CallDetails
+    _create_model_indexes(conn, (Call, CallDetails), {
+        "ix_calls_pin_emitter_date",
+        "ix_calls_pin_emitter_phone_number",
+        "ix_calls_phone_number_pin_emitter",
+        "ix_call_details_risk_level_created_at",
+        "ix_call_details_created_at",
+    })
+
+
+def _m002_call_stats_daily(conn: Connection):
+    from backend.core.database.call_stats import rebuild_call_stats
+    filas = rebuild_call_stats(conn)
+    logger.info(f"📊 Resumen diario de llamadas creado ({filas} filas)")
+
+
+def _m003_call_stats_update_trigger(conn: Connection):
+    # El trigger AFTER UPDATE de call_details es posterior a la migración 2: reinstalar los
+    # triggers y recalcular, el riesgo máximo de las bases ya migradas pudo quedar desfasado
+    from backend.core.database.call_stats import rebuild_call_stats
+    filas = rebuild_call_stats(conn)
+    logger.info(f"📊 Resumen diario de llamadas recalculado ({filas} filas)")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "indices compuestos de calls y call_details", _m001_calls_indexes),
+    Migration(2, "resumen diario de llamadas (call_stats_daily)", _m002_call_stats_daily),
+    Migration(3, "trigger de actualización de call_details en call_stats_daily", _m003_call_stats_update_trigger),
+]
+
+
+def _engine(engine: Optional[Engine]) -> Engine:
+    if engine is None:
+        from backend.db import engine as default_engine
+        return default_engine
+    return engine
+
+
+def current_version(engine: Optional[Engine] = None) -> int:
+    with _engine(engine).connect() as conn:
+        if not inspect(conn).has_table(schema_migrations.name):
+            return 0
+        versions = conn.execute(select(schema_migrations.c.version)).scalars().all()
+    return max(versions, default=0)
+
+
+def apply_migrations(engine: Optional[Engine] = None) -> List[int]:
+    """Aplicar en orden las migraciones pendientes (cada una en su transacción); devuelve las aplicadas"""
+    engine = _engine(engine)
+    _metadata.create_all(engine)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars().all())
+    done = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        logger.info(f"🔧 Aplicando migración {migration.version}: {migration.name}")
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=migration.version, name=migration.name, applied_at=datetime.utcnow(),
+            ))
+        done.append(migration.version)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de SENTINELA")
+    parser.add_argument("--status", action="store_true", help="Mostrar la versión actual sin aplicar nada")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    latest = max((m.version for m in MIGRATIONS), default=0)
+    if args.status:
+        print(f"📋 Esquema en versión {current_version()} (última disponible: {latest})")
+        return
+    done = apply_migrations()
+    if done:
+        print(f"✅ Migraciones aplicadas: {', '.join(map(str, done))}")
+    else:
+        print(f"✅ Esquema al día (versión {latest})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Configuración común de las conexiones SQLite de SENTINELA
+Toda conexión a transcripts.db y a las bases de caché pasa por configure_connection(): modo WAL
+(los lectores no bloquean al escritor ni al revés), synchronous=NORMAL, memoria mapeada y
+busy_timeout, para que un escritor espere su turno en lugar de fallar con "database is locked".
+Los motores SQLAlchemy la aplican con install_sqlite_pragmas(); las conexiones sqlite3 directas
+se abren con connect().
+"""
+
+import logging
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.config import SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_SYNCHRONOUS
+
+logger = logging.getLogger(__name__)
+
+
+def configure_connection(conn) -> None:
+    """Aplicar los PRAGMA comunes a una conexión DB-API de SQLite (sqlite3, aiosqlite adaptada)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+    finally:
+        cursor.close()
+
+
+def connect(db_path: str, **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect() con los PRAGMA comunes (crea el directorio de la base si no existe)"""
+    if db_path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    kwargs.setdefault("timeout", SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn = sqlite3.connect(db_path, **kwargs)
+    configure_connection(conn)
+    return conn
+
+
+def install_sqlite_pragmas(engine) -> None:
+    """Aplicar los PRAGMA comunes a cada conexión nueva de un motor SQLAlchemy SQLite (sync o async)"""
+    sync_engine: Engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return
+    event.listen(sync_engine, "connect", lambda dbapi_conn, _record: configure_connection(dbapi_conn))
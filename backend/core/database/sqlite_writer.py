@@ -0,0 +1,188 @@
+"""
+Escritor único por base SQLite
+SQLite admite un solo escritor a la vez: con varios hilos escribiendo cada uno su transacción,
+se turnan el bloqueo y cada commit paga su propio fsync. SQLiteWriter recibe las escrituras en
+una cola y las aplica desde un hilo dedicado, agrupando todas las que llegaron juntas en una
+sola transacción (un commit por lote). Cada escritura va en su SAVEPOINT: si una falla, se
+descarta sólo esa y el resto del lote se confirma.
+
+    get_sqlite_writer(db_path).execute("INSERT ...", params)     # espera el commit
+    get_sqlite_writer(db_path).submit(lambda conn: ...)           # Future con el resultado
+    get_sqlite_writer(db_path).post(lambda conn: ..., "qué")      # sin esperar (handlers async)
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from backend.config import SQLITE_WRITER_BATCH_SIZE, SQLITE_WRITER_WINDOW_MS
+from backend.core.database.sqlite_setup import connect
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+
+class SQLiteWriter:
+    """Hilo escritor de una base SQLite con commits por lote"""
+
+    def __init__(self, db_path: str, batch_size: int = SQLITE_WRITER_BATCH_SIZE,
+                 window_ms: int = SQLITE_WRITER_WINDOW_MS, row_factory: Any = sqlite3.Row):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.window = max(0, window_ms) / 1000
+        self.row_factory = row_factory
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.writes = 0
+        self.commits = 0
+        self.errors = 0
+
+    # ---- API --------------------------------------------------------------
+
+    def submit(self, fn: WriteFn) -> Future:
+        """Encolar `fn(conn)`; el Future se resuelve con su resultado cuando el lote se confirma"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def post(self, fn: WriteFn, what: str = "escritura") -> Future:
+        """
+        Encolar `fn(conn)` sin esperar el commit; un error sólo se registra en el log. Para
+        escrituras de mantenimiento (catálogo, índice) desde handlers async, que no deben
+        bloquear el event loop esperando al escritor.
+        """
+        future = self.submit(fn)
+        future.add_done_callback(lambda f: f.exception() and logger.warning(
+            f"⚠️ Falló {what} en {self.db_path}: {f.exception()}"))
+        return future
+
+    def execute(self, sql: str, params: Sequence[Any] = (), timeout: Optional[float] = None) -> int:
+        """Ejecutar una sentencia y esperar su commit; devuelve las filas afectadas"""
+        return self.submit(lambda conn: conn.execute(sql, params).rowcount).result(timeout)
+
+    def executemany(self, sql: str, rows: Sequence[Sequence[Any]], timeout: Optional[float] = None) -> int:
+        return self.submit(lambda conn: conn.executemany(sql, rows).rowcount).result(timeout)
+
+    def call(self, fn: WriteFn, timeout: Optional[float] = None) -> Any:
+        """Ejecutar `fn(conn)` en el hilo escritor y esperar su commit"""
+        if threading.current_thread() is self._thread:
+            return fn(self._conn)  # Escritura anidada dentro de otra del mismo lote
+        return self.submit(fn).result(timeout)
+
+    def stop(self, timeout: Optional[float] = 10):
+        """Confirmar lo pendiente y detener el hilo"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"db_path": self.db_path, "writes": self.writes, "commits": self.commits,
+                "errors": self.errors, "pending": self._queue.qsize()}
+
+    # ---- Hilo escritor ----------------------------------------------------
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"sqlite-writer:{os.path.basename(self.db_path)}",
+                                                daemon=True)
+                self._thread.start()
+
+    def _next_batch(self, first):
+        """El primer pedido más los que lleguen dentro de la ventana, hasta batch_size"""
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get(timeout=self.window) if self.window else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _run(self):
+        # isolation_level=None: las transacciones se controlan aquí con BEGIN/COMMIT explícitos
+        self._conn = connect(self.db_path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = self.row_factory
+        stopping = False
+        while not stopping:
+            batch = self._next_batch(self._queue.get())
+            stopping = batch[-1] is _STOP
+            writes = [item for item in batch if item is not _STOP]
+            if writes:
+                self._apply(writes)
+        self._conn.close()
+
+    def _apply(self, writes):
+        conn = self._conn
+        done = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in writes:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT sentinela_write")
+                try:
+                    result = fn(conn)
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO sentinela_write")
+                    conn.execute("RELEASE sentinela_write")
+                    self.errors += 1
+                    future.set_exception(e)
+                    continue
+                conn.execute("RELEASE sentinela_write")
+                done.append((future, result))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"❌ Falló el commit del lote en {self.db_path}: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.errors += len(writes)
+            for future, _ in done:
+                future.set_exception(e)
+            for _, future in writes:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.commits += 1
+        self.writes += len(done)
+        for future, result in done:
+            future.set_result(result)
+
+
+_writers: Dict[str, SQLiteWriter] = {}
+_instance_lock = threading.Lock()
+
+
+def get_sqlite_writer(db_path: str) -> SQLiteWriter:
+    """Obtener el escritor único de una base (uno por archivo y por proceso)"""
+    key = os.path.abspath(db_path)
+    writer = _writers.get(key)
+    if writer is None:
+        with _instance_lock:
+            writer = _writers.get(key)
+            if writer is None:
+                writer = _writers[key] = SQLiteWriter(key)
+    return writer
+
+
+@atexit.register
+def stop_sqlite_writers():
+    """Confirmar las escrituras pendientes de todos los escritores (apagado del proceso)"""
+    for writer in list(_writers.values()):
+        writer.stop()
@@ -0,0 +1,266 @@
+"""
+Registro central de modelos para SENTINELA
+Los modelos (spaCy, pipelines de HuggingFace, BART, SentenceTransformer...) se registran con una
+función de carga y sólo se cargan la primera vez que alguien los pide. Cada modelo tiene su propio
+candado, así dos peticiones simultáneas no lo cargan dos veces. Los modelos inactivos se descargan
+por TTL y, si se supera el presupuesto de memoria, se libera primero el usado hace más tiempo (LRU).
+Una carga fallida se recuerda durante MODEL_FAILURE_TTL_SECONDS: las peticiones siguientes fallan
+al momento en lugar de reintentar la carga cada vez.
+"""
+
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.config import MODEL_MEMORY_BUDGET_MB, MODEL_IDLE_TTL_SECONDS, MODEL_FAILURE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss_mb() -> float:
+    """Memoria residente del proceso en MB (psutil si está instalado; si no, /proc)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss: pico en KB (Linux) o bytes (macOS); mejor aproximación disponible
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class ModelNotRegisteredError(KeyError):
+    """Se pidió un modelo que nadie registró"""
+
+
+class ModelLoadFailedError(RuntimeError):
+    """La carga del modelo falló hace poco y no se reintenta hasta que venza MODEL_FAILURE_TTL_SECONDS"""
+
+
+class _ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], Any], size_mb: Optional[float], pinned: bool):
+        self.name = name
+        self.loader = loader
+        self.declared_size_mb = size_mb
+        self.pinned = pinned
+        self.lock = threading.Lock()
+        self.model: Any = None
+        self.loaded = False
+        self.size_mb = 0.0
+        self.last_used = 0.0
+        self.loads = 0
+        self.unloads = 0
+        self.hits = 0
+        self.load_seconds = 0.0
+        self.last_error: Optional[str] = None
+        self.failed_at: Optional[float] = None
+
+
+class ModelRegistry:
+    """Carga perezosa, uso compartido y expulsión LRU/TTL de modelos"""
+
+    def __init__(self, memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB,
+                 idle_ttl_seconds: float = MODEL_IDLE_TTL_SECONDS,
+                 failure_ttl_seconds: float = MODEL_FAILURE_TTL_SECONDS):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._lock = threading.Lock()
+        self._load_listeners: List[Callable[[str, float, float], None]] = []
+        self._reaper: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any], size_mb: Optional[float] = None,
+                 pinned: bool = False):
+        """
+        Registrar un modelo sin cargarlo. `size_mb` es una estimación opcional (si no, se mide
+        la diferencia de memoria residente al cargar); los modelos `pinned` nunca se expulsan.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self._entries[name] = _ModelEntry(name, loader, size_mb, pinned)
+            else:
+                entry.loader, entry.declared_size_mb, entry.pinned = loader, size_mb, pinned
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._entries
+
+    def add_load_listener(self, listener: Callable[[str, float, float], None]):
+        """Función llamada como listener(nombre, segundos, MB) después de cada carga (una vez aunque se agregue de nuevo)"""
+        if listener not in self._load_listeners:
+            self._load_listeners.append(listener)
+
+    def _entry(self, name: str) -> _ModelEntry:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise ModelNotRegisteredError(name)
+        return entry
+
+    def get(self, name: str, retry: bool = False) -> Any:
+        """
+        Obtener el modelo, cargándolo si hace falta (una sola carga aunque haya llamadas concurrentes).
+        Si la última carga falló hace menos de failure_ttl_seconds lanza ModelLoadFailedError sin
+        reintentar, salvo con `retry`.
+        """
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.loaded:
+                entry.hits += 1
+            else:
+                if (not retry and entry.failed_at is not None
+                        and time.monotonic() - entry.failed_at < self.failure_ttl_seconds):
+                    raise ModelLoadFailedError(f"La carga de '{name}' falló recientemente: {entry.last_error}")
+                self._load(entry)
+            entry.last_used = time.monotonic()
+            model = entry.model
+        self._enforce_budget(keep=name)
+        return model
+
+    def _load(self, entry: _ModelEntry):
+        logger.info(f"📦 Cargando modelo '{entry.name}'...")
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        try:
+            model = entry.loader()
+        except Exception as e:
+            entry.last_error = str(e)
+            entry.failed_at = time.monotonic()
+            logger.warning(f"⚠️ No se pudo cargar el modelo '{entry.name}': {e}")
+            raise
+        elapsed = time.perf_counter() - start
+        measured = max(0.0, current_rss_mb() - rss_before)
+        entry.model = model
+        entry.size_mb = entry.declared_size_mb if entry.declared_size_mb is not None else measured
+        entry.loaded = True
+        entry.loads += 1
+        entry.load_seconds = elapsed
+        entry.last_error = None
+        entry.failed_at = None
+        logger.info(f"✅ Modelo '{entry.name}' cargado en {elapsed:.1f} s (~{entry.size_mb:.0f} MB)")
+        for listener in self._load_listeners:
+            try:
+                listener(entry.name, elapsed, measured)
+            except Exception:
+                logger.exception("Error en listener de carga de modelos")
+        self._start_reaper()
+
+    def unload(self, name: str) -> bool:
+        """Liberar un modelo; quien aún tenga una referencia puede terminar de usarlo"""
+        entry = self._entry(name)
+        with entry.lock:
+            if not entry.loaded:
+                return False
+            entry.model = None
+            entry.loaded = False
+            entry.unloads += 1
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info(f"🧹 Modelo '{name}' descargado")
+        return True
+
+    def loaded_size_mb(self) -> float:
+        return sum(e.size_mb for e in self._entries.values() if e.loaded)
+
+    def _enforce_budget(self, keep: Optional[str] = None):
+        """Expulsar modelos (LRU) mientras la memoria estimada supere el presupuesto"""
+        if self.memory_budget_mb <= 0:
+            return
+        while self.loaded_size_mb() > self.memory_budget_mb:
+            candidates = [e for e in self._entries.values() if e.loaded and not e.pinned and e.name != keep]
+            if not candidates:
+                return
+            victim = min(candidates, key=lambda e: e.last_used)
+            logger.info(f"📉 Presupuesto de memoria de modelos excedido; expulsando '{victim.name}'")
+            self.unload(victim.name)
+
+    def evict_idle(self) -> List[str]:
+        """Descargar los modelos que llevan más de idle_ttl_seconds sin usarse"""
+        if self.idle_ttl_seconds <= 0:
+            return []
+        now = time.monotonic()
+        evicted = []
+        for entry in list(self._entries.values()):
+            if entry.loaded and not entry.pinned and now - entry.last_used > self.idle_ttl_seconds:
+                if self.unload(entry.name):
+                    evicted.append(entry.name)
+        return evicted
+
+    def _start_reaper(self):
+        if self.idle_ttl_seconds <= 0 or self._reaper is not None:
+            return
+        with self._lock:
+            if self._reaper is not None:
+                return
+            interval = max(1.0, min(60.0, self.idle_ttl_seconds / 2))
+
+            def _reap():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.evict_idle()
+                    except Exception:
+                        logger.exception("Error expulsando modelos inactivos")
+
+            self._reaper = threading.Thread(target=_reap, name="model-reaper", daemon=True)
+            self._reaper.start()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        models = {}
+        for name, e in sorted(self._entries.items()):
+            models[name] = {
+                "loaded": e.loaded,
+                "pinned": e.pinned,
+                "size_mb": round(e.size_mb, 1) if e.loaded else 0.0,
+                "loads": e.loads,
+                "unloads": e.unloads,
+                "hits": e.hits,
+                "last_load_seconds": round(e.load_seconds, 3),
+                "idle_seconds": round(now - e.last_used, 1) if e.loaded else None,
+                "last_error": e.last_error,
+            }
+        return {
+            "memory_budget_mb": self.memory_budget_mb,
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "failure_ttl_seconds": self.failure_ttl_seconds,
+            "loaded_size_mb": round(self.loaded_size_mb(), 1),
+            "process_rss_mb": round(current_rss_mb(), 1),
+            "models": models,
+        }
+
+
+_model_registry_instance: Optional[ModelRegistry] = None
+_instance_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Obtener instancia única del registro de modelos"""
+    global _model_registry_instance
+    if _model_registry_instance is None:
+        with _instance_lock:
+            if _model_registry_instance is None:
+                _model_registry_instance = ModelRegistry()
+    return _model_registry_instance
+
+
+def get_model(name: str) -> Any:
+    """Atajo: modelo `name` del registro compartido"""
+    return get_model_registry().get(name)
+
+
+def register_model(name: str, loader: Callable[[], Any], size_mb: Optional[float] = None, pinned: bool = False):
+    """Atajo: registrar un modelo en el registro compartido"""
+    get_model_registry().register(name, loader, size_mb=size_mb, pinned=pinned)
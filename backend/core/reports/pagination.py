@@ -0,0 +1,83 @@
+"""
+Paginación por cursor (keyset) y respuestas NDJSON para los listados de llamadas y reportes
+El cursor codifica los valores de ordenamiento de la última fila entregada (por ejemplo
+(fecha, id)); la página siguiente empieza justo después de ella, sin OFFSET, así que pedir la
+página 500 cuesta lo mismo que la primera y las inserciones no desplazan los resultados.
+"""
+
+import base64
+import json
+from typing import Any, AsyncIterable, Callable, Iterable, List, Optional, Union
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Tamaño máximo de página y filas que se piden a la base por tanda al transmitir
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_ROWS = 500
+
+
+def encode_cursor(*values: Any) -> str:
+    """Cursor opaco (base64 url-safe) con los valores de ordenamiento de la última fila"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Valores de un cursor; HTTP 400 si no lo generó encode_cursor con `size` valores"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
+
+
+def ndjson_line(item: Any) -> str:
+    return json.dumps(item, ensure_ascii=False, default=str) + "\n"
+
+
+def ndjson_response(items: Union[Iterable[Any], AsyncIterable[Any]], limit: Optional[int] = None,
+                    cursor_of: Optional[Callable[[Any], str]] = None,
+                    serialize: Callable[[Any], Any] = lambda item: item) -> StreamingResponse:
+    """
+    Respuesta NDJSON (un objeto JSON por línea) que se escribe a medida que se generan las filas.
+    Con `limit`, `items` debe traer hasta limit + 1 filas: se escriben `limit` y una última línea
+    {"next_cursor": ...} con el cursor de la última fila escrita (`cursor_of`), o null si no hay más.
+    """
+    state = {"count": 0, "last": None, "more": False}
+
+    def line(item):
+        if limit is not None and state["count"] >= limit:
+            state["more"] = True
+            return None
+        state["count"] += 1
+        state["last"] = item
+        return ndjson_line(serialize(item))
+
+    def trailer():
+        next_cursor = cursor_of(state["last"]) if state["more"] and cursor_of is not None else None
+        return ndjson_line({"next_cursor": next_cursor})
+
+    if hasattr(items, "__aiter__"):
+        async def body():
+            async for item in items:
+                text = line(item)
+                if text is None:
+                    break
+                yield text
+            if limit is not None:
+                yield trailer()
+    else:
+        def body():
+            for item in items:
+                text = line(item)
+                if text is None:
+                    break
+                yield text
+            if limit is not None:
+                yield trailer()
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,149 @@
+"""
+Caché persistente de extracción de texto de reportes PDF para SENTINELA
+Guarda en SQLite el texto, los participantes y la línea "Resumen:" de cada PDF, indexados por
+ruta + tamaño + mtime. Si el archivo cambia se vuelve a extraer automáticamente; si no,
+listar reportes es una consulta en lugar de abrir cada PDF con PdfReader.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from backend.config import PDF_CACHE_DB_PATH
+from backend.core.database.sqlite_setup import connect
+from backend.core.database.sqlite_writer import get_sqlite_writer
+
+logger = logging.getLogger(__name__)
+
+# Heurísticas compartidas por los routers de reportes
+PARTICIPANTES_RE = re.compile(r"[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?: [A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)+")
+RESUMEN_RE = re.compile(r"Resumen: ([^\n]+)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdf_text_cache (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    participantes TEXT NOT NULL,
+    resumen TEXT NOT NULL,
+    error TEXT
+)
+"""
+
+
+def extract_pdf_info(path: str) -> Dict[str, Any]:
+    """Extraer texto, participantes y resumen de un PDF (sin caché)"""
+    from PyPDF2 import PdfReader
+    try:
+        reader = PdfReader(path)
+        text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    except Exception as e:
+        return {"text": "", "participantes": [], "resumen": "", "error": str(e)}
+    mres = RESUMEN_RE.search(text)
+    return {
+        "text": text,
+        "participantes": sorted(set(PARTICIPANTES_RE.findall(text))),
+        "resumen": mres.group(1) if mres else "",
+        "error": None,
+    }
+
+
+class PdfTextCache:
+    """Caché de extracción de PDFs respaldada por SQLite (una conexión por hilo)"""
+
+    def __init__(self, db_path: str = PDF_CACHE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._connect().execute(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, path: str) -> Dict[str, Any]:
+        """
+        Información del PDF: {"text", "participantes", "resumen", "error"}.
+        Se extrae de nuevo sólo si cambió el tamaño o el mtime del archivo.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT size, mtime_ns, text, participantes, resumen, error FROM pdf_text_cache WHERE path = ?",
+            (path,),
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            self._count(hit=True)
+            return {"text": row[2], "participantes": json.loads(row[3]), "resumen": row[4], "error": row[5]}
+
+        self._count(hit=False)
+        info = extract_pdf_info(path)
+        # Desde el escritor único: varios hilos extrayendo PDFs no se turnan el bloqueo de la base
+        get_sqlite_writer(self.db_path).execute(
+            "INSERT OR REPLACE INTO pdf_text_cache (path, size, mtime_ns, text, participantes, resumen, error) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, info["text"], json.dumps(info["participantes"], ensure_ascii=False),
+             info["resumen"], info["error"]),
+        )
+        return info
+
+    def get_many(self, paths: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Información de varios PDFs; los que ya no existen se omiten"""
+        results = {}
+        for path in paths:
+            try:
+                results[path] = self.get(path)
+            except FileNotFoundError:
+                continue
+        return results
+
+    def purge_missing(self) -> int:
+        """Eliminar entradas de archivos que ya no existen en disco"""
+        conn = self._connect()
+        stale = [(p,) for (p,) in conn.execute("SELECT path FROM pdf_text_cache") if not os.path.exists(p)]
+        if stale:
+            get_sqlite_writer(self.db_path).executemany("DELETE FROM pdf_text_cache WHERE path = ?", stale)
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"db_path": self.db_path, "hits": self.hits, "misses": self.misses}
+
+
+_pdf_text_cache_instance: Optional[PdfTextCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_pdf_text_cache() -> PdfTextCache:
+    """Obtener instancia única de la caché de PDFs"""
+    global _pdf_text_cache_instance
+    if _pdf_text_cache_instance is None:
+        with _instance_lock:
+            if _pdf_text_cache_instance is None:
+                _pdf_text_cache_instance = PdfTextCache()
+    return _pdf_text_cache_instance
+
+
+def format_resumen(info: Dict[str, Any]) -> str:
+    """Resumen listo para la API (mismo mensaje de error que antes de la caché)"""
+    if info.get("error"):
+        return f"[Error leyendo PDF: {info['error']}]"
+    return info.get("resumen", "")
@@ -0,0 +1,615 @@
+"""
+Índice de búsqueda de texto completo para SENTINELA
+Tabla FTS5 en transcripts.db sobre el texto de call_details.transcript, los archivos
+_Ttranscripcion.txt (un documento por fragmento) y los reportes PDF. Se actualiza de forma
+incremental: cada fragmento transcrito se indexa al momento y la sincronización sólo revisa lo
+posterior a sus marcas de agua (número de cambio del catálogo, id de call_details más un diario de filas
+modificadas) y vuelve a leer las fuentes cuya versión (tamaño + mtime, o crc del texto) cambió.
+Cada documento se divide además en fragmentos cortos (search_chunks) que usa la recuperación
+de contexto para el asistente LLM.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.config import TRANSCRIPTS_DB_PATH, CATALOG_POLL_SECONDS, RAG_CHUNK_WORDS, RAG_CHUNK_OVERLAP
+from backend.core.analysis.phrase_matcher import get_risk_matcher
+from backend.core.analysis.text_normalizer import TOKEN_RE
+from backend.core.database.sqlite_setup import connect
+from backend.core.database.sqlite_writer import get_sqlite_writer
+
+logger = logging.getLogger(__name__)
+
+# Nivel de riesgo para textos sin call_details (mismo criterio que sync_transcripts_to_calls)
+RISK_LEVEL_ALERT = 80
+RISK_LEVEL_NONE = 10
+
+# Línea de un archivo _Ttranscripcion.txt: "[T12-00-00] (es) texto"
+FRAGMENT_LINE_RE = re.compile(r"^\[(?P<time>T\d{2}-\d{2}-\d{2})\]\s*(?:\((?P<lang>[\w-]+)\)\s*)?(?P<text>.*)$")
+
+SOURCES = ("call", "txt", "pdf")
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY,
+        doc_key TEXT NOT NULL UNIQUE,
+        source_key TEXT NOT NULL,
+        source TEXT NOT NULL,
+        pin TEXT,
+        date TEXT,
+        time TEXT,
+        phone TEXT,
+        risk_level INTEGER,
+        call_id INTEGER,
+        path TEXT,
+        body TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_search_documents_source_key ON search_documents (source_key)",
+    "CREATE INDEX IF NOT EXISTS idx_search_documents_pin_date ON search_documents (pin, date)",
+    "CREATE INDEX IF NOT EXISTS idx_search_documents_risk ON search_documents (risk_level)",
+    """
+    CREATE TABLE IF NOT EXISTS search_sources (
+        source_key TEXT PRIMARY KEY,
+        version TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        body, content='search_documents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_fts (rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_fts (search_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_fts (search_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO search_fts (rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_chunks (
+        id INTEGER PRIMARY KEY,
+        doc_id INTEGER NOT NULL,
+        seq INTEGER NOT NULL,
+        body TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_search_chunks_doc ON search_chunks (doc_id, seq)",
+    # Marcas de agua de la sincronización (changed_seq del catálogo por directorio, último call_details.id)
+    """
+    CREATE TABLE IF NOT EXISTS search_marks (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    """,
+    # call_details modificados o eliminados desde la última sincronización (ver CALL_JOURNAL_TRIGGERS)
+    "CREATE TABLE IF NOT EXISTS search_call_journal (call_id INTEGER PRIMARY KEY)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_chunks_fts USING fts5(
+        body, content='search_chunks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_chunks_ai AFTER INSERT ON search_chunks BEGIN
+        INSERT INTO search_chunks_fts (rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_chunks_ad AFTER DELETE ON search_chunks BEGIN
+        INSERT INTO search_chunks_fts (search_chunks_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END
+    """,
+    # Los fragmentos de un documento se regeneran cuando el documento cambia o se elimina
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_chunks_ad AFTER DELETE ON search_documents BEGIN
+        DELETE FROM search_chunks WHERE doc_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_chunks_au AFTER UPDATE OF body ON search_documents BEGIN
+        DELETE FROM search_chunks WHERE doc_id = old.id;
+    END
+    """,
+]
+
+# Se crean cuando call_details existe en esta base: las filas nuevas se detectan por id, las
+# modificadas o eliminadas quedan anotadas aquí
+CALL_JOURNAL_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS search_call_details_au AFTER UPDATE OF transcript, risk_level ON call_details BEGIN
+        INSERT OR IGNORE INTO search_call_journal (call_id) VALUES (new.call_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_call_details_ad AFTER DELETE ON call_details BEGIN
+        INSERT OR IGNORE INTO search_call_journal (call_id) VALUES (old.call_id);
+    END
+    """,
+]
+
+DOC_COLUMNS = ["doc_key", "source_key", "source", "pin", "date", "time", "phone", "risk_level", "call_id", "path", "body"]
+
+
+def build_match_query(query: str) -> str:
+    """
+    Convertir la consulta del usuario en una expresión MATCH segura para FTS5.
+    Las palabras sueltas se combinan con AND y el texto entre comillas se busca como frase.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query or ""):
+        tokens = TOKEN_RE.findall(phrase or word)
+        if tokens:
+            terms.append('"' + " ".join(tokens) + '"')
+    return " ".join(terms)
+
+
+def chunk_text(text: str, max_words: int = RAG_CHUNK_WORDS, overlap: int = RAG_CHUNK_OVERLAP) -> List[str]:
+    """Dividir un texto en ventanas de `max_words` palabras que se solapan `overlap` palabras"""
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)] if words else []
+    step = max(1, max_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+
+def risk_level_for_text(text: str) -> int:
+    return RISK_LEVEL_ALERT if get_risk_matcher().find_all(text) else RISK_LEVEL_NONE
+
+
+def _file_version(path: str) -> Optional[str]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def fragment_doc_key(path: str, time_: str, seq: int) -> str:
+    """Clave de un fragmento: ruta, hora y número de fragmento con esa misma hora (0, 1, ...)"""
+    return f"{path}#{time_}#{seq}"
+
+
+def _prefix_range(prefix: str) -> Tuple[str, str]:
+    """
+    Límites [desde, hasta) de las claves que empiezan por `prefix` (termina en un separador
+    ASCII): como rango sobre la columna indexada, en lugar de substr() que recorre la tabla
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _text_version(text: str) -> str:
+    return f"{len(text)}:{zlib.crc32(text.encode('utf-8'))}"
+
+
+class TranscriptSearchIndex:
+    """Índice FTS5 de transcripciones y reportes (una conexión SQLite por hilo)"""
+
+    def __init__(self, db_path: str = TRANSCRIPTS_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._last_sync: Dict[str, float] = {}
+        conn = self._connect()
+        with conn:
+            has_chunks = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_chunks'"
+            ).fetchone()
+            for statement in SCHEMA:
+                conn.execute(statement)
+            if not has_chunks:
+                # Índice creado antes de existir los fragmentos: generarlos una sola vez
+                self._insert_chunks(conn, conn.execute("SELECT id, body FROM search_documents"))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # ---- Escritura -------------------------------------------------------
+
+    def _write(self, fn, wait: bool = True, what: str = "la escritura del índice"):
+        """Aplicar `fn(conn)` desde el escritor único de la base (ver sqlite_writer)"""
+        writer = get_sqlite_writer(self.db_path)
+        if wait:
+            return writer.call(fn)
+        writer.post(fn, what)
+
+    def _insert_chunks(self, conn: sqlite3.Connection, docs: Iterable[Tuple[int, str]]):
+        conn.executemany(
+            "INSERT INTO search_chunks (doc_id, seq, body) VALUES (?, ?, ?)",
+            [(doc_id, seq, chunk) for doc_id, body in docs for seq, chunk in enumerate(chunk_text(body))],
+        )
+
+    def _replace_source(self, conn: sqlite3.Connection, source_key: str, version: Optional[str],
+                        docs: Iterable[Dict[str, Any]]):
+        """Sustituir todos los documentos de una fuente (dentro de la transacción del llamador)"""
+        conn.execute("DELETE FROM search_documents WHERE source_key = ?", (source_key,))
+        conn.executemany(
+            f"INSERT INTO search_documents ({', '.join(DOC_COLUMNS)}) VALUES ({', '.join('?' * len(DOC_COLUMNS))})",
+            [tuple(doc.get(c, source_key if c == "source_key" else None) for c in DOC_COLUMNS) for doc in docs],
+        )
+        self._insert_chunks(conn, conn.execute(
+            "SELECT id, body FROM search_documents WHERE source_key = ?", (source_key,)
+        ).fetchall())
+        if version is None:
+            conn.execute("DELETE FROM search_sources WHERE source_key = ?", (source_key,))
+        else:
+            conn.execute(
+                "INSERT INTO search_sources (source_key, version) VALUES (?, ?) "
+                "ON CONFLICT (source_key) DO UPDATE SET version = excluded.version",
+                (source_key, version),
+            )
+
+    def index_fragment(self, path: str, pin: str, date: str, time_: str, text: str,
+                       risk_level: Optional[int] = None, replaces: Optional[str] = None, wait: bool = True):
+        """
+        Indexar un fragmento recién agregado a un _Ttranscripcion.txt sin releer el archivo. Con
+        `replaces` (texto anterior del fragmento, p. ej. tras la segunda pasada) se actualiza ese
+        documento en lugar de agregar uno nuevo; con wait=False se encola en el escritor sin
+        esperar el commit
+        """
+        path = os.path.abspath(path)
+        text = text.strip()
+        if not text:
+            return
+        if risk_level is None:
+            risk_level = risk_level_for_text(text)
+        key_range = _prefix_range(fragment_doc_key(path, time_, ""))
+
+        def write(conn: sqlite3.Connection):
+            # Varios fragmentos pueden caer en el mismo segundo: la clave lleva su número de orden.
+            # Rango sobre el índice único de doc_key: sólo se leen los fragmentos de ese segundo
+            keys = conn.execute(
+                "SELECT COUNT(*) FROM search_documents WHERE doc_key >= ? AND doc_key < ?", key_range,
+            ).fetchone()[0]
+            old = None
+            if replaces is not None:
+                old = conn.execute(
+                    "SELECT id FROM search_documents WHERE doc_key >= ? AND doc_key < ? AND body = ? "
+                    "ORDER BY id LIMIT 1",
+                    (*key_range, replaces.strip()),
+                ).fetchone()
+            if old is not None:
+                doc_id = old[0]
+                conn.execute("UPDATE search_documents SET body = ?, risk_level = ? WHERE id = ?",
+                             (text, risk_level, doc_id))
+            else:
+                doc_id = conn.execute(
+                    f"INSERT INTO search_documents ({', '.join(DOC_COLUMNS)}) VALUES ({', '.join('?' * len(DOC_COLUMNS))})",
+                    (fragment_doc_key(path, time_, keys), path, "txt", pin, date,
+                     time_.lstrip("T").replace("-", ":"), None, risk_level, None, path, text),
+                ).lastrowid
+            self._insert_chunks(conn, [(doc_id, text)])
+            # Si el archivo ya estaba indexado, sólo le faltaba este fragmento: evitar releerlo
+            version = _file_version(path)
+            if version is not None:
+                conn.execute("UPDATE search_sources SET version = ? WHERE source_key = ?", (version, path))
+
+        # Un documento por fragmento transcrito: se confirman por lotes desde el escritor único
+        self._write(write, wait, f"la indexación de {path}")
+
+    def index_text_file(self, path: str, meta: Optional[Dict[str, Any]] = None):
+        """Indexar un .txt: un documento por línea [hora] o el archivo completo si no las tiene"""
+        path = os.path.abspath(path)
+        meta = meta or {}
+        version = _file_version(path)
+        docs = []
+        if version is not None:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            lines = [FRAGMENT_LINE_RE.match(line) for line in content.splitlines() if line.strip()]
+            base = {"source": "txt", "pin": meta.get("pin"), "date": meta.get("date"),
+                    "time": meta.get("time"), "phone": meta.get("phone"), "path": path}
+            if lines and all(lines):
+                seqs: Dict[str, int] = {}
+                for m in lines:
+                    text = m.group("text").strip()
+                    if text:
+                        seq = seqs[m.group("time")] = seqs.get(m.group("time"), -1) + 1
+                        docs.append(dict(base, doc_key=fragment_doc_key(path, m.group("time"), seq), body=text,
+                                         time=m.group("time").lstrip("T").replace("-", ":"),
+                                         risk_level=risk_level_for_text(text)))
+            elif content.strip():
+                docs.append(dict(base, doc_key=path, body=content, risk_level=risk_level_for_text(content)))
+        self._write(lambda conn: self._replace_source(conn, path, version, docs))
+
+    def index_pdf(self, path: str, meta: Optional[Dict[str, Any]] = None):
+        """Indexar el texto de un reporte PDF (vía la caché de extracción)"""
+        from backend.core.reports.pdf_text_cache import get_pdf_text_cache
+        path = os.path.abspath(path)
+        meta = meta or {}
+        version = _file_version(path)
+        docs = []
+        if version is not None:
+            text = get_pdf_text_cache().get(path).get("text", "")
+            if text.strip():
+                docs.append({
+                    "doc_key": path, "source": "pdf", "pin": meta.get("pin"), "date": meta.get("date"),
+                    "time": meta.get("time"), "phone": meta.get("phone"), "path": path, "body": text,
+                    "risk_level": risk_level_for_text(text),
+                })
+        self._write(lambda conn: self._replace_source(conn, path, version, docs))
+
+    def _mark(self, conn: sqlite3.Connection, name: str) -> int:
+        row = conn.execute("SELECT value FROM search_marks WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_mark(self, conn: sqlite3.Connection, name: str, value: int):
+        conn.execute(
+            "INSERT INTO search_marks (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    def index_call_details(self, full: bool = False) -> int:
+        """
+        Indexar call_details.transcript de forma incremental: las filas con id posterior a la
+        marca y las anotadas en search_call_journal por los triggers (modificadas o eliminadas).
+        Con `full` (o la primera vez) se revisan todas y se quitan las que ya no existen.
+        """
+        conn = self._connect()
+        has_tables = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('calls', 'call_details')"
+        ).fetchone()[0] == 2
+        if not has_tables:
+            # Las tablas de llamadas aún no existen en esta base
+            return 0
+
+        def write(conn: sqlite3.Connection) -> int:
+            # En la transacción del lote del escritor (BEGIN IMMEDIATE): lo anotado en el diario
+            # entre la lectura y el borrado no se pierde
+            for statement in CALL_JOURNAL_TRIGGERS:
+                conn.execute(statement)
+            mark = 0 if full else self._mark(conn, "call_details.id")
+            pending = {row[0] for row in conn.execute("SELECT call_id FROM search_call_journal")}
+            rows = conn.execute(
+                """
+                SELECT d.id, c.id, c.pin_emitter, c.phone_number, c.date, c.hora, d.transcript, d.risk_level
+                FROM call_details d JOIN calls c ON c.id = d.call_id
+                WHERE d.id > ? OR d.call_id IN (SELECT call_id FROM search_call_journal)
+                """,
+                (mark,),
+            ).fetchall()
+            known = dict(conn.execute(
+                "SELECT source_key, version FROM search_sources WHERE source_key LIKE 'call:%'"
+            ).fetchall()) if mark == 0 else {}
+            changed = 0
+            seen = set()
+            newest = mark
+            for detail_id, call_id, pin, phone, date, hora, transcript, risk_level in rows:
+                newest = max(newest, detail_id)
+                key = f"call:{call_id}"
+                if not transcript:
+                    continue
+                seen.add(key)
+                version = _text_version(transcript)
+                if mark != 0 or key not in known:
+                    row = conn.execute("SELECT version FROM search_sources WHERE source_key = ?", (key,)).fetchone()
+                    known[key] = row[0] if row else None
+                if known[key] == version and call_id not in pending:
+                    continue
+                self._replace_source(conn, key, version, [{
+                    "doc_key": key, "source": "call", "pin": pin, "date": date,
+                    "time": hora.replace("-", ":") if hora else None, "phone": phone,
+                    "risk_level": risk_level, "call_id": call_id, "body": transcript,
+                }])
+                changed += 1
+            # Eliminadas o sin transcripción: anotadas en el diario, o todas en la revisión completa
+            stale = set(known) if mark == 0 else {f"call:{call_id}" for call_id in pending}
+            for key in stale - seen:
+                self._replace_source(conn, key, None, [])
+                changed += 1
+            conn.execute("DELETE FROM search_call_journal")
+            self._set_mark(conn, "call_details.id", newest)
+            return changed
+
+        return self._write(write)
+
+    def sync(self, directory: str, force: bool = False) -> int:
+        """
+        Poner el índice al día con el directorio de transcripciones y call_details.
+        Sólo lee las filas del catálogo cambiadas después de la marca del directorio y las filas
+        nuevas o modificadas de call_details; sin `force` se ejecuta como máximo una vez cada
+        CATALOG_POLL_SECONDS. Con `force` se revisa todo.
+        """
+        from backend.core.reports.transcript_catalog import get_transcript_catalog
+        directory = os.path.abspath(directory)
+        now = time.monotonic()
+        if not force and now - self._last_sync.get(directory, float("-inf")) < CATALOG_POLL_SECONDS:
+            return 0
+        with self._sync_lock:
+            if not force and now - self._last_sync.get(directory, float("-inf")) < CATALOG_POLL_SECONDS:
+                return 0
+            catalog = get_transcript_catalog()
+            catalog.ensure_directory(directory)
+            conn = self._connect()
+            mark_name = f"catalog_seq:{directory}"
+            mark = 0 if force else self._mark(conn, mark_name)
+            changed = 0
+            newest = mark
+            for row in catalog.changed_since(directory, mark):
+                newest = max(newest, row["changed_seq"])
+                meta = {k: row[k] for k in ("pin", "date", "time", "phone")}
+                for column, indexer in (("txt_path", self.index_text_file), ("pdf_path", self.index_pdf)):
+                    path = row[column]
+                    if not path:
+                        continue
+                    known = conn.execute("SELECT version FROM search_sources WHERE source_key = ?", (path,)).fetchone()
+                    if known is None or known[0] != _file_version(path):
+                        indexer(path, meta)
+                        changed += 1
+            changed += self._remove_deleted_files(conn, catalog, directory, force)
+            self._write(lambda conn: self._set_mark(conn, mark_name, newest))
+            changed += self.index_call_details(full=force)
+            self._last_sync[directory] = time.monotonic()
+        if changed:
+            logger.info(f"🔎 Índice de búsqueda actualizado: {changed} fuentes")
+        return changed
+
+    def _remove_deleted_files(self, conn: sqlite3.Connection, catalog, directory: str, force: bool) -> int:
+        """
+        Quitar del índice los archivos que ya no están en el catálogo. Sólo se comparan las
+        listas completas si el número de fuentes indexadas del directorio supera al de archivos
+        catalogados (o con `force`)
+        """
+        prefix = directory + os.sep
+        # Rango sobre la clave primaria (sin subdirectorios): no recorre todo search_sources
+        where = "source_key >= ? AND source_key < ? AND instr(substr(source_key, ?), ?) = 0"
+        params = (*_prefix_range(prefix), len(prefix) + 1, os.sep)
+        indexed = conn.execute(f"SELECT COUNT(*) FROM search_sources WHERE {where}", params).fetchone()[0]
+        if not force and indexed <= catalog.count_files(directory, ("txt", "pdf")):
+            return 0
+        paths = {path for row in catalog.query(directory) for path in (row["txt_path"], row["pdf_path"]) if path}
+        removed = [key for (key,) in conn.execute(f"SELECT source_key FROM search_sources WHERE {where}", params)
+                   if key not in paths]
+        if removed:
+            def write(conn: sqlite3.Connection):
+                for key in removed:
+                    self._replace_source(conn, key, None, [])
+
+            self._write(write)
+        return len(removed)
+
+    # ---- Consultas --------------------------------------------------------
+
+    def search(self, query: str, pin: Optional[str] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, min_risk: Optional[int] = None, max_risk: Optional[int] = None,
+               source: Optional[str] = None, limit: int = 20, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Buscar documentos ordenados por relevancia (bm25). Devuelve (total, resultados);
+        cada resultado incluye un fragmento del texto con las coincidencias marcadas.
+        """
+        match = build_match_query(query)
+        if not match:
+            return 0, []
+        where = ["search_fts MATCH ?"]
+        params: List[Any] = [match]
+        for clause, value in (("d.pin = ?", pin), ("d.date >= ?", date_from), ("d.date <= ?", date_to),
+                              ("d.risk_level >= ?", min_risk), ("d.risk_level <= ?", max_risk),
+                              ("d.source = ?", source)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        sql_from = f"FROM search_fts JOIN search_documents d ON d.id = search_fts.rowid WHERE {' AND '.join(where)}"
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) {sql_from}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""
+            SELECT d.source, d.pin, d.date, d.time, d.phone, d.risk_level, d.call_id, d.path,
+                   bm25(search_fts) AS score,
+                   snippet(search_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet
+            {sql_from}
+            ORDER BY score LIMIT ? OFFSET ?
+            """,
+            params + [limit, offset],
+        ).fetchall()
+        results = []
+        for row in rows:
+            result = dict(row)
+            # bm25 devuelve valores negativos: más negativo = más relevante
+            result["score"] = round(-result["score"], 4)
+            path = result.pop("path")
+            result["filename"] = os.path.basename(path) if path else None
+            results.append(result)
+        return total, results
+
+    def chunk_candidates(self, match: Optional[str] = None, pin: Optional[str] = None,
+                         date_like: Optional[str] = None, phone: Optional[str] = None,
+                         required_phrases: Iterable[str] = (), limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Fragmentos de documento para armar el contexto de una consulta al LLM.
+        Con `match` se ordenan por bm25; sin términos útiles se devuelven los más recientes.
+        `phone` filtra por el teléfono de la llamada o su aparición en el texto;
+        `required_phrases` exige que el documento contenga cada frase.
+        """
+        where: List[str] = []
+        params: List[Any] = []
+        if match:
+            where.append("search_chunks_fts MATCH ?")
+            params.append(match)
+        for clause, value in (("d.pin = ?", pin), ("d.date LIKE ?", date_like)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        if phone is not None:
+            where.append("(d.phone = ? OR d.id IN (SELECT rowid FROM search_fts WHERE search_fts MATCH ?))")
+            params.extend([phone, build_match_query(f'"{phone}"')])
+        for phrase in required_phrases:
+            where.append("d.id IN (SELECT rowid FROM search_fts WHERE search_fts MATCH ?)")
+            params.append(build_match_query(f'"{phrase}"'))
+        if match:
+            sql = f"""
+                SELECT c.id, c.doc_id, c.seq, c.body, d.source, d.pin, d.date, d.time, d.phone, d.path,
+                       bm25(search_chunks_fts) AS score
+                FROM search_chunks_fts
+                JOIN search_chunks c ON c.id = search_chunks_fts.rowid
+                JOIN search_documents d ON d.id = c.doc_id
+                WHERE {' AND '.join(where)}
+                ORDER BY score LIMIT ?
+            """
+        else:
+            sql = f"""
+                SELECT c.id, c.doc_id, c.seq, c.body, d.source, d.pin, d.date, d.time, d.phone, d.path,
+                       0.0 AS score
+                FROM search_chunks c JOIN search_documents d ON d.id = c.doc_id
+                {('WHERE ' + ' AND '.join(where)) if where else ''}
+                ORDER BY d.date DESC, d.time DESC, c.doc_id, c.seq LIMIT ?
+            """
+        rows = self._connect().execute(sql, params + [limit]).fetchall()
+        return [dict(row, score=-row["score"]) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._connect().execute("SELECT source, COUNT(*) FROM search_documents GROUP BY source"))
+        return {"db_path": self.db_path, "documents": {source: counts.get(source, 0) for source in SOURCES}}
+
+
+_search_index_instance: Optional[TranscriptSearchIndex] = None
+_instance_lock = threading.Lock()
+
+
+def get_search_index() -> TranscriptSearchIndex:
+    """Obtener instancia única del índice de búsqueda"""
+    global _search_index_instance
+    if _search_index_instance is None:
+        with _instance_lock:
+            if _search_index_instance is None:
+                _search_index_instance = TranscriptSearchIndex()
+    return _search_index_instance
+
+
+def index_transcript_fragment(path: str, pin: str, date: str, time_: str, text: str,
+                              replaces: Optional[str] = None):
+    """
+    Indexar un fragmento recién transcrito (o el reemplazo del texto `replaces`) sin esperar el
+    commit (se llama desde handlers async); los errores sólo se registran en log
+    """
+    try:
+        get_search_index().index_fragment(path, pin, date, time_, text, replaces=replaces, wait=False)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo indexar el fragmento de {path}: {e}")
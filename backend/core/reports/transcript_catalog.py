@@ -0,0 +1,444 @@
+"""
+Catálogo de transcripciones para SENTINELA
+Tabla `transcript_catalog` en transcripts.db con los metadatos de cada llamada (PIN, fecha, hora,
+teléfono y rutas de PDF/WAV/TXT). Sustituye los os.listdir + regex que hacían los routers de
+reportes en cada petición. Se mantiene al día al escribir archivos (register_file) y con un
+observador del directorio (watchdog, en requirements; si no está instalado, sondeo del mtime del
+directorio que re-sincroniza escribiendo sólo las diferencias).
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.config import TRANSCRIPTS_DB_PATH, CATALOG_POLL_SECONDS
+from backend.core.database.sqlite_setup import connect
+from backend.core.database.sqlite_writer import get_sqlite_writer
+
+logger = logging.getLogger(__name__)
+
+# <pin>_<YYYY-MM-DD>[_T<hh-mm-ss>][_<teléfono>][_reporte].<ext>
+FILENAME_RE = re.compile(
+    r"^(?P<pin>\d{3,})_(?P<date>\d{4}-\d{2}-\d{2})"
+    r"(?:_T(?P<time>\d{2}-\d{2}-\d{2}))?(?:_(?P<phone>\d{10,}))?"
+)
+REPORT_SUFFIX = "_reporte"
+
+# Columna del catálogo según la extensión del archivo
+KIND_COLUMNS = {".pdf": "pdf_path", ".wav": "wav_path", ".txt": "txt_path"}
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS transcript_catalog (
+        directory TEXT NOT NULL,
+        stem TEXT NOT NULL,
+        pin TEXT,
+        date TEXT,
+        time TEXT,
+        phone TEXT,
+        pdf_path TEXT,
+        wav_path TEXT,
+        txt_path TEXT,
+        size INTEGER NOT NULL DEFAULT 0,
+        mtime_ns INTEGER NOT NULL DEFAULT 0,
+        changed_seq INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (directory, stem)
+    )
+    """,
+    # Contador de cambios del catálogo: cada alta o modificación de una fila recibe el siguiente
+    # número (changed_seq). A diferencia del mtime, también avanza con archivos restaurados con
+    # un mtime antiguo, y nunca retrocede aunque se borre la fila más reciente
+    """
+    CREATE TABLE IF NOT EXISTS transcript_catalog_seq (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        value INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO transcript_catalog_seq (id, value) VALUES (1, 0)",
+]
+
+# Después de agregar changed_seq a un catálogo creado por una versión anterior
+SEQ_SCHEMA = [
+    "DROP INDEX IF EXISTS idx_transcript_catalog_mtime",
+    "CREATE INDEX IF NOT EXISTS idx_transcript_catalog_pin_date ON transcript_catalog (pin, date)",
+    "CREATE INDEX IF NOT EXISTS idx_transcript_catalog_phone ON transcript_catalog (phone)",
+    "CREATE INDEX IF NOT EXISTS idx_transcript_catalog_seq ON transcript_catalog (directory, changed_seq)",
+    """
+    CREATE TRIGGER IF NOT EXISTS transcript_catalog_seq_ai AFTER INSERT ON transcript_catalog BEGIN
+        UPDATE transcript_catalog_seq SET value = value + 1 WHERE id = 1;
+        UPDATE transcript_catalog SET changed_seq = (SELECT value FROM transcript_catalog_seq WHERE id = 1)
+        WHERE directory = NEW.directory AND stem = NEW.stem;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transcript_catalog_seq_au
+    AFTER UPDATE OF pin, date, time, phone, pdf_path, wav_path, txt_path, size, mtime_ns ON transcript_catalog
+    WHEN OLD.pdf_path IS NOT NEW.pdf_path OR OLD.wav_path IS NOT NEW.wav_path OR OLD.txt_path IS NOT NEW.txt_path
+        OR OLD.size IS NOT NEW.size OR OLD.mtime_ns IS NOT NEW.mtime_ns OR OLD.pin IS NOT NEW.pin
+        OR OLD.date IS NOT NEW.date OR OLD.time IS NOT NEW.time OR OLD.phone IS NOT NEW.phone
+    BEGIN
+        UPDATE transcript_catalog_seq SET value = value + 1 WHERE id = 1;
+        UPDATE transcript_catalog SET changed_seq = (SELECT value FROM transcript_catalog_seq WHERE id = 1)
+        WHERE directory = NEW.directory AND stem = NEW.stem;
+    END
+    """,
+]
+
+COLUMNS = ["directory", "stem", "pin", "date", "time", "phone", "pdf_path", "wav_path", "txt_path", "size", "mtime_ns"]
+
+
+def parse_filename(filename: str) -> Optional[Dict[str, Any]]:
+    """Clave y metadatos de un archivo del directorio de transcripciones (None si no aplica)"""
+    stem, ext = os.path.splitext(filename)
+    column = KIND_COLUMNS.get(ext.lower())
+    if column is None:
+        return None
+    if stem.endswith(REPORT_SUFFIX):
+        stem = stem[: -len(REPORT_SUFFIX)]
+    m = FILENAME_RE.match(stem)
+    return {
+        "stem": stem,
+        "column": column,
+        "pin": m.group("pin") if m else None,
+        "date": m.group("date") if m else None,
+        "time": m.group("time").replace("-", ":") if m and m.group("time") else None,
+        "phone": m.group("phone") if m else None,
+    }
+
+
+def _kind_column(kind: str) -> str:
+    column = f"{kind}_path"
+    if column not in KIND_COLUMNS.values():
+        raise ValueError(f"Tipo de archivo desconocido: {kind}")
+    return column
+
+
+class TranscriptCatalog:
+    """Acceso al catálogo de transcripciones (una conexión SQLite por hilo)"""
+
+    def __init__(self, db_path: str = TRANSCRIPTS_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._synced_dirs = set()
+        self._watchers: Dict[str, Any] = {}
+        conn = self._connect()
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(transcript_catalog)")}
+            if "changed_seq" not in columns:
+                conn.execute("ALTER TABLE transcript_catalog ADD COLUMN changed_seq INTEGER NOT NULL DEFAULT 0")
+                # Las filas ya catalogadas cuentan como cambiadas: quien lea por número de cambio las ve
+                conn.execute("UPDATE transcript_catalog SET changed_seq = rowid")
+                conn.execute("UPDATE transcript_catalog_seq SET value = "
+                             "(SELECT COALESCE(MAX(changed_seq), 0) FROM transcript_catalog) WHERE id = 1")
+            for statement in SEQ_SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # ---- Escritura -------------------------------------------------------
+
+    def register_file(self, path: str, wait: bool = True) -> bool:
+        """
+        Agregar o actualizar en el catálogo el archivo recién escrito; con wait=False se encola en
+        el escritor sin esperar el commit
+        """
+        path = os.path.abspath(path)
+        info = parse_filename(os.path.basename(path))
+        if info is None:
+            return False
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return self.unregister_file(path, wait)
+        directory = os.path.dirname(path)
+        column = info["column"]
+
+        def write(conn: sqlite3.Connection):
+            conn.execute(
+                f"""
+                INSERT INTO transcript_catalog (directory, stem, pin, date, time, phone, {column}, size, mtime_ns)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (directory, stem) DO UPDATE SET
+                    {column} = excluded.{column},
+                    mtime_ns = MAX(transcript_catalog.mtime_ns, excluded.mtime_ns)
+                """,
+                (directory, info["stem"], info["pin"], info["date"], info["time"], info["phone"],
+                 path, st.st_size, st.st_mtime_ns),
+            )
+            self._refresh_size(conn, directory, info["stem"])
+
+        # Un archivo por fragmento transcrito: se confirman por lotes desde el escritor único
+        self._write(write, wait, f"el registro de {path}")
+        return True
+
+    def _write(self, fn, wait: bool, what: str):
+        writer = get_sqlite_writer(self.db_path)
+        if wait:
+            writer.call(fn)
+        else:
+            writer.post(fn, what)
+
+    def _refresh_size(self, conn: sqlite3.Connection, directory: str, stem: str):
+        """Tamaño total de los archivos asociados a la llamada"""
+        row = conn.execute(
+            "SELECT pdf_path, wav_path, txt_path FROM transcript_catalog WHERE directory = ? AND stem = ?",
+            (directory, stem),
+        ).fetchone()
+        total = 0
+        for path in row or ():
+            if path:
+                try:
+                    total += os.stat(path).st_size
+                except FileNotFoundError:
+                    pass
+        conn.execute(
+            "UPDATE transcript_catalog SET size = ? WHERE directory = ? AND stem = ?", (total, directory, stem)
+        )
+
+    def unregister_file(self, path: str, wait: bool = True) -> bool:
+        """Quitar un archivo eliminado; la fila desaparece cuando no queda ningún archivo"""
+        path = os.path.abspath(path)
+        info = parse_filename(os.path.basename(path))
+        if info is None:
+            return False
+        directory = os.path.dirname(path)
+        column = info["column"]
+
+        def write(conn: sqlite3.Connection):
+            conn.execute(
+                f"UPDATE transcript_catalog SET {column} = NULL WHERE directory = ? AND stem = ? AND {column} = ?",
+                (directory, info["stem"], path),
+            )
+            conn.execute(
+                "DELETE FROM transcript_catalog WHERE directory = ? AND stem = ? "
+                "AND pdf_path IS NULL AND wav_path IS NULL AND txt_path IS NULL",
+                (directory, info["stem"]),
+            )
+            self._refresh_size(conn, directory, info["stem"])
+
+        self._write(write, wait, f"la baja de {path}")
+        return True
+
+    def sync_directory(self, directory: str) -> int:
+        """
+        Reconciliar el catálogo con el contenido real del directorio (un solo recorrido); escribe
+        sólo las llamadas nuevas, modificadas o eliminadas
+        """
+        directory = os.path.abspath(directory)
+        rows: Dict[str, Dict[str, Any]] = {}
+        for entry in os.scandir(directory):
+            if not entry.is_file():
+                continue
+            info = parse_filename(entry.name)
+            if info is None:
+                continue
+            st = entry.stat()
+            row = rows.setdefault(info["stem"], {
+                "directory": directory, "stem": info["stem"], "pin": info["pin"], "date": info["date"],
+                "time": info["time"], "phone": info["phone"], "pdf_path": None, "wav_path": None,
+                "txt_path": None, "size": 0, "mtime_ns": 0,
+            })
+            row[info["column"]] = entry.path
+            row["size"] += st.st_size
+            row["mtime_ns"] = max(row["mtime_ns"], st.st_mtime_ns)
+        # Sólo se escriben las diferencias con lo ya catalogado: el sondeo re-sincroniza el
+        # directorio en cada cambio y casi todas las filas siguen iguales
+        current = {
+            row["stem"]: tuple(row[c] for c in COLUMNS)
+            for row in self._connect().execute(
+                f"SELECT {', '.join(COLUMNS)} FROM transcript_catalog WHERE directory = ?", (directory,)
+            )
+        }
+        removed = [(directory, stem) for stem in current if stem not in rows]
+        changed = [values for values in (tuple(row[c] for c in COLUMNS) for row in rows.values())
+                   if current.get(values[1]) != values]
+        if removed or changed:
+            def write(conn: sqlite3.Connection):
+                conn.executemany("DELETE FROM transcript_catalog WHERE directory = ? AND stem = ?", removed)
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO transcript_catalog ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                    changed,
+                )
+
+            get_sqlite_writer(self.db_path).call(write)
+        logger.info(f"📚 Catálogo sincronizado: {len(rows)} llamadas en {directory} "
+                    f"({len(changed)} nuevas o modificadas, {len(removed)} eliminadas)")
+        return len(rows)
+
+    # ---- Mantenimiento automático ---------------------------------------
+
+    def ensure_directory(self, directory: str):
+        """Sincronizar el directorio la primera vez que se consulta y empezar a observarlo"""
+        directory = os.path.abspath(directory)
+        if directory in self._synced_dirs:
+            return
+        with self._lock:
+            if directory in self._synced_dirs:
+                return
+            os.makedirs(directory, exist_ok=True)
+            self.sync_directory(directory)
+            self._start_watcher(directory)
+            self._synced_dirs.add(directory)
+
+    def _start_watcher(self, directory: str):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            self._start_poller(directory)
+            return
+
+        catalog = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    catalog.register_file(event.src_path)
+
+            on_modified = on_created
+
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    catalog.unregister_file(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    catalog.unregister_file(event.src_path)
+                    catalog.register_file(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(_Handler(), directory, recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._watchers[directory] = observer
+
+    def _start_poller(self, directory: str):
+        """Sin watchdog: re-sincronizar (sólo diferencias) cuando cambia el mtime del directorio"""
+        stop = threading.Event()
+
+        def _poll():
+            last = os.stat(directory).st_mtime_ns
+            while not stop.wait(CATALOG_POLL_SECONDS):
+                try:
+                    current = os.stat(directory).st_mtime_ns
+                    if current != last:
+                        last = current
+                        self.sync_directory(directory)
+                except Exception as e:
+                    logger.warning(f"⚠️ Error sincronizando catálogo de {directory}: {e}")
+
+        thread = threading.Thread(target=_poll, name="catalog-poller", daemon=True)
+        thread.start()
+        self._watchers[directory] = stop
+
+    # ---- Consultas --------------------------------------------------------
+
+    def query(self, directory: str, pin: Optional[str] = None, date: Optional[str] = None,
+              phone: Optional[str] = None, has: Optional[str] = None,
+              after: Optional[Sequence[str]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Filas del catálogo de un directorio, de la más reciente a la más antigua. `has` ("pdf",
+        "wav" o "txt") limita a las llamadas que tienen ese tipo de archivo. `after` es la clave
+        (fecha, hora, stem) de la última fila de la página anterior (ver sort_key) y `limit` el
+        tamaño de página.
+        """
+        directory = os.path.abspath(directory)
+        self.ensure_directory(directory)
+        sql = "SELECT * FROM transcript_catalog WHERE directory = ?"
+        params: List[Any] = [directory]
+        if pin is not None:
+            sql += " AND pin = ?"
+            params.append(pin)
+        if date is not None:
+            sql += " AND date = ?"
+            params.append(date)
+        if phone is not None:
+            sql += " AND phone = ?"
+            params.append(phone)
+        if has is not None:
+            sql += f" AND {_kind_column(has)} IS NOT NULL"
+        if after is not None:
+            sql += " AND (COALESCE(date, ''), COALESCE(time, ''), stem) < (?, ?, ?)"
+            params.extend(after)
+        sql += " ORDER BY COALESCE(date, '') DESC, COALESCE(time, '') DESC, stem DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def changed_since(self, directory: str, since_seq: int) -> List[Dict[str, Any]]:
+        """
+        Filas del catálogo con changed_seq > `since_seq` (número de cambio, ver
+        transcript_catalog_seq), en el orden en que cambiaron, leídas sin recorrer el directorio.
+        Un directorio que el catálogo aún no conoce se sincroniza una vez.
+        """
+        directory = os.path.abspath(directory)
+        conn = self._connect()
+        known = conn.execute("SELECT 1 FROM transcript_catalog WHERE directory = ? LIMIT 1", (directory,)).fetchone()
+        if known is None and directory not in self._synced_dirs and os.path.isdir(directory):
+            self.sync_directory(directory)
+        rows = conn.execute(
+            "SELECT * FROM transcript_catalog WHERE directory = ? AND changed_seq > ? ORDER BY changed_seq",
+            (directory, since_seq),
+        )
+        return [dict(row) for row in rows]
+
+    def count_files(self, directory: str, kinds: Sequence[str] = ("pdf", "wav", "txt")) -> int:
+        """Número de archivos catalogados del directorio de los tipos `kinds`"""
+        columns = " + ".join(f"COUNT({_kind_column(kind)})" for kind in kinds)
+        return self._connect().execute(
+            f"SELECT {columns} FROM transcript_catalog WHERE directory = ?", (os.path.abspath(directory),)
+        ).fetchone()[0]
+
+    @staticmethod
+    def sort_key(row: Dict[str, Any]) -> Tuple[str, str, str]:
+        """Clave de orden (y de cursor) de una fila devuelta por query()"""
+        return (row["date"] or "", row["time"] or "", row["stem"])
+
+    def pins(self, directory: str, has: Optional[str] = None) -> List[str]:
+        """PINs distintos del directorio, ordenados"""
+        directory = os.path.abspath(directory)
+        self.ensure_directory(directory)
+        sql = "SELECT DISTINCT pin FROM transcript_catalog WHERE directory = ? AND pin IS NOT NULL"
+        if has is not None:
+            sql += f" AND {_kind_column(has)} IS NOT NULL"
+        sql += " ORDER BY pin"
+        return [row[0] for row in self._connect().execute(sql, (directory,))]
+
+
+_catalog_instance: Optional[TranscriptCatalog] = None
+_instance_lock = threading.Lock()
+
+
+def get_transcript_catalog() -> TranscriptCatalog:
+    """Obtener instancia única del catálogo de transcripciones"""
+    global _catalog_instance
+    if _catalog_instance is None:
+        with _instance_lock:
+            if _catalog_instance is None:
+                _catalog_instance = TranscriptCatalog()
+    return _catalog_instance
+
+
+def register_transcript_file(path: str):
+    """
+    Registrar en el catálogo un archivo recién escrito, sin esperar el commit (se llama desde
+    handlers async); los errores sólo se registran en log
+    """
+    try:
+        get_transcript_catalog().register_file(path, wait=False)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo registrar {path} en el catálogo: {e}")
@@ -0,0 +1,265 @@
+"""
+Perfilador de arranque para SENTINELA
+Con STARTUP_PROFILE=true mide cuánto tarda cada import (árbol anidado con tiempo propio y
+acumulado), cuánto tarda y cuánta memoria ocupa cada modelo al cargarse, y el tiempo hasta la
+primera petición atendida. El reporte se guarda como JSON y se consulta en /admin/startup para
+comparar versiones. Sin la variable sólo se registran los hitos (sin hook de imports).
+"""
+
+import importlib.machinery
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.config import STARTUP_PROFILE, STARTUP_PROFILE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Umbral para incluir un módulo en el árbol del reporte (ms acumulados)
+TREE_MIN_MS = 1.0
+TOP_N = 30
+
+
+def _process_start_time() -> Optional[float]:
+    """Hora de inicio del proceso (epoch), para medir también el arranque del intérprete"""
+    try:
+        import psutil
+        return psutil.Process().create_time()
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _ImportNode:
+    __slots__ = ("name", "start", "elapsed", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        self.children: List["_ImportNode"] = []
+
+    def to_dict(self, min_ms: float) -> Dict[str, Any]:
+        children_ms = sum(c.elapsed for c in self.children) * 1000
+        return {
+            "module": self.name,
+            "ms": round(self.elapsed * 1000, 2),
+            "self_ms": round(self.elapsed * 1000 - children_ms, 2),
+            "children": [c.to_dict(min_ms) for c in self.children if c.elapsed * 1000 >= min_ms],
+        }
+
+
+_PER_MODULE_LOADERS = (
+    importlib.machinery.SourceFileLoader,
+    importlib.machinery.SourcelessFileLoader,
+    importlib.machinery.ExtensionFileLoader,
+)
+
+
+class _TimingFinder:
+    """
+    Buscador en sys.meta_path que no resuelve nada por sí mismo: pide el spec a los demás
+    buscadores y envuelve exec_module del loader para cronometrar la ejecución del módulo.
+    """
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self.profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path=None, target=None):
+        if getattr(self._local, "busy", False):
+            return None
+        self._local.busy = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.busy = False
+        loader = spec.loader
+        # Sólo loaders que se crean uno por módulo; los compartidos (builtins, frozen, zip) no se tocan
+        if type(loader) not in _PER_MODULE_LOADERS:
+            return spec
+        original = loader.exec_module
+        profiler = self.profiler
+
+        def exec_module(module, _original=original, _name=fullname):
+            node = profiler._push(_name)
+            try:
+                _original(module)
+            finally:
+                profiler._pop(node)
+
+        try:
+            loader.exec_module = exec_module
+        except AttributeError:
+            pass
+        return spec
+
+
+class StartupProfiler:
+    """Recolecta tiempos de import, cargas de modelos e hitos del arranque"""
+
+    def __init__(self):
+        self.enabled = False
+        self.installed_at = time.time()
+        self._perf_origin = time.perf_counter()
+        self.process_start = _process_start_time()
+        self._finder: Optional[_TimingFinder] = None
+        self._listening = False
+        self._roots: List[_ImportNode] = []
+        self._stack = threading.local()
+        self._lock = threading.Lock()
+        self.marks: List[Dict[str, Any]] = []
+        self.model_loads: List[Dict[str, Any]] = []
+        self.first_request_done = False
+
+    # ---- Imports -----------------------------------------------------------
+
+    def install(self):
+        """Activar el hook de imports (sólo con STARTUP_PROFILE) y registrar cargas de modelos"""
+        # install() se llama desde cada app (main y microservicio): registrar el listener una vez
+        if not self._listening:
+            from backend.core.model_registry import get_model_registry
+            get_model_registry().add_load_listener(self.record_model_load)
+            self._listening = True
+        if not STARTUP_PROFILE or self._finder is not None:
+            return
+        self.enabled = True
+        self._finder = _TimingFinder(self)
+        sys.meta_path.insert(0, self._finder)
+        logger.info("⏱️ Perfilado de arranque activado")
+
+    def uninstall_import_hook(self):
+        if self._finder is not None and self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    def _push(self, name: str) -> _ImportNode:
+        node = _ImportNode(name)
+        stack = getattr(self._stack, "nodes", None)
+        if stack is None:
+            stack = self._stack.nodes = []
+        if stack:
+            stack[-1].children.append(node)
+        else:
+            with self._lock:
+                self._roots.append(node)
+        stack.append(node)
+        return node
+
+    def _pop(self, node: _ImportNode):
+        node.elapsed = time.perf_counter() - node.start
+        stack = self._stack.nodes
+        if stack and stack[-1] is node:
+            stack.pop()
+
+    # ---- Hitos y modelos ------------------------------------------------------
+
+    def _elapsed(self) -> float:
+        return time.perf_counter() - self._perf_origin
+
+    def mark(self, name: str):
+        """Registrar un hito del arranque (segundos desde que se instaló el perfilador)"""
+        from backend.core.model_registry import current_rss_mb
+        self.marks.append({
+            "name": name,
+            "seconds": round(self._elapsed(), 3),
+            "rss_mb": round(current_rss_mb(), 1),
+        })
+
+    def record_model_load(self, name: str, seconds: float, rss_delta_mb: float):
+        self.model_loads.append({
+            "model": name,
+            "seconds": round(seconds, 3),
+            "rss_delta_mb": round(rss_delta_mb, 1),
+            "at_seconds": round(self._elapsed(), 3),
+        })
+
+    def record_first_request(self, path: str):
+        """Llamado una vez, al terminar la primera petición HTTP"""
+        if self.first_request_done:
+            return
+        self.first_request_done = True
+        self.mark(f"first_request {path}")
+        self.uninstall_import_hook()
+        self.save()
+
+    # ---- Reporte -------------------------------------------------------------
+
+    def _flatten(self) -> List[_ImportNode]:
+        nodes, pending = [], list(self._roots)
+        while pending:
+            node = pending.pop()
+            nodes.append(node)
+            pending.extend(node.children)
+        return nodes
+
+    def report(self) -> Dict[str, Any]:
+        nodes = self._flatten()
+
+        def self_ms(n: _ImportNode) -> float:
+            return (n.elapsed - sum(c.elapsed for c in n.children)) * 1000
+
+        by_total = sorted(nodes, key=lambda n: n.elapsed, reverse=True)[:TOP_N]
+        by_self = sorted(nodes, key=self_ms, reverse=True)[:TOP_N]
+        return {
+            "enabled": self.enabled,
+            "python": sys.version.split()[0],
+            "pid": os.getpid(),
+            "interpreter_start_to_profiler_s": (
+                round(self.installed_at - self.process_start, 3) if self.process_start else None
+            ),
+            "marks": self.marks,
+            "model_loads": self.model_loads,
+            "imports": {
+                "modules": len(nodes),
+                "total_ms": round(sum(n.elapsed for n in self._roots) * 1000, 2),
+                "top_cumulative": [{"module": n.name, "ms": round(n.elapsed * 1000, 2)} for n in by_total],
+                "top_self": [{"module": n.name, "self_ms": round(self_ms(n), 2)} for n in by_self],
+                "tree": [n.to_dict(TREE_MIN_MS) for n in self._roots if n.elapsed * 1000 >= TREE_MIN_MS],
+            },
+        }
+
+    def save(self, path: str = STARTUP_PROFILE_PATH):
+        if not self.enabled:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, ensure_ascii=False, indent=2)
+            logger.info(f"⏱️ Perfil de arranque guardado en {path}")
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo guardar el perfil de arranque: {e}")
+
+
+_startup_profiler_instance: Optional[StartupProfiler] = None
+
+
+def get_startup_profiler() -> StartupProfiler:
+    """Obtener instancia única del perfilador de arranque"""
+    global _startup_profiler_instance
+    if _startup_profiler_instance is None:
+        _startup_profiler_instance = StartupProfiler()
+    return _startup_profiler_instance
+
+
+def install_startup_profiler() -> StartupProfiler:
+    """Llamar al principio del módulo de la aplicación, antes de los imports pesados"""
+    profiler = get_startup_profiler()
+    profiler.install()
+    return profiler
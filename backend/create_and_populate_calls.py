@@ -39,3 +39,8 @@ cursor.executemany(
 conn.commit()
 print(f"Created 'calls' table and inserted {len(sample_calls)} demo records.")
 conn.close()
+
+# Actualizar el resumen diario (call_stats_daily) con las llamadas insertadas
+from sqlalchemy import create_engine
+from backend.core.database.call_stats import rebuild
+rebuild(create_engine("sqlite:///transcripts.db"))
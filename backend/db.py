@@ -1,10 +1,61 @@
+"""
+Acceso a la base de datos principal de SENTINELA
+Un solo motor síncrono (scripts y routers `def`) y un solo motor asíncrono (routers `async def`),
+ambos con pool de conexiones, creados a partir de DATABASE_URL. Los routers piden su sesión con
+Depends(get_async_db): se abre del pool al empezar la petición y se devuelve al terminar, sin
+bloquear el event loop ni abrir una conexión nueva por petición.
+"""
+
+import logging
+import threading
+from typing import AsyncIterator
+
 from sqlalchemy import Column, Integer, String, Text, create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-from backend.config import DATABASE_URL
+from backend.config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+)
+from backend.core.database.sqlite_setup import install_sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
+# Driver asíncrono para cada dialecto de DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def _pool_options(url: str) -> dict:
+    options = {"pool_pre_ping": True}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            return options  # SQLite en memoria: una sola conexión (StaticPool)
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                   pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    return options
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """DATABASE_URL con el driver asíncrono de su dialecto (ASYNC_DATABASE_URL tiene prioridad)"""
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No hay driver asíncrono para {backend}; defina ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
 print(f"[DEBUG] Usando base de datos: {DATABASE_URL}")
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL))
+install_sqlite_pragmas(engine)  # WAL + busy_timeout si DATABASE_URL es SQLite
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -22,6 +73,54 @@ def get_db():
     finally:
         db.close()
 
+
+# Motor asíncrono: se crea al primer uso, así los scripts que sólo usan el motor síncrono
+# no necesitan aiosqlite/asyncpg instalados
+_async_engine = None
+_async_session_factory = None
+_instance_lock = threading.Lock()
+
+
+def get_async_engine():
+    """Obtener el motor asíncrono compartido (pool de conexiones único por proceso)"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        with _instance_lock:
+            if _async_engine is None:
+                from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+                url = async_database_url()
+                _async_engine = create_async_engine(url, **_pool_options(url))
+                install_sqlite_pragmas(_async_engine)
+                _async_session_factory = async_sessionmaker(_async_engine, expire_on_commit=False,
+                                                            autoflush=False)
+                logger.info(f"🗄️ Motor asíncrono de base de datos: {make_url(url).drivername}")
+    return _async_engine
+
+
+def async_session():
+    """Nueva AsyncSession del pool (usar con `async with async_session() as session`)"""
+    get_async_engine()
+    return _async_session_factory()
+
+
+async def get_async_db() -> AsyncIterator:
+    """Dependencia FastAPI: una AsyncSession por petición, devuelta al pool al terminar"""
+    async with async_session() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def dispose_async_engine():
+    """Cerrar las conexiones del pool asíncrono (apagado de la aplicación)"""
+    global _async_engine, _async_session_factory
+    engine_, _async_engine, _async_session_factory = _async_engine, None, None
+    if engine_ is not None:
+        await engine_.dispose()
+
+
 # Run this once to initialize the DB
 if __name__ == "__main__":
     Base.metadata.create_all(bind=engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index, event
 from backend.db import Base
 from sqlalchemy.types import JSON
 from datetime import datetime
@@ -12,6 +12,16 @@ class Call(Base):
     date = Column(String, nullable=False)
     hora = Column(String, nullable=True)
 
+    # Índices de las consultas frecuentes; en bases existentes los crea la migración 1
+    # (backend/core/database/migrations.py)
+    # (pin, fecha): llamadas por día / por PIN; (pin, teléfono): red de vínculos;
+    # (teléfono, pin): PINs que llaman a un contacto
+    __table_args__ = (
+        Index("ix_calls_pin_emitter_date", "pin_emitter", "date"),
+        Index("ix_calls_pin_emitter_phone_number", "pin_emitter", "phone_number"),
+        Index("ix_calls_phone_number_pin_emitter", "phone_number", "pin_emitter"),
+    )
+
 class CallDetails(Base):
     __tablename__ = "call_details"
     id = Column(Integer, primary_key=True, index=True)
@@ -23,3 +33,33 @@ class CallDetails(Base):
     risk_level = Column(Integer, nullable=True)
     risk_factors = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Llamadas enriquecidas: filtro por riesgo y más recientes primero
+    __table_args__ = (
+        Index("ix_call_details_risk_level_created_at", "risk_level", "created_at"),
+        Index("ix_call_details_created_at", "created_at"),
+    )
+
+class CallDailyStats(Base):
+    """
+    Resumen diario por PIN de calls / call_details, mantenido por triggers AFTER INSERT sobre
+    esas tablas (backend/core/database/call_stats.py) para no agrupar la tabla calls en cada consulta
+    """
+    __tablename__ = "call_stats_daily"
+    pin_emitter = Column(String, primary_key=True)
+    date = Column(String, primary_key=True)
+    call_count = Column(Integer, nullable=False, default=0)
+    total_duration_seconds = Column(Integer, nullable=False, default=0)
+    max_risk_level = Column(Integer, nullable=True)
+
+
+_CALL_STATS_TABLES = {Call.__tablename__, CallDetails.__tablename__, CallDailyStats.__tablename__}
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_call_stats(target, connection, tables=(), **kw):
+    """create_all() que crea calls / call_details: dejar listos el resumen diario y sus triggers"""
+    if not any(table.name in _CALL_STATS_TABLES for table in tables):
+        return
+    from backend.core.database.call_stats import ensure_call_stats
+    ensure_call_stats(connection)
@@ -1,15 +1,15 @@
 # Script: Transcribe .wav files with Whisper and generate alert events
 import os
 import re
-import json
 import sys
 from datetime import datetime
-import whisper
 from fpdf import FPDF
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from backend.db import SessionLocal
 from backend.models.alert import AlertPhrase, AlertEvent
 from backend.db_call_details import Call
+from backend.core.analysis.phrase_matcher import PhraseMatcher, load_risk_phrases
+from backend.core.audio.batch_engine import BatchTranscriber, discover_audio
 
 AUDIO_DIR = os.path.join(os.path.dirname(__file__), "transcripts")
 PHRASES_PATH = os.path.join(os.path.dirname(__file__), "data/risk_phrases_corrected.json")
@@ -17,8 +17,7 @@ TRANSCRIPT_PDF_DIR = os.path.join(AUDIO_DIR, "pdf_from_audio")
 os.makedirs(TRANSCRIPT_PDF_DIR, exist_ok=True)
 
 def load_phrases():
-    with open(PHRASES_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return PhraseMatcher(load_risk_phrases(PHRASES_PATH))
 
 def get_or_create_phrase(db, phrase):
     db_phrase = db.query(AlertPhrase).filter_by(phrase=phrase).first()
@@ -51,41 +50,34 @@ def save_transcript_pdf(transcript, pdf_path):
 
 def main():
     db = SessionLocal()
-    phrases = load_phrases()
-    model = whisper.load_model("base")
+    matcher = load_phrases()
     alert_count = 0
-    for fname in os.listdir(AUDIO_DIR):
-        if not fname.endswith(".wav"):
-            continue
-        fpath = os.path.join(AUDIO_DIR, fname)
-        print(f"Transcribiendo {fname}...")
-        result = model.transcribe(fpath, fp16=False)
-        transcript = result["text"]
-        print(f"Transcripción: {transcript}")
+
+    def procesar(entry):
+        # Sólo se llama para audios nuevos: los ya transcritos (mismo hash) no duplican alertas
+        nonlocal alert_count
+        fname = os.path.basename(entry["path"])
+        transcript = entry["text"]
+        print(f"Transcripción de {fname}: {transcript}")
         pdf_name = fname.rsplit(".", 1)[0] + ".pdf"
         pdf_path = os.path.join(TRANSCRIPT_PDF_DIR, pdf_name)
         save_transcript_pdf(transcript, pdf_path)
         call_id = get_call_id_from_filename(db, fname)
-        text_lower = transcript.lower()
-        for phrase in phrases:
-            phrase_lower = phrase.lower()
-            start = 0
-            while True:
-                idx = text_lower.find(phrase_lower, start)
-                if idx == -1:
-                    break
-                snippet = transcript[max(0, idx-40):idx+len(phrase)+40].replace("\n", " ")
-                db_phrase = get_or_create_phrase(db, phrase)
-                event = AlertEvent(
-                    phrase_id=db_phrase.id,
-                    transcript_snippet=snippet.strip(),
-                    timestamp=datetime.now(),
-                    call_id=call_id
-                )
-                db.add(event)
-                alert_count += 1
-                start = idx + len(phrase)
+        for match in matcher.find_all(transcript):
+            snippet = transcript[max(0, match["start"]-40):match["end"]+40].replace("\n", " ")
+            db_phrase = get_or_create_phrase(db, match["phrase"])
+            event = AlertEvent(
+                phrase_id=db_phrase.id,
+                transcript_snippet=snippet.strip(),
+                timestamp=datetime.now(),
+                call_id=call_id
+            )
+            db.add(event)
+            alert_count += 1
         db.commit()
+
+    archivos = [p for p in discover_audio([AUDIO_DIR], recursive=False) if p.endswith(".wav")]
+    BatchTranscriber(model_name="base").run(archivos, on_result=procesar)
     db.close()
     print(f"Listo. Se generaron {alert_count} eventos de alerta desde audios transcritos.")
 
@@ -1,18 +1,18 @@
 # Script para procesar PDFs de transcripciones y generar eventos de alerta en la base de datos
-import sys, os, re, json
+import sys, os, re
 from datetime import datetime
 from PyPDF2 import PdfReader
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from backend.db import SessionLocal
 from backend.models.alert import AlertPhrase, AlertEvent
 from backend.db_call_details import Call
+from backend.core.analysis.phrase_matcher import PhraseMatcher, load_risk_phrases
 
 PDF_DIR = os.path.join(os.path.dirname(__file__), "transcripts", "pdf")
 PHRASES_PATH = os.path.join(os.path.dirname(__file__), "data/risk_phrases_corrected.json")
 
 def load_phrases():
-    with open(PHRASES_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return PhraseMatcher(load_risk_phrases(PHRASES_PATH))
 
 def get_or_create_phrase(db, phrase):
     db_phrase = db.query(AlertPhrase).filter_by(phrase=phrase).first()
@@ -37,7 +37,7 @@ def get_call_id_from_filename(db, filename):
 
 def main():
     db = SessionLocal()
-    phrases = load_phrases()
+    matcher = load_phrases()
     alert_count = 0
     for fname in os.listdir(PDF_DIR):
         if not fname.endswith(".pdf"):
@@ -46,25 +46,17 @@ def main():
         reader = PdfReader(fpath)
         text = "\n".join(page.extract_text() or "" for page in reader.pages)
         call_id = get_call_id_from_filename(db, fname)
-        text_lower = text.lower()
-        for phrase in phrases:
-            phrase_lower = phrase.lower()
-            start = 0
-            while True:
-                idx = text_lower.find(phrase_lower, start)
-                if idx == -1:
-                    break
-                snippet = text[max(0, idx-40):idx+len(phrase)+40].replace("\n", " ")
-                db_phrase = get_or_create_phrase(db, phrase)
-                event = AlertEvent(
-                    phrase_id=db_phrase.id,
-                    transcript_snippet=snippet.strip(),
-                    timestamp=datetime.now(),
-                    call_id=call_id
-                )
-                db.add(event)
-                alert_count += 1
-                start = idx + len(phrase)
+        for match in matcher.find_all(text):
+            snippet = text[max(0, match["start"]-40):match["end"]+40].replace("\n", " ")
+            db_phrase = get_or_create_phrase(db, match["phrase"])
+            event = AlertEvent(
+                phrase_id=db_phrase.id,
+                transcript_snippet=snippet.strip(),
+                timestamp=datetime.now(),
+                call_id=call_id
+            )
+            db.add(event)
+            alert_count += 1
         db.commit()
     db.close()
     print(f"Listo. Se generaron {alert_count} eventos de alerta desde PDFs de transcripciones.")
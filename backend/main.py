@@ -1,3 +1,7 @@
+# Perfilado de arranque (STARTUP_PROFILE=true): se instala antes de los imports pesados
+from backend.core.startup_profiler import install_startup_profiler
+startup_profiler = install_startup_profiler()
+
 from fastapi import FastAPI, Request
 from backend.server.user_router import user_router
 from backend.server.dangerous_words_router import dangerous_words_router
@@ -9,6 +13,11 @@ from backend.core.analysis.network_visualizer import NetworkVisualizer
 from backend.core.analysis.content_analyzer import ContentAnalyzer
 from backend.core.audio.cloud_transcriber import transcribe_gcs
 from backend.core.licensing.license_manager import get_license_manager
+from backend.core.audio.inference_pool import get_inference_pool, get_repass_pool, QueueFullError
+from backend.db import dispose_async_engine
+from backend.core.database.migrations import apply_migrations
+from backend.config import DB_AUTO_MIGRATE
+from starlette.concurrency import run_in_threadpool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,6 +34,17 @@ import multiprocessing
 
 app = FastAPI()
 
+async def migrar_esquema():
+    """Aplicar las migraciones pendientes del esquema (índices...) fuera del event loop"""
+    if not DB_AUTO_MIGRATE:
+        return
+    try:
+        aplicadas = await run_in_threadpool(apply_migrations)
+        if aplicadas:
+            logger.info(f"🔧 Migraciones aplicadas: {aplicadas}")
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron aplicar las migraciones del esquema: {e}")
+
 # Evento de inicio: Verificar licencia USB
 @app.on_event("startup")
 async def startup_event():
@@ -50,6 +70,25 @@ async def startup_event():
     
     logger.info("=" * 60)
 
+    await migrar_esquema()
+
+    # Levantar el pool de inferencia Whisper para /stream/fragment
+    get_inference_pool().start()
+    startup_profiler.mark("startup_complete")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    get_inference_pool().shutdown(wait=False)
+    get_repass_pool().shutdown(wait=False)
+    await dispose_async_engine()
+
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    response = await call_next(request)
+    if not startup_profiler.first_request_done:
+        startup_profiler.record_first_request(request.url.path)
+    return response
+
 # Rutas de gestión de usuarios
 app.include_router(user_router)
 
@@ -96,6 +135,14 @@ app.include_router(fingerprint_router)
 from backend.server.report_router import router as report_router
 app.include_router(report_router)
 
+# Incluir el router de búsqueda de texto completo
+from backend.server.search_router import router as search_router
+app.include_router(search_router)
+
+# Sesiones de transcripción continua por llamada
+from backend.server.stream_router import router as stream_router
+app.include_router(stream_router)
+
 # Incluir el router de configuración de bases de datos
 from backend.server.database_config_router import router as database_config_router
 app.include_router(database_config_router)
@@ -104,6 +151,10 @@ app.include_router(database_config_router)
 from backend.server.license_router import router as license_router
 app.include_router(license_router)
 
+# Incluir el router de administración (modelos cargados en memoria)
+from backend.server.admin_router import router as admin_router
+app.include_router(admin_router)
+
 # Montar la carpeta /client como ruta estática
 import os
 CLIENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "client"))
@@ -146,31 +197,39 @@ async def get_photo(pin: str = Query(...)):
             print(f"[PHOTO ENDPOINT] NO ENCONTRADO: {photo_path}", file=sys.stderr)
     raise HTTPException(status_code=404, detail=f"Foto para PIN {pin} no encontrada.")
 
-# --- Cargar modelo Whisper y frases peligrosas para fragmentos ---
-import whisper
+# --- Pool de inferencia Whisper y frases peligrosas para fragmentos ---
 import json
 from datetime import datetime
-from fastapi import UploadFile, Form
+from fastapi import UploadFile, Form, BackgroundTasks
+from backend.core.audio.pcm import decode_audio_bytes
+from backend.core.audio.vad import get_vad
+from backend.core.audio.repass import (
+    average_logprob, repass_reason, get_repass_scheduler, append_transcript_line,
+)
+from backend.config import PERSIST_FRAGMENT_AUDIO
 
-WHISPER_MODEL = whisper.load_model("base")
-# --- Cargar frases peligrosas desde risk_phrases_corrected.json si existe, si no usa el default ---
+# --- Frases peligrosas: autómata compartido construido desde risk_phrases_corrected.json ---
 import os
-
-DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "data/risk_phrases_corrected.json"))
-DEFAULT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../config/frases_peligrosas.json"))
-if os.path.exists(DATA_PATH):
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        FRASES_PELIGROSAS = json.load(f)
-else:
-    with open(DEFAULT_PATH, "r", encoding="utf-8") as f:
-        FRASES_PELIGROSAS = json.load(f)
+from backend.core.analysis.phrase_matcher import get_risk_matcher
+from backend.core.reports.transcript_catalog import register_transcript_file
+from backend.core.reports.search_index import index_transcript_fragment
 
 TRANSCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../transcripts"))
 os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
 print(f"[DEBUG] Ruta absoluta de TRANSCRIPTS_DIR: {TRANSCRIPTS_DIR}")
+app.state.transcripts_dir = TRANSCRIPTS_DIR
+
+def guardar_audio_fragmento(filepath: str, contents: bytes):
+    """Persistir el audio crudo del fragmento (tarea en segundo plano)"""
+    try:
+        with open(filepath, "wb") as f:
+            f.write(contents)
+        register_transcript_file(filepath)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el audio {filepath}: {e}")
 
 @app.post("/stream/fragment")
-async def recibir_fragmento(file: UploadFile, pin: str = Form(...)):
+async def recibir_fragmento(background_tasks: BackgroundTasks, file: UploadFile, pin: str = Form(...)):
     try:
         now = datetime.now()
         fecha = now.strftime("%Y-%m-%d")
@@ -183,33 +242,54 @@ async def recibir_fragmento(file: UploadFile, pin: str = Form(...)):
             msg = "El archivo de audio recibido está vacío o es muy pequeño."
             print(f"❌ {msg}")
             return {"error": msg}
-        with open(filepath, "wb") as f:
-            f.write(contents)
+        # Decodificar en memoria (sin archivo temporal); guardar el WAV es opcional. En el
+        # threadpool: los formatos comprimidos pasan por un subproceso ffmpeg
+        try:
+            audio = await run_in_threadpool(decode_audio_bytes, contents)
+        except Exception as e:
+            msg = f"No se pudo decodificar el audio recibido: {e}"
+            print(f"❌ {msg}")
+            return {"error": msg}
+        if PERSIST_FRAGMENT_AUDIO:
+            background_tasks.add_task(guardar_audio_fragmento, filepath, contents)
 
-        # Transcribir fragmento
+        # Fragmentos sin voz se responden sin pasar por Whisper; los demás se recortan a la voz
+        audio = get_vad().trim(audio)
+        if audio is None:
+            print(f"🔇 Fragmento sin voz para PIN {pin}; no se transcribe")
+            return {"text": "", "language": "", "alertas": [], "vad": "silence"}
+
+        # Transcribir fragmento en el pool de inferencia (fuera del event loop)
         try:
-            result = WHISPER_MODEL.transcribe(filepath, fp16=False)
+            result = await get_inference_pool().transcribe(audio, fp16=False)
+        except QueueFullError as e:
+            msg = f"Servidor de transcripción saturado, reintente en unos segundos: {e}"
+            print(f"⏳ {msg}")
+            return JSONResponse({"error": msg}, status_code=503, headers={"Retry-After": "1"})
         except Exception as e:
             msg = f"Error al transcribir el fragmento: {e}"
             print(f"❌ {msg}")
             return {"error": msg}
         texto = result["text"].strip()
         idioma_detectado = result.get("language", "es")
-        alertas = []
-        for frase in FRASES_PELIGROSAS:
-            if frase.lower() in texto.lower():
-                alertas.append(frase)
+        alertas = get_risk_matcher().matched_phrases(texto)
 
         # Guardar texto e idioma en documento separado
         transcripcion_file = f"{TRANSCRIPTS_DIR}/{pin}_{fecha}_Ttranscripcion.txt"
-        with open(transcripcion_file, "a", encoding="utf-8") as f:
-            f.write(f"[{hora}] ({idioma_detectado}) {texto.strip()}\n")
+        # Fuera del event loop: puede esperar a que la re-pasada termine de reescribir el archivo
+        await run_in_threadpool(append_transcript_line, transcripcion_file, f"[{hora}] ({idioma_detectado}) {texto.strip()}\n")
+        register_transcript_file(transcripcion_file)
+        background_tasks.add_task(index_transcript_fragment, transcripcion_file, pin, fecha, hora, texto)
+
+        # Frases de riesgo o baja confianza: segunda pasada con el modelo grande en segundo plano
+        motivo = repass_reason(texto, alertas, average_logprob(result))
+        get_repass_scheduler().schedule(audio, pin, transcripcion_file, fecha, hora, texto, motivo, idioma_detectado)
 
         print(f"✅ Fragmento recibido y transcrito para PIN {pin} (idioma: {idioma_detectado})")
         if alertas:
             print(f"🚨 ALERTA detectada en fragmento: {alertas}")
 
-        return {"text": texto, "language": idioma_detectado, "alertas": alertas}
+        return {"text": texto, "language": idioma_detectado, "alertas": alertas, "repass": motivo}
     except Exception as e:
         msg = f"Error inesperado en el endpoint: {e}"
         print(f"❌ {msg}")
@@ -353,6 +433,8 @@ async def transcribe_endpoint(request: Request):
         return JSONResponse({"error": "Transcription failed"}, status_code=500)
     return JSONResponse({"segments": segments})
 
+startup_profiler.mark("imports_done")
+
 if __name__ == "__main__":
     multiprocessing.freeze_support()
     import uvicorn
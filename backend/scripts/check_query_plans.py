@@ -0,0 +1,170 @@
+"""
+Verifica con EXPLAIN que las consultas frecuentes sobre calls / call_details usan su índice.
+Falla (código 1) si alguna no usa ninguno de sus índices esperados o recorre una tabla completa.
+Por defecto usa una base SQLite temporal con el esquema de los modelos, las migraciones y
+estadísticas de planificador equivalentes a millones de llamadas (sin ellas SQLite elige
+índices al azar sobre tablas vacías). Con --database-url revisa la base indicada (SQLite,
+PostgreSQL o MySQL) con sus propias estadísticas; conviene ejecutar ANALYZE antes:
+
+    python backend/scripts/check_query_plans.py [--database-url URL] [--verbose]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import create_engine, text
+
+# (nombre, consulta, parámetros, índices aceptables en el plan)
+HOT_QUERIES = [
+    (
+        "llamadas por día de un PIN (/llamadas-por-dia, resumen diario)",
+        "SELECT date, SUM(call_count) FROM call_stats_daily WHERE pin_emitter = :pin GROUP BY date ORDER BY date",
+        {"pin": "666"},
+        ("sqlite_autoindex_call_stats_daily_1", "call_stats_daily_pkey", "'key': 'PRIMARY'"),
+    ),
+    (
+        "llamadas de un PIN con detalle (/llamadas)",
+        "SELECT calls.id, call_details.duration FROM calls "
+        "JOIN call_details ON calls.id = call_details.call_id "
+        "WHERE calls.pin_emitter = :pin ORDER BY calls.date DESC, calls.id DESC LIMIT 100",
+        {"pin": "666"},
+        ("ix_calls_pin_emitter_date",),
+    ),
+    (
+        "llamadas enriquecidas por rango de riesgo (/api/calls/enriched?min_risk=&max_risk=)",
+        "SELECT calls.id, call_details.risk_level FROM calls "
+        "JOIN call_details ON calls.id = call_details.call_id "
+        "WHERE call_details.risk_level >= :min_risk AND call_details.risk_level <= :max_risk "
+        "ORDER BY call_details.created_at DESC LIMIT 50",
+        {"min_risk": 7, "max_risk": 9},
+        ("ix_call_details_risk_level_created_at",),
+    ),
+    (
+        "llamadas enriquecidas más recientes (/api/calls/enriched)",
+        "SELECT calls.id, call_details.risk_level FROM calls "
+        "JOIN call_details ON calls.id = call_details.call_id "
+        "ORDER BY call_details.created_at DESC LIMIT 50",
+        {},
+        ("ix_call_details_created_at",),
+    ),
+    (
+        "red de vínculos de un PIN (/network)",
+        "SELECT phone_number, COUNT(*) FROM calls WHERE pin_emitter = :pin "
+        "GROUP BY phone_number ORDER BY COUNT(*) DESC",
+        {"pin": "666"},
+        ("ix_calls_pin_emitter_phone_number",),
+    ),
+    (
+        "llamadas entre PIN y contacto (/llamadas?pin=&contact=)",
+        "SELECT id, date FROM calls WHERE pin_emitter = :pin AND phone_number = :phone ORDER BY date DESC",
+        {"pin": "666", "phone": "5550001"},
+        # Ambas columnas por igualdad: cualquiera de los dos índices compuestos sirve
+        ("ix_calls_pin_emitter_phone_number", "ix_calls_phone_number_pin_emitter"),
+    ),
+    (
+        "otros PINs que llaman a un contacto (reporte_vinculos_excel.py)",
+        "SELECT DISTINCT pin_emitter FROM calls WHERE phone_number = :phone AND pin_emitter != :pin",
+        {"phone": "5550001", "pin": "666"},
+        ("ix_calls_phone_number_pin_emitter",),
+    ),
+]
+
+# sqlite_stat1 de la base temporal: ~2 millones de llamadas, ~1000 PINs, ~50 contactos por PIN
+# y niveles de riesgo de 0 a 10 (filas totales, filas por valor del 1er, 2º... campo del índice)
+REPRESENTATIVE_STATS = [
+    ("calls", None, "2000000"),
+    ("calls", "ix_calls_pin_emitter_date", "2000000 2000 4"),
+    ("calls", "ix_calls_pin_emitter_phone_number", "2000000 2000 40"),
+    ("calls", "ix_calls_phone_number_pin_emitter", "2000000 40 40"),
+    ("call_stats_daily", "sqlite_autoindex_call_stats_daily_1", "500000 500 1"),
+    ("call_details", None, "2000000"),
+    ("call_details", "ix_call_details_risk_level_created_at", "2000000 200000 1"),
+    ("call_details", "ix_call_details_created_at", "2000000 1"),
+]
+
+# Recorrido completo de una tabla en el plan, por dialecto
+FULL_SCAN_MARKERS = {
+    "sqlite": lambda line: line.startswith("SCAN ") and " INDEX " not in line,
+    "postgresql": lambda line: "Seq Scan" in line,
+    "mysql": lambda line: "'type': 'ALL'" in line,
+}
+
+
+def explain(conn, sql, params):
+    """Plan de ejecución como texto, según el dialecto"""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+        return "\n".join(str(row[-1]) for row in rows)
+    if dialect == "postgresql":
+        # Con tablas pequeñas el planificador prefiere el recorrido secuencial; se desactiva
+        # para verificar que el índice existe y es aplicable a la consulta
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = conn.execute(text("EXPLAIN " + sql), params).all()
+        return "\n".join(row[0] for row in rows)
+    rows = conn.execute(text("EXPLAIN " + sql), params).mappings().all()
+    return "\n".join(str(dict(row)) for row in rows)
+
+
+def check(engine, verbose=False):
+    failures = 0
+    full_scan = FULL_SCAN_MARKERS.get(engine.dialect.name, lambda line: False)
+    with engine.connect() as conn:
+        for name, sql, params, indexes in HOT_QUERIES:
+            with conn.begin():
+                plan = explain(conn, sql, params)
+            used = [index for index in indexes if index in plan]
+            scans = [line for line in plan.splitlines() if full_scan(line.strip())]
+            ok = bool(used) and not scans
+            failures += not ok
+            if ok:
+                print(f"✅ {name}: usa {used[0]}")
+            else:
+                motivo = "recorre la tabla completa" if scans else f"NO usa {' / '.join(indexes)}"
+                print(f"❌ {name}: {motivo}")
+            if verbose or not ok:
+                for line in plan.splitlines():
+                    print(f"      {line}")
+    return failures
+
+
+def temporary_engine():
+    """SQLite temporal con el esquema de los modelos (tablas vacías, sólo interesa el plan)"""
+    from backend.db import Base
+    import backend.db_call_details  # noqa: F401 - registra Call y CallDetails en Base
+    from backend.core.database.migrations import apply_migrations
+    path = os.path.join(tempfile.mkdtemp(), "plans.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables["calls"], Base.metadata.tables["call_details"]])
+    apply_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.execute(text("DELETE FROM sqlite_stat1"))
+        for table, index, stat in REPRESENTATIVE_STATS:
+            conn.execute(text("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (:t, :i, :s)"),
+                         {"t": table, "i": index, "s": stat})
+    # SQLite carga sqlite_stat1 al abrir la conexión
+    engine.dispose()
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificar el uso de índices de las consultas frecuentes")
+    parser.add_argument("--database-url", default=None, help="Base a revisar (por defecto, SQLite temporal)")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar el plan completo de cada consulta")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url) if args.database_url else temporary_engine()
+    failures = check(engine, verbose=args.verbose)
+    if failures:
+        print(f"\n❌ {failures} consulta(s) sin índice; aplique las migraciones "
+              f"(python -m backend.core.database.migrations)")
+        sys.exit(1)
+    print(f"\n✅ Las {len(HOT_QUERIES)} consultas frecuentes usan su índice")
+
+
+if __name__ == "__main__":
+    main()
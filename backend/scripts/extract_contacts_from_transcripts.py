@@ -1,9 +1,13 @@
-import sqlite3
 import os
 import re
+import sys
 from PyPDF2 import PdfReader
 from collections import defaultdict
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.core.database.sqlite_setup import connect
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "transcripts")
 db_path = os.path.join(BASE_DIR, "transcripts.db")
@@ -53,7 +57,7 @@ def process_transcripts():
     """
     Procesa todos los PDFs de transcripciones y extrae contactos con sus identidades.
     """
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     
     # Diccionario para agrupar información por número de teléfono
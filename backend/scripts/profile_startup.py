@@ -0,0 +1,38 @@
+"""
+Mide el costo de arranque del backend sin levantar el servidor.
+Importa la aplicación con STARTUP_PROFILE activado, guarda el reporte JSON y muestra los
+módulos más costosos. Útil para comparar versiones:
+
+    python backend/scripts/profile_startup.py [backend.main|backend.server.microservicio_fastapi] [salida.json]
+"""
+import importlib
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ["STARTUP_PROFILE"] = "true"
+
+def main():
+    module_name = sys.argv[1] if len(sys.argv) > 1 else "backend.main"
+    if len(sys.argv) > 2:
+        os.environ["STARTUP_PROFILE_PATH"] = os.path.abspath(sys.argv[2])
+
+    from backend.core.startup_profiler import install_startup_profiler
+    profiler = install_startup_profiler()
+    importlib.import_module(module_name)
+    profiler.mark("imported " + module_name)
+    profiler.save()
+
+    report = profiler.report()
+    print(f"⏱️ {module_name}: {report['imports']['modules']} módulos, {report['imports']['total_ms']:.0f} ms en imports")
+    print("\nMódulos más costosos (acumulado):")
+    for item in report["imports"]["top_cumulative"][:15]:
+        print(f"  {item['ms']:>9.1f} ms  {item['module']}")
+    print("\nMódulos más costosos (tiempo propio):")
+    for item in report["imports"]["top_self"][:15]:
+        print(f"  {item['self_ms']:>9.1f} ms  {item['module']}")
+    for load in report["model_loads"]:
+        print(f"📦 {load['model']}: {load['seconds']:.1f} s, +{load['rss_delta_mb']:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import os
-import whisper
+import sys
 import requests
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from backend.core.analysis.phrase_matcher import PhraseMatcher
+from backend.core.audio.batch_engine import BatchTranscriber, discover_audio
 
 API_URL = "http://localhost:8000/alerts"  # Ajusta si tu backend usa otro host/puerto
 
@@ -20,30 +23,30 @@ def reportar_evento_alerta(phrase_id, snippet, call_id):
     return resp.json()
 
 def transcribir_fragmentos(folder, model_name="medium", language="Spanish", call_id=None):
-    model = whisper.load_model(model_name)
     # Obtener frases de alerta dinámicamente
     frases_alerta = obtener_frases_alerta()
     print("Frases de alerta cargadas:", frases_alerta)
     # Mapear frase a ID para reportar eventos
     frases_data = requests.get(f"{API_URL}/phrases/").json()
     frase_to_id = {item["phrase"]: item["id"] for item in frases_data}
-    results = []
-    for filename in sorted(os.listdir(folder)):
-        if filename.endswith(".wav"):
-            audio_path = os.path.join(folder, filename)
-            print(f"Transcribiendo {audio_path}...")
-            result = model.transcribe(audio_path, language=language)
-            texto = result["text"]
-            results.append((filename, texto))
-            with open(os.path.join(folder, filename.replace('.wav', '.txt')), "w") as f:
-                f.write(texto)
-            # Detectar y reportar alertas
-            for frase in frases_alerta:
-                if frase.lower() in texto.lower():
-                    print(f"¡Alerta detectada! Frase: {frase} en {filename}")
-                    phrase_id = frase_to_id.get(frase)
-                    if phrase_id:
-                        reportar_evento_alerta(phrase_id, texto, call_id or folder)
+    matcher = PhraseMatcher(frases_alerta)
+
+    def procesar(entry):
+        # Sólo fragmentos nuevos; los ya transcritos con este modelo se toman del manifiesto
+        filename = os.path.basename(entry["path"])
+        texto = entry["text"]
+        with open(os.path.join(folder, filename.replace('.wav', '.txt')), "w") as f:
+            f.write(texto)
+        # Detectar y reportar alertas
+        for frase in matcher.matched_phrases(texto):
+            print(f"¡Alerta detectada! Frase: {frase} en {filename}")
+            phrase_id = frase_to_id.get(frase)
+            if phrase_id:
+                reportar_evento_alerta(phrase_id, texto, call_id or folder)
+
+    archivos = [p for p in discover_audio([folder], recursive=False) if p.endswith(".wav")]
+    reporte = BatchTranscriber(model_name=model_name, language=language).run(archivos, on_result=procesar)
+    results = [(os.path.basename(r["path"]), r.get("text", "")) for r in reporte["results"]]
     # Guarda toda la transcripción junta en un solo archivo
     with open(os.path.join(folder, "transcripcion_total.txt"), "w") as f:
         for fname, texto in results:
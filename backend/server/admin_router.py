@@ -0,0 +1,86 @@
+"""
+Router de administración: modelos cargados en memoria, perfil de arranque, ahorro del VAD y
+caché de transcripciones
+"""
+
+from fastapi import APIRouter, HTTPException
+from backend.core.model_registry import get_model_registry, ModelNotRegisteredError
+from backend.core.startup_profiler import get_startup_profiler
+from backend.core.audio.vad import get_vad
+from backend.core.audio.transcription_cache import get_transcription_cache
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/models")
+def get_models_status():
+    """
+    Modelos registrados: cargados o no, memoria estimada, cargas/descargas y tiempo inactivo
+    """
+    return get_model_registry().stats()
+
+
+@router.post("/models/{name:path}/load")
+def load_model(name: str):
+    """
+    Cargar un modelo por adelantado (por ejemplo, antes de una carga de trabajo conocida); se
+    intenta aunque la última carga haya fallado hace poco
+    """
+    registry = get_model_registry()
+    try:
+        registry.get(name, retry=True)
+    except ModelNotRegisteredError:
+        raise HTTPException(status_code=404, detail=f"Modelo no registrado: {name}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"No se pudo cargar {name}: {e}")
+    return registry.stats()["models"][name]
+
+
+@router.post("/models/{name:path}/unload")
+def unload_model(name: str):
+    """
+    Liberar un modelo de memoria; se volverá a cargar cuando se necesite
+    """
+    try:
+        unloaded = get_model_registry().unload(name)
+    except ModelNotRegisteredError:
+        raise HTTPException(status_code=404, detail=f"Modelo no registrado: {name}")
+    return {"name": name, "unloaded": unloaded}
+
+
+@router.post("/models/evict-idle")
+def evict_idle_models():
+    """
+    Expulsar ya los modelos que superaron el tiempo máximo de inactividad
+    """
+    return {"evicted": get_model_registry().evict_idle()}
+
+
+@router.get("/startup")
+def get_startup_profile():
+    """
+    Perfil de arranque: árbol de tiempos de import (con STARTUP_PROFILE=true), carga de
+    modelos con tiempo y memoria, e hitos hasta la primera petición atendida
+    """
+    return get_startup_profiler().report()
+
+
+@router.get("/vad")
+def get_vad_stats():
+    """
+    Detección de voz antes de Whisper: audio recibido, segundos descartados por silencio y
+    recortados en los bordes, y proporción de audio que no llegó a transcribirse
+    """
+    return get_vad().stats()
+
+
+@router.get("/transcription-cache")
+def get_transcription_cache_stats():
+    """Caché de transcripciones: entradas, tamaño frente al máximo, aciertos, fallos y expulsiones"""
+    return get_transcription_cache().stats()
+
+
+@router.delete("/transcription-cache")
+def clear_transcription_cache():
+    """Vaciar la caché (por ejemplo, después de cambiar de modelo o corregir el audio de entrada)"""
+    return {"removed": get_transcription_cache().clear()}
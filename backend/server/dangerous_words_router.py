@@ -5,6 +5,7 @@ from datetime import datetime
 import json
 import os
 from pathlib import Path
+from backend.core.analysis.phrase_matcher import reload_risk_matcher
 
 dangerous_words_router = APIRouter()
 
@@ -69,6 +70,9 @@ def save_words_to_json(words: List[DangerousWord]):
     with open(JSON_FILE_PATH, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
+    # Recompilar el detector de frases con el directorio actualizado
+    reload_risk_matcher([(w.word, w.category) for w in words])
+
 # Cargar palabras al iniciar
 dangerous_words_db = load_words_from_json()
 
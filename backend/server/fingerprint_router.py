@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from backend.db import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_async_db
 from backend.models.inmate import Inmate
 from pydantic import BaseModel
 
@@ -15,17 +16,17 @@ class FingerprintVerifyRequest(BaseModel):
     fingerprint_template: str
 
 @router.post("/register")
-def register_fingerprint(data: FingerprintRegisterRequest, db: Session = Depends(get_db)):
-    inmate = db.query(Inmate).filter(Inmate.pin == data.pin).first()
+async def register_fingerprint(data: FingerprintRegisterRequest, db: AsyncSession = Depends(get_async_db)):
+    inmate = (await db.scalars(select(Inmate).where(Inmate.pin == data.pin).limit(1))).first()
     if not inmate:
         raise HTTPException(status_code=404, detail="PPL no encontrado")
     inmate.fingerprint_template = data.fingerprint_template
-    db.commit()
+    await db.commit()
     return {"status": "registered"}
 
 @router.post("/verify")
-def verify_fingerprint(data: FingerprintVerifyRequest, db: Session = Depends(get_db)):
-    inmate = db.query(Inmate).filter(Inmate.pin == data.pin).first()
+async def verify_fingerprint(data: FingerprintVerifyRequest, db: AsyncSession = Depends(get_async_db)):
+    inmate = (await db.scalars(select(Inmate).where(Inmate.pin == data.pin).limit(1))).first()
     if not inmate or not inmate.fingerprint_template:
         raise HTTPException(status_code=404, detail="PPL o huella no encontrada")
     # Aquí se debería usar el SDK real para comparar la huella recibida con la almacenada
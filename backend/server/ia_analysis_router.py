@@ -1,15 +1,16 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any
+from collections import defaultdict
+from backend.config import ANALYSIS_BATCH_SIZE, SENTIMENT_BATCH_SIZE
 from backend.core.analysis.content_analyzer import ContentAnalyzer
-import spacy
+from backend.core.model_registry import ModelLoadFailedError, get_model_registry
 
 router = APIRouter()
 
 from langdetect import detect
-from transformers import pipeline
 
-# Inicializar ContentAnalyzer
+# Inicializar ContentAnalyzer (su modelo de sentimiento se carga al primer uso)
 content_analyzer = ContentAnalyzer()
 
 # Modelos spaCy por idioma
@@ -34,30 +35,38 @@ SENTIMENT_MODELS = {
     'zh': 'uer/roberta-base-finetuned-jd-binary-chinese',
 }
 
-# Cache de modelos spaCy y pipelines
-_spacy_cache = {}
-_sentiment_cache = {}
-
-# Precarga todos los modelos soportados al iniciar
-for lang, model_name in SPACY_MODELS.items():
+def _load_spacy(model_name):
+    import spacy
     try:
-        _spacy_cache[lang] = spacy.load(model_name)
-    except Exception:
+        return spacy.load(model_name)
+    except OSError:
         import spacy.cli
         spacy.cli.download(model_name)
-        _spacy_cache[lang] = spacy.load(model_name)
+        return spacy.load(model_name)
 
+def _load_sentiment(model_name):
+    from transformers import pipeline
+    return pipeline('sentiment-analysis', model=model_name)
+
+# Registrar los modelos sin cargarlos: cada idioma se carga la primera vez que llega un texto en él
+_registry = get_model_registry()
+for lang, model_name in SPACY_MODELS.items():
+    _registry.register(f"spacy:{model_name}", lambda name=model_name: _load_spacy(name))
 for lang, model_name in SENTIMENT_MODELS.items():
-    try:
-        _sentiment_cache[lang] = pipeline('sentiment-analysis', model=model_name)
-    except Exception as e:
-        print(f"[WARN] No se pudo cargar modelo de sentimiento para {lang}: {e}")
+    _registry.register(f"sentiment:{model_name}", lambda name=model_name: _load_sentiment(name))
 
 def get_spacy(lang):
-    return _spacy_cache.get(lang)
+    return _registry.get(f"spacy:{SPACY_MODELS[lang]}")
 
 def get_sentiment_pipeline(lang):
-    return _sentiment_cache.get(lang)
+    try:
+        return _registry.get(f"sentiment:{SENTIMENT_MODELS[lang]}")
+    except ModelLoadFailedError:
+        # Falló hace poco (ya avisado): el registro no reintenta la carga en cada petición
+        return None
+    except Exception as e:
+        print(f"[WARN] No se pudo cargar modelo de sentimiento para {lang}: {e}")
+        return None
 
 # MODELOS DE ENTRADA Y SALIDA
 class TranscripcionIn(BaseModel):
@@ -70,44 +79,67 @@ class TranscripcionIA(BaseModel):
     resumen_automatico: str
     emocion: str
 
+# Componentes spaCy necesarios: NER (palabras clave) y segmentación en oraciones (resumen)
+SPACY_KEEP_PIPES = {"tok2vec", "transformer", "ner", "parser", "senter"}
+
+def _detect_language(texto):
+    try:
+        return detect(texto)
+    except Exception:
+        return 'es'  # fallback
+
+def _sentiment_labels(lang, textos):
+    """Etiqueta de sentimiento por texto, en lotes; un lote que falla se reintenta texto por texto"""
+    sentiment_pipeline = get_sentiment_pipeline(lang)
+    if not sentiment_pipeline:
+        return ["No disponible"] * len(textos)
+    etiquetas = []
+    for i in range(0, len(textos), SENTIMENT_BATCH_SIZE):
+        lote = textos[i:i + SENTIMENT_BATCH_SIZE]
+        try:
+            salidas = sentiment_pipeline(lote, batch_size=len(lote), truncation=True)
+            etiquetas.extend(s.get("label", "Neutral") for s in salidas)
+        except Exception:
+            for texto in lote:
+                try:
+                    etiquetas.append(sentiment_pipeline(texto, truncation=True)[0].get("label", "Neutral"))
+                except Exception:
+                    etiquetas.append("Desconocido")
+    return etiquetas
+
 @router.post("/analyze/transcription")
 def analyze_transcription(payload: Dict[str, List[TranscripcionIn]]):
+    """
+    Analiza un lote de transcripciones agrupándolas por idioma: cada grupo pasa por
+    nlp.pipe (sólo NER y oraciones) y por el pipeline de sentimiento en lotes.
+    Los resultados se devuelven en el mismo orden que la entrada.
+    """
     transcripciones = payload.get("transcripciones", [])
-    resultados = []
-    for tx in transcripciones:
-        texto = tx.texto
-        try:
-            lang = detect(texto)
-        except Exception:
-            lang = 'es'  # fallback
+    resultados = [None] * len(transcripciones)
+    grupos = defaultdict(list)
+    for i, tx in enumerate(transcripciones):
+        grupos[_detect_language(tx.texto)].append(i)
+
+    for lang, indices in grupos.items():
         if lang not in SPACY_MODELS:
-            resultado = TranscripcionIA(
-                id=tx.id,
-                palabras_clave=[],
-                resumen_automatico="Modelo no soportado para este idioma",
-                emocion="No disponible"
-            )
-            resultados.append(resultado.dict())
+            for i in indices:
+                resultados[i] = TranscripcionIA(
+                    id=transcripciones[i].id,
+                    palabras_clave=[],
+                    resumen_automatico="Modelo no soportado para este idioma",
+                    emocion="No disponible"
+                ).dict()
             continue
+        textos = [transcripciones[i].texto for i in indices]
         nlp = get_spacy(lang)
-        doc = nlp(texto)
-        palabras_clave = [ent.text for ent in doc.ents]
-        resumen_automatico = content_analyzer._generate_summary(doc)
-        # Sentimiento
-        sentiment_pipeline = get_sentiment_pipeline(lang)
-        if sentiment_pipeline:
-            try:
-                sentiment = sentiment_pipeline(texto)[0]
-                emocion = sentiment.get("label", "Neutral")
-            except Exception:
-                emocion = "Desconocido"
-        else:
-            emocion = "No disponible"
-        resultado = TranscripcionIA(
-            id=tx.id,
-            palabras_clave=palabras_clave or [],
-            resumen_automatico=resumen_automatico,
-            emocion=emocion
-        )
-        resultados.append(resultado.dict())
+        disable = [name for name in nlp.pipe_names if name not in SPACY_KEEP_PIPES]
+        docs = nlp.pipe(textos, batch_size=ANALYSIS_BATCH_SIZE, disable=disable)
+        emociones = _sentiment_labels(lang, textos)
+        for i, doc, emocion in zip(indices, docs, emociones):
+            resultados[i] = TranscripcionIA(
+                id=transcripciones[i].id,
+                palabras_clave=[ent.text for ent in doc.ents],
+                resumen_automatico=content_analyzer._generate_summary(doc),
+                emocion=emocion
+            ).dict()
     return {"resultados": resultados}
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from backend.db import get_db
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_async_db
 from backend.models.inmate import Inmate
 from backend.schemas.inmate import InmateResponse
 from backend.models.investigation_folder import InvestigationFolder
@@ -10,12 +12,13 @@ from backend.schemas.investigation_folder import InvestigationFolderRead
 router = APIRouter(prefix="/inmates", tags=["inmates"])
 
 @router.get("/{pin}", response_model=InmateResponse)
-def get_inmate(pin: str, db: Session = Depends(get_db)):
-    inmate = db.query(Inmate).filter(Inmate.pin == pin).first()
+async def get_inmate(pin: str, db: AsyncSession = Depends(get_async_db)):
+    inmate = (await db.scalars(select(Inmate).where(Inmate.pin == pin).limit(1))).first()
     if not inmate:
         raise HTTPException(status_code=404, detail="Inmate not found")
     # Obtener carpetas de investigación y delitos asociados
-    folders = db.query(InvestigationFolder).filter(InvestigationFolder.pin == pin).all()
+    folders = (await db.scalars(select(InvestigationFolder).where(InvestigationFolder.pin == pin)
+                                .options(selectinload(InvestigationFolder.crimes)))).all()
     folders_data = [InvestigationFolderRead.from_orm(folder) for folder in folders]
     # Convertir inmate a dict y agregar folders
     inmate_data = inmate.__dict__.copy()
@@ -1,18 +1,33 @@
-from fastapi import FastAPI, UploadFile, Form, Request
+# Perfilado de arranque (STARTUP_PROFILE=true): se instala antes de los imports pesados
+from backend.core.startup_profiler import install_startup_profiler
+startup_profiler = install_startup_profiler()
+
+from fastapi import FastAPI, UploadFile, Form, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from backend.server.report_router import router as report_router
 from backend.server.report_metadata_router import router as report_metadata_router
 from backend.server.auth_router import auth_router
 import traceback
-from fastapi.responses import PlainTextResponse
-import whisper
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from backend.core.audio.inference_pool import get_inference_pool, get_repass_pool, QueueFullError
+from backend.core.audio.pcm import decode_audio_bytes
+from backend.core.audio.vad import get_vad
+from backend.core.audio.repass import (
+    average_logprob, repass_reason, get_repass_scheduler, append_transcript_line,
+)
+from backend.config import PERSIST_FRAGMENT_AUDIO, DB_AUTO_MIGRATE
 from datetime import datetime
 import os
-import json
-import re
-import requests
-from PyPDF2 import PdfReader
-import sqlite3
+from starlette.concurrency import run_in_threadpool
+from backend.core.analysis.context_retriever import get_context_retriever
+from backend.core.analysis.ollama_client import get_ollama_client
+from backend.core.reports.transcript_catalog import register_transcript_file
+from backend.core.reports.search_index import index_transcript_fragment
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_async_db, dispose_async_engine
+from backend.core.database.migrations import apply_migrations
+from backend.core.database.call_stats import daily_stats_query
 from fastapi.staticfiles import StaticFiles
 
 app = FastAPI()
@@ -37,6 +52,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    response = await call_next(request)
+    if not startup_profiler.first_request_done:
+        startup_profiler.record_first_request(request.url.path)
+    return response
+
 @app.exception_handler(Exception)
 async def exception_handler(request: Request, exc: Exception):
     tb = traceback.format_exc()
@@ -54,6 +76,15 @@ app.include_router(inmate_router)
 from backend.server.alert_router import router as alert_router
 app.include_router(alert_router)
 
+from backend.server.search_router import router as search_router
+app.include_router(search_router)
+
+from backend.server.stream_router import router as stream_router
+app.include_router(stream_router)
+
+from backend.server.admin_router import router as admin_router
+app.include_router(admin_router)
+
 
 # =============================
 # TODO: ELIMINAR ENDPOINTS DEMO EN PRODUCCIÓN
@@ -101,24 +132,15 @@ async def get_pins(q: str = Query(None)):
 
 # Endpoint: /llamadas-por-dia
 @app.get("/llamadas-por-dia")
-async def llamadas_por_dia(pin: str = Query(...)):
+async def llamadas_por_dia(pin: str = Query(...), session: AsyncSession = Depends(get_async_db)):
     """
     Devuelve el número de llamadas por día para un PIN específico.
     Formato de respuesta: [{"date": "2025-04-01", "count": 2}, ...]
     """
-    conn = sqlite3.connect("transcripts.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT date, COUNT(*) as count
-        FROM calls
-        WHERE pin_emitter = ?
-        GROUP BY date
-        ORDER BY date
-    """, (pin,))
-    rows = cursor.fetchall()
-    conn.close()
+    # Del resumen diario (call_stats_daily): no recorre la tabla calls
+    rows = await session.execute(daily_stats_query(pin))
     # Siempre devolver un array de objetos
-    result = [{"fecha": row[0], "llamadas": row[1]} for row in rows]
+    result = [{"fecha": row.date, "llamadas": int(row.llamadas)} for row in rows.all()]
     return JSONResponse(content=result)
 
 
@@ -127,83 +149,14 @@ async def llamadas_por_dia(pin: str = Query(...)):
 async def ollama_query(request: Request):
     data = await request.json()
     prompt = data.get("prompt", "")
-    transcripts_dir = "transcripts"
-    pdfs = [f for f in os.listdir(transcripts_dir) if f.endswith('_reporte.pdf')]
-    filtros = []
-    context = ""
-
-    # Detectar criterios
-    pin_match = re.search(r'\b\d{3,}\b', prompt)
-    mes_match = re.search(r'(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre|\b0[1-9]|1[0-2]\b)', prompt, re.IGNORECASE)
-    anio_match = re.search(r'\b20\d{2}\b', prompt)
-    dia_match = re.search(r'\b([12][0-9]|3[01]|0[1-9])\b', prompt)
-    tel_match = re.search(r'\+?\d{10,}', prompt)
-    nombre_match = re.search(r'(Juan|María|Pedro|Pérez|López|Doña Mari|El Chino|El Ingeniero|El Primo|La Tía|La Güera)', prompt, re.IGNORECASE)
-
-    # Filtrar por PIN (más flexible: cualquier archivo que contenga el PIN y termine en _reporte.pdf)
-    if pin_match:
-        pin = pin_match.group(0)
-        pdfs = [f for f in pdfs if pin in f and f.endswith('_reporte.pdf')]
-        filtros.append(f"PIN {pin}")
-    # Filtrar por año
-    if anio_match:
-        anio = anio_match.group(0)
-        pdfs = [f for f in pdfs if f"_{anio}-" in f]
-        filtros.append(f"año {anio}")
-    # Filtrar por mes (número o nombre)
-    if mes_match:
-        mes = mes_match.group(0)
-        meses = {"enero": "01", "febrero": "02", "marzo": "03", "abril": "04", "mayo": "05", "junio": "06", "julio": "07", "agosto": "08", "septiembre": "09", "octubre": "10", "noviembre": "11", "diciembre": "12"}
-        mes_num = meses.get(mes.lower(), mes.zfill(2)) if not mes.isdigit() else mes.zfill(2)
-        pdfs = [f for f in pdfs if re.search(rf"_\d{{4}}-{mes_num}-\d{{2}}_", f)]
-        filtros.append(f"mes {mes}")
-    # Filtrar por día
-    if dia_match:
-        dia = dia_match.group(0).zfill(2)
-        pdfs = [f for f in pdfs if re.search(rf"_\d{{4}}-\d{{2}}-{dia}_", f)]
-        filtros.append(f"día {dia}")
-    # Filtrar por número telefónico
-    if tel_match:
-        tel = tel_match.group(0)
-        # Buscar PDFs que contengan el teléfono en el texto
-        pdfs_tel = []
-        for f in pdfs:
-            try:
-                reader = PdfReader(os.path.join(transcripts_dir, f))
-                texto = " ".join([p.extract_text() or "" for p in reader.pages])
-                if tel in texto:
-                    pdfs_tel.append(f)
-            except Exception:
-                continue
-        pdfs = pdfs_tel
-        filtros.append(f"teléfono {tel}")
-    # Filtrar por nombre
-    if nombre_match:
-        nombre = nombre_match.group(0)
-        pdfs_nombre = []
-        for f in pdfs:
-            try:
-                reader = PdfReader(os.path.join(transcripts_dir, f))
-                texto = " ".join([p.extract_text() or "" for p in reader.pages])
-                if nombre.lower() in texto.lower():
-                    pdfs_nombre.append(f)
-            except Exception:
-                continue
-        pdfs = pdfs_nombre
-        filtros.append(f"nombre {nombre}")
-
-    # Extraer contexto
-    if pdfs:
-        for f in sorted(pdfs):
-            try:
-                reader = PdfReader(os.path.join(transcripts_dir, f))
-                context += f"\n--- CONTENIDO DE {f} ---\n"
-                for page in reader.pages:
-                    context += page.extract_text() + "\n"
-            except Exception as e:
-                context += f"[Error leyendo PDF {f}: {e}]\n"
-    else:
-        context = f"[No se encontró reporte PDF para los criterios: {', '.join(filtros) if filtros else 'ninguno'}]"
+    stream = bool(data.get("stream", False))
+
+    # Sólo los fragmentos más relevantes (BM25/embeddings) dentro del presupuesto de tokens
+    recuperado = await run_in_threadpool(get_context_retriever().retrieve, prompt, TRANSCRIPTS_DIR)
+    filtros = recuperado["filtros"]
+    context = recuperado["context"] or (
+        f"[No se encontraron transcripciones para los criterios: {', '.join(filtros) if filtros else 'ninguno'}]"
+    )
 
     # Instrucciones explícitas para el modelo
     instrucciones = (
@@ -234,34 +187,61 @@ async def ollama_query(request: Request):
     )
     contexto_extra = f"Contexto extraído de los reportes filtrados ({', '.join(filtros) if filtros else 'todos'}):\n" + context
     full_prompt = f"{instrucciones}\n\n{ejemplos}\n{contexto_extra}\nPregunta: {prompt}"
+    print(f"Prompt enviado a Ollama: {len(recuperado['chunks'])} fragmentos, ~{recuperado['tokens']} tokens de contexto")
+    client = get_ollama_client()
+    if stream:
+        def generar():
+            try:
+                yield from client.generate_stream(full_prompt)
+            except Exception as e:
+                print("Error consultando Ollama:", e)
+                yield f"\n[Error consultando Ollama: {e}]"
+        return StreamingResponse(generar(), media_type="text/plain; charset=utf-8")
     try:
-        print("Prompt enviado a Ollama:\n", full_prompt)
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": "llama3.2", "prompt": full_prompt, "stream": False}
-        )
-        print("Respuesta cruda de Ollama:", response.text)
-        answer = response.json().get("response", "No se pudo obtener respuesta.")
+        answer = await run_in_threadpool(client.generate, full_prompt) or "No se pudo obtener respuesta."
     except Exception as e:
         print("Error consultando Ollama:", e)
         answer = f"Error consultando Ollama: {e}"
     return {"response": answer}
 
-# Cargar modelo Whisper
-model = whisper.load_model("base")  # Puedes usar "tiny" para que sea más rápido
+# Pool de inferencia Whisper (modelo y número de workers configurables en backend/config.py)
+@app.on_event("startup")
+async def startup_inference_pool():
+    if DB_AUTO_MIGRATE:
+        try:
+            await run_in_threadpool(apply_migrations)
+        except Exception as e:
+            print(f"⚠️ No se pudieron aplicar las migraciones del esquema: {e}")
+    get_inference_pool().start()
+    startup_profiler.mark("startup_complete")
 
-# Cargar frases peligrosas
-with open("config/frases_peligrosas.json", "r", encoding="utf-8") as f:
-    FRASES_PELIGROSAS = json.load(f)
+@app.on_event("shutdown")
+async def shutdown_inference_pool():
+    get_inference_pool().shutdown(wait=False)
+    get_repass_pool().shutdown(wait=False)
+    await dispose_async_engine()
+
+# Frases peligrosas: autómata compartido construido desde risk_phrases_corrected.json
+from backend.core.analysis.phrase_matcher import get_risk_matcher
 
 # Carpeta donde guardar transcripciones
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.dirname(BASE_DIR)
 TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "transcripts")
 os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
+app.state.transcripts_dir = TRANSCRIPTS_DIR
+
+def guardar_audio_fragmento(filepath: str, contents: bytes):
+    """Persistir el audio crudo del fragmento (tarea en segundo plano)"""
+    try:
+        with open(filepath, "wb") as f:
+            f.write(contents)
+        register_transcript_file(filepath)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el audio {filepath}: {e}")
 
 @app.post("/stream/fragment")
-async def recibir_fragmento(file: UploadFile, pin: str = Form(...)):
+async def recibir_fragmento(background_tasks: BackgroundTasks, file: UploadFile, pin: str = Form(...)):
     try:
         now = datetime.now()
         fecha = now.strftime("%Y-%m-%d")
@@ -274,12 +254,30 @@ async def recibir_fragmento(file: UploadFile, pin: str = Form(...)):
             msg = "El archivo de audio recibido está vacío o es muy pequeño."
             print(f"❌ {msg}")
             return {"error": msg}
-        with open(filepath, "wb") as f:
-            f.write(contents)
+        # Decodificar en memoria (sin archivo temporal); guardar el WAV es opcional. En el
+        # threadpool: los formatos comprimidos pasan por un subproceso ffmpeg
+        try:
+            audio = await run_in_threadpool(decode_audio_bytes, contents)
+        except Exception as e:
+            msg = f"No se pudo decodificar el audio recibido: {e}"
+            print(f"❌ {msg}")
+            return {"error": msg}
+        if PERSIST_FRAGMENT_AUDIO:
+            background_tasks.add_task(guardar_audio_fragmento, filepath, contents)
 
-        # Transcribir fragmento
+        # Fragmentos sin voz se responden sin pasar por Whisper; los demás se recortan a la voz
+        audio = get_vad().trim(audio)
+        if audio is None:
+            print(f"🔇 Fragmento sin voz para PIN {pin}; no se transcribe")
+            return {"text": "", "alertas": [], "vad": "silence"}
+
+        # Transcribir fragmento en el pool de inferencia (fuera del event loop)
         try:
-            result = model.transcribe(filepath, fp16=False)
+            result = await get_inference_pool().transcribe(audio, fp16=False)
+        except QueueFullError as e:
+            msg = f"Servidor de transcripción saturado, reintente en unos segundos: {e}"
+            print(f"⏳ {msg}")
+            return JSONResponse({"error": msg}, status_code=503, headers={"Retry-After": "1"})
         except Exception as e:
             msg = f"Error al transcribir el fragmento: {e}"
             print(f"❌ {msg}")
@@ -287,22 +285,28 @@ async def recibir_fragmento(file: UploadFile, pin: str = Form(...)):
         texto = result.get("text", "")
 
         # Analizar si hay frases de riesgo
-        alertas = []
-        for frase in FRASES_PELIGROSAS:
-            if frase.lower() in texto.lower():
-                alertas.append(frase)
+        alertas = get_risk_matcher().matched_phrases(texto)
 
         # Guardar texto en documento separado
         transcripcion_file = f"{TRANSCRIPTS_DIR}/{pin}_{fecha}_Ttranscripcion.txt"
-        with open(transcripcion_file, "a", encoding="utf-8") as f:
-            f.write(f"[{hora}] {texto.strip()}\n")
+        # Fuera del event loop: puede esperar a que la re-pasada termine de reescribir el archivo
+        await run_in_threadpool(append_transcript_line, transcripcion_file, f"[{hora}] {texto.strip()}\n")
+        register_transcript_file(transcripcion_file)
+        background_tasks.add_task(index_transcript_fragment, transcripcion_file, pin, fecha, hora, texto)
+
+        # Frases de riesgo o baja confianza: segunda pasada con el modelo grande en segundo plano
+        motivo = repass_reason(texto, alertas, average_logprob(result))
+        get_repass_scheduler().schedule(audio, pin, transcripcion_file, fecha, hora, texto.strip(), motivo,
+                                        result.get("language"))
 
         print(f"✅ Fragmento recibido y transcrito para PIN {pin}")
         if alertas:
             print(f"🚨 ALERTA detectada en fragmento: {alertas}")
 
-        return {"text": texto, "alertas": alertas}
+        return {"text": texto, "alertas": alertas, "repass": motivo}
     except Exception as e:
         msg = f"Error inesperado en el endpoint: {e}"
         print(f"❌ {msg}")
         return {"error": msg}
+
+startup_profiler.mark("imports_done")
@@ -1,54 +1,52 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from backend.db import get_async_db
 from backend.app.services.topic_reporter import extract_main_topic, summarize_text
+from backend.core.analysis.phrase_matcher import PhraseMatcher
+from backend.core.reports.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, ndjson_response
+from backend.core.reports.pdf_text_cache import get_pdf_text_cache, format_resumen
+from backend.core.reports.transcript_catalog import get_transcript_catalog, register_transcript_file
 from fpdf import FPDF
+from typing import Optional
 import os
 
 router = APIRouter()
 
 @router.get("/network")
-def get_network(pin: str = Query(...)):
+async def get_network(pin: str = Query(...), session: AsyncSession = Depends(get_async_db)):
     """
     Devuelve la red de vínculos de un PIN: nodos (contactos) y enlaces (llamadas).
     Agrupa contactos por identidad (nombre/alias) cuando está disponible.
     """
-    import sqlite3
     from collections import defaultdict
     
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    db_path = os.path.join(BASE_DIR, "transcripts.db")
-    
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
         # Obtener todos los contactos únicos y contar llamadas
-        cursor.execute("""
+        contacts = (await session.execute(text("""
             SELECT phone_number, COUNT(*) as call_count
             FROM calls
-            WHERE pin_emitter = ?
+            WHERE pin_emitter = :pin
             GROUP BY phone_number
             ORDER BY call_count DESC
-        """, (pin,))
-        
-        contacts = cursor.fetchall()
+        """), {"pin": pin})).all()
         
         # Intentar obtener identidades de la tabla contacts
-        cursor.execute("""
+        identities = await session.execute(text("""
             SELECT phone_number, identity_name, alias
             FROM contacts
-        """)
+        """))
         
         identities_map = {}
-        for phone, name, alias in cursor.fetchall():
+        for phone, name, alias in identities.all():
             identities_map[phone] = {
                 "name": name,
                 "alias": alias
             }
         
-        conn.close()
-        
         # Agrupar contactos por identidad
         # Si múltiples números tienen el mismo nombre/alias, se agrupan en un solo nodo
         identity_groups = defaultdict(lambda: {
@@ -116,70 +114,57 @@ def get_network(pin: str = Query(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/llamadas")
-def get_llamadas(pin: str = Query(...), contact: str = Query(...)):
+async def get_llamadas(pin: str = Query(...), contact: str = Query(...),
+                       session: AsyncSession = Depends(get_async_db)):
     """
     Devuelve el resumen de llamadas entre un PIN y un contacto (número telefónico o identificador).
     Busca en transcripts.db y archivos PDF asociados.
     """
-    import sqlite3
-    import re
-    from PyPDF2 import PdfReader
-    import os
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "transcripts")
-    results = []
     try:
         # 1. Buscar llamadas en transcripts.db
-        db_path = os.path.join(BASE_DIR, "transcripts.db")
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
+        llamadas = (await session.execute(text("""
             SELECT id, pin_emitter, phone_number, date, duration
             FROM calls
-            WHERE pin_emitter = ? AND phone_number = ?
+            WHERE pin_emitter = :pin AND phone_number = :contact
             ORDER BY date DESC
-        """, (pin, contact))
-        llamadas = cursor.fetchall()
-        conn.close()
-        for llamada in llamadas:
-            call_id, pin_emitter, phone_number, fecha, duracion = llamada
-            # Buscar PDF y audio asociados (por convención de nombre)
-            pdf_pattern = re.compile(rf"{pin}_({fecha})_T.*{contact}.*_reporte\\.pdf")
-            pdf_file = None
-            resumen = ""
-            audio_url = None
-            for fname in os.listdir(TRANSCRIPTS_DIR):
-                if pdf_pattern.match(fname):
-                    pdf_file = fname
-                    break
-            if pdf_file:
-                pdf_path = os.path.join(TRANSCRIPTS_DIR, pdf_file)
-                try:
-                    reader = PdfReader(pdf_path)
-                    text = " ".join(page.extract_text() or '' for page in reader.pages)
-                    mres = re.search(r"Resumen: ([^\n]+)", text)
-                    if mres:
-                        resumen = mres.group(1)
-                except Exception as e:
-                    resumen = f"[Error leyendo PDF: {e}]"
-                # Audio asociado
-                audio_basename = pdf_file.replace('_reporte.pdf', '.wav')
-                audio_path = os.path.join(os.path.dirname(__file__), '..', 'audios', audio_basename)
-                audio_url = f'/audios/{audio_basename}' if os.path.exists(audio_path) else None
-            results.append({
-                "call_id": call_id,
-                "pin": pin_emitter,
-                "contact": phone_number,
-                "fecha": fecha,
-                "duracion": duracion,
-                "resumen": resumen,
-                "pdf": f"/transcripts/{pdf_file}" if pdf_file else None,
-                "audio": audio_url
-            })
-        return results
+        """), {"pin": pin, "contact": contact})).all()
+        # 2. Resúmenes y audios (catálogo y PDFs en disco) fuera del event loop
+        return await run_in_threadpool(_resumenes_llamadas, llamadas, pin, contact)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _resumenes_llamadas(llamadas, pin: str, contact: str):
+    """Agrega a cada llamada el resumen del PDF y el audio asociados"""
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "transcripts")
+    results = []
+    for llamada in llamadas:
+        call_id, pin_emitter, phone_number, fecha, duracion = llamada
+        # Buscar PDF y audio asociados en el catálogo de transcripciones
+        pdf_file = None
+        resumen = ""
+        audio_url = None
+        entradas = get_transcript_catalog().query(TRANSCRIPTS_DIR, pin=pin, date=fecha, phone=contact, has="pdf")
+        if entradas:
+            pdf_path = entradas[0]["pdf_path"]
+            pdf_file = os.path.basename(pdf_path)
+            resumen = format_resumen(get_pdf_text_cache().get(pdf_path))
+            # Audio asociado
+            audio_basename = pdf_file.replace('_reporte.pdf', '.wav')
+            audio_path = os.path.join(os.path.dirname(__file__), '..', 'audios', audio_basename)
+            audio_url = f'/audios/{audio_basename}' if os.path.exists(audio_path) else None
+        results.append({
+            "call_id": call_id,
+            "pin": pin_emitter,
+            "contact": phone_number,
+            "fecha": fecha,
+            "duracion": duracion,
+            "resumen": resumen,
+            "pdf": f"/transcripts/{pdf_file}" if pdf_file else None,
+            "audio": audio_url
+        })
+    return results
+
 @router.get("/pins")
 def get_pins(q: str = None):
     """
@@ -187,162 +172,135 @@ def get_pins(q: str = None):
     Si se pasa el query param 'q', filtra los PINs que contienen ese substring.
     """
     try:
-        files = [f for f in os.listdir(TRANSCRIPTS_DIR) if f.endswith(".pdf")]
-        pins = set()
-        for filename in files:
-            m = re.match(r"(\d{3,})_", filename)
-            if m:
-                pins.add(m.group(1))
-        pins_list = sorted(pins)
+        pins_list = get_transcript_catalog().pins(TRANSCRIPTS_DIR, has="pdf")
         if q:
             pins_list = [p for p in pins_list if q in p]
         return {"pins": pins_list}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-import re
-from PyPDF2 import PdfReader
-
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "transcripts")
 
+def _transcription_item(entrada: dict) -> dict:
+    """Metadatos de un reporte PDF del catálogo (el texto del PDF sólo se lee para esta fila)"""
+    path = entrada["pdf_path"]
+    filename = os.path.basename(path)
+    info = get_pdf_text_cache().get(path)
+    # Buscar archivo de audio correspondiente
+    audio_basename = filename.replace('_reporte.pdf', '.wav') if filename else None
+    audio_path = os.path.join(os.path.dirname(__file__), 'audios', audio_basename) if audio_basename else None
+    audio_url = f'/audios/{audio_basename}' if audio_basename and os.path.exists(audio_path) else None
+    return {
+        "filename": filename,
+        "pin": entrada["pin"],
+        "fecha": entrada["date"],
+        "hora": entrada["time"],
+        "participantes": info["participantes"],
+        "resumen": format_resumen(info),
+        "audio_url": audio_url
+    }
+
+def _list_transcriptions(pin: Optional[str], limit: Optional[int], cursor: Optional[str], formato: str):
+    """
+    Reportes PDF del catálogo de la más reciente a la más antigua. Sin `limit` devuelve la lista
+    completa; con `limit`, una página y `next_cursor`. `format=ndjson` transmite una fila por línea
+    (con `limit`, seguida de una línea {"next_cursor": ...}).
+    """
+    catalog = get_transcript_catalog()
+    after = decode_cursor(cursor, 3) if cursor else None
+    if formato == "ndjson":
+        # Con `limit`, la última línea es {"next_cursor": ...}
+        entradas = catalog.query(TRANSCRIPTS_DIR, pin=pin, has="pdf", after=after, limit=limit + 1 if limit else None)
+        return ndjson_response(entradas, limit=limit, serialize=_transcription_item,
+                               cursor_of=lambda entrada: encode_cursor(*catalog.sort_key(entrada)))
+    if limit:
+        entradas = catalog.query(TRANSCRIPTS_DIR, pin=pin, has="pdf", after=after, limit=limit + 1)
+        page = entradas[:limit]
+        next_cursor = encode_cursor(*catalog.sort_key(page[-1])) if len(entradas) > limit else None
+        return {"transcripciones": [_transcription_item(entrada) for entrada in page], "next_cursor": next_cursor}
+    return [_transcription_item(entrada) for entrada in catalog.query(TRANSCRIPTS_DIR, pin=pin, has="pdf", after=after)]
+
 @router.get("/transcriptions")
-def get_all_transcriptions():
+def get_all_transcriptions(
+    limit: Optional[int] = Query(None, gt=0, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    formato: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+):
     """
     Devuelve todos los reportes PDF con metadatos: filename, fecha, hora, participantes, resumen.
+    Admite paginación por cursor (`limit`, `cursor`) y `format=ndjson`.
     """
     try:
-        results = []
-        files = [f for f in os.listdir(TRANSCRIPTS_DIR) if f.endswith(".pdf")]
-        for filename in files:
-            path = os.path.join(TRANSCRIPTS_DIR, filename)
-            m = re.match(r"(\d{3,})_(\d{4}-\d{2}-\d{2})_T(\d{2}-\d{2}-\d{2})_reporte\.pdf", filename)
-            pin, fecha, hora = None, None, None
-            if m:
-                pin, fecha, hora = m.group(1), m.group(2), m.group(3).replace('-', ':')
-            participantes = set()
-            resumen = ""
-            try:
-                reader = PdfReader(path)
-                text = " ".join(page.extract_text() or '' for page in reader.pages)
-                nombres = re.findall(r"[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?: [A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)+", text)
-                participantes.update(nombres)
-                mres = re.search(r"Resumen: ([^\n]+)", text)
-                if mres:
-                    resumen = mres.group(1)
-            except Exception as e:
-                resumen = f"[Error leyendo PDF: {e}]"
-            # Buscar archivo de audio correspondiente
-            audio_basename = filename.replace('_reporte.pdf', '.wav') if filename else None
-            audio_path = os.path.join(os.path.dirname(__file__), 'audios', audio_basename) if audio_basename else None
-            audio_url = f'/audios/{audio_basename}' if audio_basename and os.path.exists(audio_path) else None
-            results.append({
-                "filename": filename,
-                "pin": pin,
-                "fecha": fecha,
-                "hora": hora,
-                "participantes": list(participantes),
-                "resumen": resumen,
-                "audio_url": audio_url
-            })
-        results.sort(key=lambda r: (r["fecha"] or "", r["hora"] or ""), reverse=True)
-        return results
+        return _list_transcriptions(None, limit, cursor, formato)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/transcriptions/{pin}")
-def get_transcriptions_by_pin(pin: str):
+def get_transcriptions_by_pin(
+    pin: str,
+    limit: Optional[int] = Query(None, gt=0, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    formato: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+):
     """
     Devuelve los reportes PDF filtrados por el PIN especificado.
+    Admite paginación por cursor (`limit`, `cursor`) y `format=ndjson`.
     """
     try:
-        results = []
-        files = [f for f in os.listdir(TRANSCRIPTS_DIR) if f.startswith(f"{pin}_") and f.endswith(".pdf")]
-        for filename in files:
-            path = os.path.join(TRANSCRIPTS_DIR, filename)
-            m = re.match(rf"{pin}_(\d{{4}}-\d{{2}}-\d{{2}})_T(\d{{2}}-\d{{2}}-\d{{2}})_reporte\.pdf", filename)
-            fecha, hora = None, None
-            if m:
-                fecha, hora = m.group(1), m.group(2).replace('-', ':')
-            participantes = set()
-            resumen = ""
-            try:
-                reader = PdfReader(path)
-                text = " ".join(page.extract_text() or '' for page in reader.pages)
-                nombres = re.findall(r"[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?: [A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)+", text)
-                participantes.update(nombres)
-                mres = re.search(r"Resumen: ([^\n]+)", text)
-                if mres:
-                    resumen = mres.group(1)
-            except Exception as e:
-                resumen = f"[Error leyendo PDF: {e}]"
-                        # Buscar archivo de audio correspondiente
-            audio_basename = filename.replace('_reporte.pdf', '.wav') if filename else None
-            audio_path = os.path.join(os.path.dirname(__file__), 'audios', audio_basename) if audio_basename else None
-            audio_url = f'/audios/{audio_basename}' if audio_basename and os.path.exists(audio_path) else None
-            results.append({
-                "filename": filename,
-                "pin": pin,
-                "fecha": fecha,
-                "hora": hora,
-                "participantes": list(participantes),
-                "resumen": resumen,
-                "audio_url": audio_url
-            })
-        results.sort(key=lambda r: (r["fecha"] or "", r["hora"] or ""), reverse=True)
-        return results
+        return _list_transcriptions(pin, limit, cursor, formato)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Palabras clave de riesgo para /alerts; se comparan por palabra completa y sin acentos
+PALABRAS_RIESGO = [
+    # Narco y estructuras criminales
+    "sicario", "halcones", "punteros", "postas", "posta", "estaca", "estacas", "gente del cerro", "gente del monte", "gente de la sierra",
+    "comandante", "jefe de plaza", "compa", "escolta", "coyote", "pollero", "cuacito", "cuasillo", "cuas", "sancudo", "dronero", "plaza", "gente", "la gente",
+    # Producción y tráfico
+    "cocinero", "químico", "troquero", "cargador", "jalador", "pasta blues", "oxis", "m&m's", "cuerno de chivo", "cuerno", "r", "r-15", "lanzapapas",
+    "boludo", "minimi", "chaparrita", "super güera", "5.7", "matapolicías",
+    # Blindaje y vehículos
+    "empecherado", "troca", "trocona", "perrona", "monstruo", "bestia", "burrito", "mula",
+    # Comunicación y logística
+    "pitufo", "perico", "piloto", "paloma", "ave", "volador", "capitán",
+    # Religiosos/sectarios
+    "la flaca", "la santa muerte", "la santa", "la niña blanca", "sanjudas tadeo", "sanjuditas", "judas", "san benito", "santo niño de atocha", "malverde",
+    # Conflicto y violencia
+    "contras", "topón", "caliente", "jale", "levantón", "madrina", "la línea", "sapo", "culebra", "chapulín", "brincaplazas", "cuatro letras", "encostalado", "mochar", "chapo", "aparatos", "clave", "plebada", "lavada", "alterado", "enfierrado", "cocodrilo", "huachos", "chota", "tira", "placa", "azules", "puercos", "firme", "pagar renta", "cooperación", "pago", "mensualidad", "charola", "vacuna", "dar piso", "bajar", "tronar", "plebe", "hacer una limpia", "pollitos de colores",
+    # Originales del sistema
+    "fierro", "paquete", "jefe", "guardia", "cargamento", "mercancía", "luz verde", "seña", "dinero", "mover", "camioneta", "transferencia", "reparto", "piedra", "cristal", "droga", "golpe", "candado", "puerta trasera"
+]
+_alerts_matcher = PhraseMatcher(PALABRAS_RIESGO)
+
 @router.get("/alerts")
 def get_alerts():
     """
     Busca palabras clave de riesgo en los resúmenes y devuelve alertas con fecha, participantes y fragmento relevante.
     """
-    palabras_riesgo = [
-        # Narco y estructuras criminales
-        "sicario", "halcones", "punteros", "postas", "posta", "estaca", "estacas", "gente del cerro", "gente del monte", "gente de la sierra",
-        "comandante", "jefe de plaza", "compa", "escolta", "coyote", "pollero", "cuacito", "cuasillo", "cuas", "sancudo", "dronero", "plaza", "gente", "la gente",
-        # Producción y tráfico
-        "cocinero", "químico", "troquero", "cargador", "jalador", "pasta blues", "oxis", "m&m's", "cuerno de chivo", "cuerno", "r", "r-15", "lanzapapas",
-        "boludo", "minimi", "chaparrita", "super güera", "5.7", "matapolicías",
-        # Blindaje y vehículos
-        "empecherado", "troca", "trocona", "perrona", "monstruo", "bestia", "burrito", "mula",
-        # Comunicación y logística
-        "pitufo", "perico", "piloto", "paloma", "ave", "volador", "capitán",
-        # Religiosos/sectarios
-        "la flaca", "la santa muerte", "la santa", "la niña blanca", "sanjudas tadeo", "sanjuditas", "judas", "san benito", "santo niño de atocha", "malverde",
-        # Conflicto y violencia
-        "contras", "topón", "caliente", "jale", "levantón", "madrina", "la línea", "sapo", "culebra", "chapulín", "brincaplazas", "cuatro letras", "encostalado", "mochar", "chapo", "aparatos", "clave", "plebada", "lavada", "alterado", "enfierrado", "cocodrilo", "huachos", "chota", "tira", "placa", "azules", "puercos", "firme", "pagar renta", "cooperación", "pago", "mensualidad", "charola", "vacuna", "dar piso", "bajar", "tronar", "plebe", "hacer una limpia", "pollitos de colores",
-        # Originales del sistema
-        "fierro", "paquete", "jefe", "guardia", "cargamento", "mercancía", "luz verde", "seña", "dinero", "mover", "camioneta", "transferencia", "reparto", "piedra", "cristal", "droga", "golpe", "candado", "puerta trasera"
-    ]
     try:
         alerts = []
-        files = [f for f in os.listdir(TRANSCRIPTS_DIR) if f.endswith(".pdf")]
-        for filename in files:
-            path = os.path.join(TRANSCRIPTS_DIR, filename)
-            fecha, participantes, resumen = None, [], ""
-            m = re.match(r"(\d{3,})_(\d{4}-\d{2}-\d{2})_T(\d{2}-\d{2}-\d{2})_reporte\.pdf", filename)
-            if m:
-                fecha = m.group(2)
+        for entrada in get_transcript_catalog().query(TRANSCRIPTS_DIR, has="pdf"):
+            path = entrada["pdf_path"]
+            fecha, participantes, resumen = entrada["date"], [], ""
             try:
-                reader = PdfReader(path)
-                text = " ".join(page.extract_text() or '' for page in reader.pages)
-                nombres = re.findall(r"[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?: [A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)+", text)
-                participantes = list(set(nombres))
-                mres = re.search(r"Resumen: ([^\n]+)", text)
-                if mres:
-                    resumen = mres.group(1)
-                for palabra in palabras_riesgo:
-                    if palabra in resumen.lower():
-                        alerts.append({
-                            "fecha": fecha,
-                            "participantes": participantes,
-                            "alerta": palabra,
-                            "fragmento": resumen
-                        })
-                        break
+                info = get_pdf_text_cache().get(path)
+                if info["error"]:
+                    continue
+                participantes = info["participantes"]
+                resumen = info["resumen"]
+                coincidencias = _alerts_matcher.find_all(resumen)
+                if coincidencias:
+                    alerts.append({
+                        "fecha": fecha,
+                        "participantes": participantes,
+                        "alerta": coincidencias[0]["phrase"],
+                        "fragmento": resumen
+                    })
             except Exception:
                 continue
         return alerts
@@ -407,6 +365,7 @@ async def generate_report(request: ReportRequest):
         pdf.ln(10)
         # --- FIN NUEVO ---
         pdf.output(pdf_path)
+        register_transcript_file(pdf_path)
 
         return FileResponse(pdf_path, media_type='application/pdf', filename=pdf_filename)
     except Exception as e:
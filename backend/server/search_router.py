@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+import os
+from backend.core.reports.search_index import get_search_index, SOURCES
+
+router = APIRouter()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "transcripts")
+
+@router.get("/search")
+def search_transcripts(
+    q: str = Query(..., min_length=1),
+    pin: Optional[str] = Query(None),
+    fecha_desde: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    fecha_hasta: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    min_risk: Optional[int] = Query(None, ge=0, le=100),
+    max_risk: Optional[int] = Query(None, ge=0, le=100),
+    fuente: Optional[str] = Query(None),
+    limit: int = Query(20, gt=0, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Búsqueda de texto completo en transcripciones (call_details, _Ttranscripcion.txt) y reportes PDF.
+    Resultados ordenados por relevancia (bm25) con un fragmento del texto donde aparecen los términos.
+    Las palabras se combinan con AND; el texto entre comillas se busca como frase exacta.
+    """
+    if fuente is not None and fuente not in SOURCES:
+        raise HTTPException(status_code=400, detail=f"Fuente inválida: {fuente}. Opciones: {', '.join(SOURCES)}")
+    try:
+        index = get_search_index()
+        index.sync(TRANSCRIPTS_DIR)
+        total, results = index.search(
+            q, pin=pin, date_from=fecha_desde, date_to=fecha_hasta,
+            min_risk=min_risk, max_risk=max_risk, source=fuente, limit=limit, offset=offset,
+        )
+        return {"query": q, "total": total, "limit": limit, "offset": offset, "results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,287 @@
+"""
+Router de transcripción continua por llamada: abrir sesión, enviar audio y cerrar, por HTTP o
+por WebSocket (/ws/stream/{pin}) con el audio PCM como flujo binario continuo.
+Los segmentos confirmados se guardan en el mismo _Ttranscripcion.txt que /stream/fragment.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, BackgroundTasks, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from backend.core.analysis.phrase_matcher import get_risk_matcher
+from backend.core.audio.inference_pool import QueueFullError
+from backend.core.audio.pcm import decode_audio_bytes, pcm16_to_float32
+from backend.core.audio.repass import append_transcript_line, get_repass_scheduler, repass_reason
+from backend.core.audio.streaming_session import (
+    StreamingSession, SessionNotFoundError, get_streaming_sessions,
+)
+from backend.core.reports.search_index import index_transcript_fragment
+from backend.core.reports.transcript_catalog import register_transcript_file
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["stream"])
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "transcripts")
+
+# Reintentos (uno por segundo) de la decodificación final si el pool está saturado
+CLOSE_RETRIES = 10
+
+
+def transcripts_dir_for(connection) -> str:
+    """Carpeta de transcripciones de la aplicación (app.state.transcripts_dir)"""
+    return getattr(connection.app.state, "transcripts_dir", DEFAULT_TRANSCRIPTS_DIR)
+
+
+def publicar_segmentos(session: StreamingSession, segments: List[Dict[str, Any]], transcripts_dir: str,
+                       background_tasks: Optional[BackgroundTasks] = None) -> List[str]:
+    """
+    Escribir los segmentos confirmados en el _Ttranscripcion.txt del día, indexarlos y devolver
+    las frases de riesgo encontradas en ellos
+    """
+    alertas: List[str] = []
+    matcher = get_risk_matcher()
+    for segment in segments:
+        texto = segment["text"].strip()
+        if not texto:
+            continue
+        momento = session.segment_time(segment["start"])
+        fecha = momento.strftime("%Y-%m-%d")
+        hora = momento.strftime("T%H-%M-%S")
+        idioma = segment.get("language") or "es"
+        transcripcion_file = os.path.join(transcripts_dir, f"{session.pin}_{fecha}_Ttranscripcion.txt")
+        append_transcript_line(transcripcion_file, f"[{hora}] ({idioma}) {texto}\n")
+        register_transcript_file(transcripcion_file)
+        if background_tasks is not None:
+            background_tasks.add_task(index_transcript_fragment, transcripcion_file, session.pin, fecha, hora, texto)
+        else:
+            index_transcript_fragment(transcripcion_file, session.pin, fecha, hora, texto)
+        alertas_segmento = matcher.matched_phrases(texto)
+        for frase in alertas_segmento:
+            if frase not in alertas:
+                alertas.append(frase)
+        audio = session.pop_segment_audio(segment.get("index", -1))
+        motivo = repass_reason(texto, alertas_segmento, segment.get("avg_logprob"))
+        if motivo and audio is not None and len(audio):
+            get_repass_scheduler().schedule(audio, session.pin, transcripcion_file, fecha, hora, texto,
+                                            motivo, language=session.language)
+    if alertas:
+        print(f"🚨 ALERTA detectada en sesión {session.session_id} (PIN {session.pin}): {alertas}")
+    return alertas
+
+
+def _saturado(e: QueueFullError) -> JSONResponse:
+    msg = f"Servidor de transcripción saturado, reintente en unos segundos: {e}"
+    print(f"⏳ {msg}")
+    return JSONResponse({"error": msg}, status_code=503, headers={"Retry-After": "1"})
+
+
+@router.post("/stream/session")
+async def abrir_sesion(pin: str = Form(...), language: Optional[str] = Form(None)):
+    """
+    Abrir una sesión de transcripción continua para una llamada.
+    El audio se envía después en trozos a /stream/session/{session_id}/chunk.
+    """
+    session = get_streaming_sessions().open(pin, language=language)
+    return {"session_id": session.session_id, "pin": pin, "started_at": session.info()["started_at"]}
+
+
+@router.post("/stream/session/{session_id}/chunk")
+async def enviar_audio(session_id: str, request: Request, background_tasks: BackgroundTasks):
+    """
+    Agregar audio a la sesión. El cuerpo es PCM int16 mono a 16 kHz (o un WAV completo).
+    Devuelve los segmentos confirmados en esta llamada, el texto provisional y las alertas.
+    """
+    try:
+        session = get_streaming_sessions().get(session_id)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Sesión no encontrada o expirada: {session_id}")
+    contents = await request.body()
+    if not contents:
+        return {"final": [], "partial": session.partial, "alertas": []}
+    try:
+        # Fuera del event loop: los formatos comprimidos pasan por un subproceso ffmpeg
+        audio = await asyncio.to_thread(decode_audio_bytes, contents)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo decodificar el audio recibido: {e}")
+    try:
+        result = await session.push(audio)
+    except QueueFullError as e:
+        return _saturado(e)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Sesión no encontrada o expirada: {session_id}")
+    # Fuera del event loop, como en el WebSocket: escribe el _Ttranscripcion.txt (puede esperar
+    # a una re-pasada que lo reescribe) y registra el archivo en el catálogo
+    result["alertas"] = await asyncio.to_thread(
+        publicar_segmentos, session, result["final"], transcripts_dir_for(request), background_tasks
+    )
+    return result
+
+
+@router.post("/stream/session/{session_id}/close")
+async def cerrar_sesion(session_id: str, request: Request, background_tasks: BackgroundTasks):
+    """Decodificar el audio restante, confirmar los últimos segmentos y cerrar la sesión"""
+    sessions = get_streaming_sessions()
+    try:
+        session = sessions.get(session_id)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Sesión no encontrada o expirada: {session_id}")
+    try:
+        result = await session.close()
+    except QueueFullError as e:
+        return _saturado(e)
+    sessions.remove(session_id)
+    result["alertas"] = await asyncio.to_thread(
+        publicar_segmentos, session, result["final"], transcripts_dir_for(request), background_tasks
+    )
+    result["segments"] = session.segments
+    # Frases de riesgo de toda la llamada, incluidas las que quedaron repartidas entre dos segmentos
+    result["alertas_llamada"] = get_risk_matcher().matched_phrases(session.text)
+    result["duration"] = round(session.received_seconds, 1)
+    print(f"✅ Sesión {session_id} cerrada para PIN {session.pin}: {len(session.segments)} segmentos, "
+          f"{session.decodes} decodificaciones")
+    return result
+
+
+@router.get("/stream/repass")
+def segundas_pasadas(pin: Optional[str] = None, limit: int = 50):
+    """Estado del modelo grande y últimas segundas pasadas (opcionalmente de un PIN)"""
+    # Sin async: stats() consulta la caché en SQLite y FastAPI lo ejecuta en el threadpool
+    scheduler = get_repass_scheduler()
+    return {"stats": scheduler.stats(), "results": scheduler.results(pin=pin, limit=limit)}
+
+
+@router.get("/stream/sessions")
+def listar_sesiones():
+    """Sesiones abiertas, audio recibido frente a audio decodificado y sesiones expiradas"""
+    return get_streaming_sessions().stats()
+
+
+def _es_cierre(texto: str) -> bool:
+    """Mensaje de control de cierre: "close" o {"type": "close"}"""
+    texto = texto.strip()
+    if texto == "close":
+        return True
+    try:
+        data = json.loads(texto)
+    except ValueError:
+        return False
+    return isinstance(data, dict) and data.get("type") == "close"
+
+
+def _cierre(session: StreamingSession, result: Dict[str, Any], alertas: List[str]) -> Dict[str, Any]:
+    return {
+        "type": "closed",
+        "session_id": session.session_id,
+        "final": result["final"],
+        "text": result["text"],
+        "segments": session.segments,
+        "alertas": alertas,
+        "alertas_llamada": get_risk_matcher().matched_phrases(session.text),
+        "duration": round(session.received_seconds, 1),
+    }
+
+
+@router.websocket("/ws/stream/{pin}")
+async def stream_websocket(websocket: WebSocket, pin: str, language: Optional[str] = None):
+    """
+    Audio de una llamada en vivo por WebSocket.
+    - Mensajes binarios: PCM int16 mono a 16 kHz, en trozos de cualquier tamaño.
+    - Mensaje de texto "close" (o {"type": "close"}): confirmar el audio restante y terminar.
+    El servidor responde en el mismo socket con {"type": "transcript", "final", "partial", "alertas"}
+    cada vez que decodifica, {"type": "busy"} si el pool está saturado (el audio se conserva y se
+    reintenta con el siguiente trozo) y {"type": "closed", ...} con la transcripción completa.
+    """
+    await websocket.accept()
+    session = get_streaming_sessions().open(pin, language=language)
+    transcripts_dir = transcripts_dir_for(websocket)
+    await websocket.send_json({"type": "session", "session_id": session.session_id, "pin": pin,
+                               "started_at": session.info()["started_at"]})
+
+    # La recepción nunca espera a Whisper: el audio se encola y un consumidor lo decodifica,
+    # uniendo lo acumulado mientras la pasada anterior estaba en curso
+    audio_queue: asyncio.Queue = asyncio.Queue()
+    cerrar = object()
+
+    async def enviar(data: Dict[str, Any]):
+        try:
+            await websocket.send_json(data)
+        except Exception:
+            pass  # El cliente ya se desconectó; la sesión se termina de todas formas
+
+    async def consumir():
+        terminado = False
+        ultimo_parcial = ""
+        while not terminado:
+            trozos = [await audio_queue.get()]
+            while not audio_queue.empty():
+                trozos.append(audio_queue.get_nowait())
+            if trozos[-1] is cerrar:
+                trozos.pop()
+                terminado = True
+            if not trozos:
+                continue
+            try:
+                result = await session.push(np.concatenate(trozos))
+            except QueueFullError as e:
+                await enviar({"type": "busy", "error": str(e)})
+                continue
+            except Exception as e:
+                logger.warning(f"⚠️ Error transcribiendo la sesión {session.session_id}: {e}")
+                await enviar({"type": "error", "error": str(e)})
+                continue
+            # Sólo cuando hubo una decodificación nueva
+            if result["final"] or result["partial"] != ultimo_parcial:
+                ultimo_parcial = result["partial"]
+                alertas = await asyncio.to_thread(publicar_segmentos, session, result["final"], transcripts_dir)
+                await enviar({"type": "transcript", **result, "alertas": alertas})
+        for _ in range(CLOSE_RETRIES):
+            try:
+                result = await session.close()
+                break
+            except QueueFullError:
+                await asyncio.sleep(1)
+        else:
+            result = await session.close()
+        alertas = await asyncio.to_thread(publicar_segmentos, session, result["final"], transcripts_dir)
+        return _cierre(session, result, alertas)
+
+    consumidor = asyncio.create_task(consumir())
+    conectado = True
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                conectado = False
+                break
+            if message.get("bytes"):
+                audio_queue.put_nowait(pcm16_to_float32(message["bytes"]))
+            elif message.get("text") and _es_cierre(message["text"]):
+                break
+    except WebSocketDisconnect:
+        conectado = False
+    except Exception as e:
+        logger.warning(f"⚠️ Error recibiendo audio de la sesión {session.session_id}: {e}")
+        conectado = False
+
+    audio_queue.put_nowait(cerrar)
+    try:
+        cierre = await consumidor
+    except Exception as e:
+        logger.warning(f"⚠️ Error cerrando la sesión {session.session_id}: {e}")
+        cierre = None
+    finally:
+        get_streaming_sessions().remove(session.session_id)
+    print(f"✅ Sesión WebSocket {session.session_id} cerrada para PIN {pin}: {len(session.segments)} segmentos, "
+          f"{session.decodes} decodificaciones")
+    if conectado:
+        if cierre is not None:
+            await websocket.send_json(cierre)
+        await websocket.close()
@@ -1,147 +1,232 @@
+"""
+Sincroniza los archivos de /transcripts con las tablas calls / call_details (incremental)
+Primero reconcilia el catálogo de transcripciones (transcript_catalog) con el directorio, escribiendo
+sólo las diferencias, así que también ve los archivos escritos sin ningún servidor en marcha. Luego
+procesa sólo las llamadas del catálogo que cambiaron desde la última ejecución (marca de agua por
+número de cambio del catálogo, changed_seq, guardada en la tabla sync_state; a diferencia del mtime
+también detecta archivos restaurados con fechas antiguas) y las inserta por lotes, cada lote en una
+sola transacción: volver a ejecutarlo no duplica llamadas ni detalles. Con --full se revisan todos
+los archivos. La base se abre en modo WAL para que los servidores
+puedan leerla mientras se sincroniza, y se envía una sola notificación al WebSocket por ejecución.
+
+    python -m backend.sync_transcripts_to_calls [--full] [--batch-size N]
+"""
 import os
-import sys
-import sqlite3
 import re
-import requests  # Para notificar al WebSocket
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 import json
+import argparse
 from datetime import datetime
-import time
-from sqlalchemy.exc import OperationalError
+
+import requests  # Para notificar al WebSocket
+from sqlalchemy import create_engine, text
 
 # Permitir importar backend.db_call_details desde el root del proyecto
-from backend.db_call_details import Base, CallDetails
+from backend.db_call_details import Base, Call, CallDetails
+from backend.core.database.call_stats import STATS_TABLE
+from backend.core.database.sqlite_setup import install_sqlite_pragmas
+from backend.core.reports.transcript_catalog import get_transcript_catalog
 
 # Configuración
 TRANSCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../transcripts'))
 DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../transcripts.db'))
+NOTIFY_URL = "http://localhost:8001/notify_new_call"
+BATCH_SIZE = 1000
 
 # Regex mejorado para extraer PIN, fecha y opcionalmente hora del nombre de archivo
 FILENAME_REGEX = re.compile(r'^(?P<pin>\d+)_(?P<date>\d{4}-\d{2}-\d{2})(?:_T(?P<hora>\d{2}-\d{2}-\d{2}))?.*')
 
+# Palabras clave de riesgo (puedes cargar desde JSON)
+PALABRAS_RIESGO = ["fraude", "transferencia", "depósito", "hazle como si fuera oficial", "cuenta", "dinero"]
+# Simulado, puedes extraerlo si tienes el dato
+DURACION_SIMULADA = "00:02:30"
+
+SYNC_STATE_SQL = "CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+
+# Lote en una tabla temporal: las llamadas nuevas y sus ids se resuelven con una consulta por lote
+BATCH_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS sync_batch (
+        pin TEXT NOT NULL, phone TEXT NOT NULL, date TEXT NOT NULL, hora TEXT,
+        transcript TEXT, participants TEXT, topic TEXT, risk_level INTEGER, risk_factors TEXT,
+        call_id INTEGER, call_new INTEGER, details_state TEXT
+    )
+"""
+SAME_CALL = ("c.pin_emitter = sync_batch.pin AND c.phone_number = sync_batch.phone "
+             "AND c.date = sync_batch.date AND c.hora IS sync_batch.hora")
+# calls no tiene clave única (puede haber duplicados históricos): las llamadas nuevas se
+# insertan con NOT EXISTS; call_details sí es única por call_id y usa ON CONFLICT
+BATCH_SQL = [
+    f"UPDATE sync_batch SET call_new = NOT EXISTS (SELECT 1 FROM calls c WHERE {SAME_CALL})",
+    "INSERT INTO calls (pin_emitter, phone_number, date, hora) "
+    "SELECT pin, phone, date, hora FROM sync_batch WHERE call_new",
+    f"UPDATE sync_batch SET call_id = (SELECT MIN(c.id) FROM calls c WHERE {SAME_CALL})",
+    # 'new': detalle insertado; 'changed': detalle existente cuya transcripción cambió (los
+    # archivos sin texto, PDF o audio, no borran la transcripción guardada)
+    "UPDATE sync_batch SET details_state = CASE "
+    "WHEN NOT EXISTS (SELECT 1 FROM call_details d WHERE d.call_id = sync_batch.call_id) THEN 'new' "
+    "WHEN transcript != '' AND EXISTS (SELECT 1 FROM call_details d WHERE d.call_id = sync_batch.call_id "
+    "AND COALESCE(d.transcript, '') != sync_batch.transcript) THEN 'changed' END",
+    """
+    INSERT INTO call_details (call_id, duration, participants, transcript, topic, risk_level, risk_factors, created_at)
+    SELECT call_id, :duration, participants, transcript, topic, risk_level, risk_factors, :created_at
+    FROM sync_batch WHERE details_state IS NOT NULL
+    ON CONFLICT (call_id) DO UPDATE SET
+        transcript = excluded.transcript, topic = excluded.topic,
+        risk_level = excluded.risk_level, risk_factors = excluded.risk_factors
+    """,
+]
+
+
+def get_engine(db_path=DB_PATH):
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    install_sqlite_pragmas(engine)
+    # Crear las tablas antes de cualquier consulta
+    Base.metadata.create_all(engine, tables=[Call.__table__, CallDetails.__table__, STATS_TABLE])
+    with engine.begin() as conn:
+        conn.exec_driver_sql(SYNC_STATE_SQL)
+    return engine
+
+
+def _state_key(directory):
+    return f"transcripts_catalog_seq:{directory}"
+
+
+def read_high_water_mark(conn, directory):
+    value = conn.execute(text("SELECT value FROM sync_state WHERE name = :name"),
+                         {"name": _state_key(directory)}).scalar()
+    return int(value) if value else 0
+
+
+def write_high_water_mark(conn, directory, seq):
+    conn.execute(text(
+        "INSERT INTO sync_state (name, value) VALUES (:name, :value) "
+        "ON CONFLICT (name) DO UPDATE SET value = excluded.value"
+    ), {"name": _state_key(directory), "value": str(seq)})
+
+
+def changed_files(directory, since_seq, catalog=None):
+    """
+    Archivos de transcripción de las llamadas del catálogo con número de cambio > `since_seq`, en
+    el orden en que cambiaron, como pares (changed_seq, nombre)
+    """
+    catalog = catalog or get_transcript_catalog()
+    return [(row["changed_seq"], os.path.basename(path)) for row in catalog.changed_since(directory, since_seq)
+            for path in (row["pdf_path"], row["wav_path"], row["txt_path"])
+            if path and FILENAME_REGEX.match(os.path.basename(path))]
+
+
+def call_key(nombre):
+    match = FILENAME_REGEX.match(nombre)
+    pin = match.group('pin')
+    date = match.group('date')
+    hora = match.group('hora') if match.group('hora') else None
+    # Extraer número de teléfono del nombre o archivo (simulado aquí)
+    phone_match = re.search(r'(\d{10,})', nombre)
+    phone_number = phone_match.group(1) if phone_match else "0000000000"
+    return pin, phone_number, date, hora
+
+
+def read_transcript(directory, nombre):
+    """Texto de la transcripción (sólo los .txt; PDF y audio no aportan texto aquí)"""
+    if not nombre.lower().endswith('.txt'):
+        return ""
+    with open(os.path.join(directory, nombre), 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def analyze(pin, phone_number, transcript_text):
+    """Participantes, tema y riesgo de una llamada"""
+    participants = [
+        {"role": "emisor", "nombre": f"PIN {pin}", "numero": pin},
+        {"role": "receptor", "nombre": "Desconocido", "numero": phone_number}
+    ]
+    texto = transcript_text.lower()
+    risk_factors = [palabra for palabra in PALABRAS_RIESGO if palabra in texto]
+    if risk_factors:
+        risk_level = 80  # Simulado: alto si hay match
+        topic = "fraude financiero"
+    else:
+        risk_level = 10  # Bajo
+        topic = "conversación general"
+    return participants, topic, risk_level, risk_factors
+
+
+def batch_rows(directory, nombres):
+    """Una fila por llamada del lote; si hay varios archivos de la misma llamada, gana el .txt"""
+    rows = {}
+    for nombre in nombres:
+        pin, phone, date, hora = call_key(nombre)
+        transcript = read_transcript(directory, nombre)
+        key = (pin, phone, date, hora)
+        if key in rows and not transcript:
+            continue
+        participants, topic, risk_level, risk_factors = analyze(pin, phone, transcript)
+        rows[key] = {
+            "pin": pin, "phone": phone, "date": date, "hora": hora, "transcript": transcript,
+            "participants": json.dumps(participants, ensure_ascii=False), "topic": topic,
+            "risk_level": risk_level, "risk_factors": json.dumps(risk_factors, ensure_ascii=False),
+        }
+    return list(rows.values())
+
+
+def sync_batch(conn, rows):
+    """Insertar un lote en la transacción de `conn`; devuelve cuántas llamadas eran nuevas"""
+    conn.exec_driver_sql(BATCH_TABLE_SQL)
+    conn.exec_driver_sql("DELETE FROM sync_batch")
+    conn.execute(text(
+        "INSERT INTO sync_batch (pin, phone, date, hora, transcript, participants, topic, risk_level, risk_factors) "
+        "VALUES (:pin, :phone, :date, :hora, :transcript, :participants, :topic, :risk_level, :risk_factors)"
+    ), rows)
+    params = {"duration": DURACION_SIMULADA, "created_at": datetime.utcnow()}
+    for sql in BATCH_SQL:
+        conn.execute(text(sql), params)
+
+    # El resumen diario (call_stats_daily) lo actualizan los triggers de calls / call_details,
+    # también el riesgo máximo cuando una transcripción modificada cambia el riesgo
+    return conn.execute(text("SELECT COUNT(*) FROM sync_batch WHERE call_new")).scalar()
+
+
+def notify_new_calls(count):
+    """Una sola notificación al WebSocket por ejecución, no una por llamada"""
+    if not count:
+        return
+    try:
+        requests.post(NOTIFY_URL, timeout=1)
+    except Exception as e:
+        print(f"[WARN] No se pudo notificar al WebSocket: {e}")
+
+
+def sync(full=False, batch_size=BATCH_SIZE, db_path=DB_PATH, directory=TRANSCRIPTS_DIR, catalog=None):
+    engine = get_engine(db_path)
+    catalog = catalog or get_transcript_catalog()
+    with engine.connect() as conn:
+        since = 0 if full else read_high_water_mark(conn, directory)
+    # El catálogo sólo está al día mientras corre un servidor: reconciliarlo (sólo diferencias)
+    if os.path.isdir(directory):
+        catalog.sync_directory(directory)
+    archivos = changed_files(directory, since, catalog)
+    nuevas = 0
+    for start in range(0, len(archivos), batch_size):
+        lote = archivos[start:start + batch_size]
+        siguiente = archivos[start + batch_size] if start + batch_size < len(archivos) else None
+        # La marca avanza con el lote: si el proceso se interrumpe, se retoma desde aquí. Si el
+        # lote corta los archivos de una llamada, la marca se queda antes de esa llamada
+        mark = lote[-1][0] if siguiente is None or siguiente[0] != lote[-1][0] else lote[-1][0] - 1
+        with engine.begin() as conn:
+            nuevas += sync_batch(conn, batch_rows(directory, (nombre for _, nombre in lote)))
+            write_high_water_mark(conn, directory, max(since, mark))
+    engine.dispose()
+    notify_new_calls(nuevas)
+    print(f"Sincronizados {len(archivos)} archivos nuevos o modificados; {nuevas} llamadas nuevas en tabla calls.")
+    return nuevas
+
+
 def main():
-    # Crear la tabla antes de cualquier consulta
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS calls (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pin_emitter TEXT NOT NULL,
-            phone_number TEXT NOT NULL,
-            date TEXT NOT NULL,
-            hora TEXT
-        )
-    ''')
-    conn.commit()
-
-    archivos = os.listdir(TRANSCRIPTS_DIR)
-    llamadas_unicas = set()
-    # Preparar SQLAlchemy para call_details (usar ruta absoluta)
-    engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
-    Session = sessionmaker(bind=engine)
-
-    for nombre in archivos:
-        match = FILENAME_REGEX.match(nombre)
-        if match:
-            pin = match.group('pin')
-            date = match.group('date')
-            hora = match.group('hora') if match.group('hora') else None
-            # Extraer número de teléfono del nombre o archivo (simulado aquí)
-            phone_number = ""
-            phone_match = re.search(r'(\d{10,})', nombre)
-            if phone_match:
-                phone_number = phone_match.group(1)
-            else:
-                phone_number = "0000000000"
-
-            # Verificar si ya existe la llamada
-            cursor.execute('''
-                SELECT id FROM calls WHERE pin_emitter = ? AND phone_number = ? AND date = ? AND (hora IS ? OR hora = ?)
-            ''', (pin, phone_number, date, hora if hora else None, hora))
-            call_row = cursor.fetchone()
-            if not call_row:
-                cursor.execute('''
-                    INSERT INTO calls (pin_emitter, phone_number, date, hora) VALUES (?, ?, ?, ?)
-                ''', (pin, phone_number, date, hora))
-                call_id = cursor.lastrowid
-                # Notificar al WebSocket que hay una nueva llamada
-                try:
-                    requests.post("http://localhost:8001/notify_new_call", timeout=1)
-                except Exception as e:
-                    print(f"[WARN] No se pudo notificar al WebSocket: {e}")
-            else:
-                call_id = call_row[0]
-
-            # --- Enriquecer y poblar call_details ---
-            # Leer transcripción si existe
-            transcript_path = os.path.join(TRANSCRIPTS_DIR, nombre)
-            transcript_text = ""
-            if os.path.isfile(transcript_path):
-                with open(transcript_path, 'r', encoding='utf-8') as f:
-                    transcript_text = f.read()
-
-            # Simular duración y participantes
-            duration = "00:02:30"  # Simulado, puedes extraerlo si tienes el dato
-            participants = [
-                {"role": "emisor", "nombre": f"PIN {pin}", "numero": pin},
-                {"role": "receptor", "nombre": "Desconocido", "numero": phone_number}
-            ]
-
-            # Detectar tema y riesgo
-            topic = None
-            risk_level = 0
-            risk_factors = []
-            # Palabras clave de riesgo (puedes cargar desde JSON)
-            palabras_riesgo = ["fraude", "transferencia", "depósito", "hazle como si fuera oficial", "cuenta", "dinero"]
-            for palabra in palabras_riesgo:
-                if palabra in transcript_text.lower():
-                    risk_factors.append(palabra)
-            if risk_factors:
-                risk_level = 80  # Simulado: alto si hay match
-                topic = "fraude financiero"
-            else:
-                risk_level = 10  # Bajo
-                topic = "conversación general"
-
-            # Insertar en call_details solo si no existe
-            session = Session()
-            try:
-                exists = session.query(CallDetails).filter_by(call_id=call_id).first()
-                if not exists:
-                    call_details = CallDetails(
-                        call_id=call_id,
-                        duration=duration,
-                        participants=participants,
-                        transcript=transcript_text,
-                        topic=topic,
-                        risk_level=risk_level,
-                        risk_factors=risk_factors,
-                        created_at=datetime.utcnow()
-                    )
-                    # Intentar commit con reintentos si la base está bloqueada
-                    for intento in range(5):
-                        try:
-                            session.add(call_details)
-                            session.commit()
-                            print(f"[INFO] Insertado detalle para call_id={call_id}")
-                            break
-                        except OperationalError as e:
-                            if 'database is locked' in str(e):
-                                print(f"[WARN] DB locked, reintentando ({intento+1}/5)...")
-                                time.sleep(0.2)
-                                session.rollback()
-                            else:
-                                raise
-                    # Pequeño retardo para evitar lock
-                    time.sleep(0.1)
-            except Exception as e:
-                print(f"[ERROR] Falló la inserción de detalles para call_id={call_id}: {e}")
-            finally:
-                session.close()
-    conn.commit()
-    print(f"Sincronizados {len(llamadas_unicas)} llamadas únicas desde archivos de /transcripts a tabla calls.")
-    conn.close()
+    parser = argparse.ArgumentParser(description="Sincronizar /transcripts con las tablas calls / call_details")
+    parser.add_argument("--full", action="store_true", help="Revisar todos los archivos, no sólo los cambiados desde la última ejecución")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Archivos por transacción")
+    args = parser.parse_args()
+    sync(full=args.full, batch_size=max(1, args.batch_size))
+
 
 if __name__ == "__main__":
     main()
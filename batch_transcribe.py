@@ -1,32 +1,79 @@
+"""
+Transcripción por lotes de audios archivados (respaldo nocturno de llamadas).
+Usa el motor de lotes del backend: pool de procesos según los núcleos disponibles, manifiesto por
+hash SHA-256 para saltar lo ya transcrito y reanudar corridas interrumpidas, y reintentos.
+
+    python batch_transcribe.py <carpeta_o_archivo> [...] [--model base] [--backend torch-int8] [--language es]
+                               [--workers N] [--output-dir DIR] [--manifest RUTA] [--retries N]
+"""
+import argparse
+import json
+import logging
 import os
-import requests
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.config import WHISPER_MODEL_NAME, WHISPER_BACKEND, BATCH_RETRIES, BATCH_MANIFEST_PATH
+from backend.core.audio.batch_engine import BatchTranscriber, discover_audio
+from backend.core.audio.whisper_backends import BACKENDS
+
+
+def guardar_transcripcion(entry, output_dir=None):
+    """Escribe <nombre>.txt junto al audio (o en output_dir)"""
+    destino = output_dir or os.path.dirname(entry["path"])
+    os.makedirs(destino, exist_ok=True)
+    nombre = os.path.splitext(os.path.basename(entry["path"]))[0] + ".txt"
+    with open(os.path.join(destino, nombre), "w", encoding="utf-8") as f:
+        f.write(entry["text"] + "\n")
 
-def batch_transcribe(audio_dir, pin, endpoint="http://localhost:8000/stream/fragment"):
+
+def batch_transcribe(paths, model_name=WHISPER_MODEL_NAME, language=None, workers=None,
+                     output_dir=None, manifest_path=BATCH_MANIFEST_PATH, retries=BATCH_RETRIES,
+                     recursive=True, backend=WHISPER_BACKEND):
     """
-    Sube todos los archivos de audio .wav en audio_dir al endpoint de transcripción,
-    usando el PIN indicado. Genera las transcripciones y reportes con la misma nomenclatura que el audio.
+    Transcribe todos los audios de las rutas indicadas y guarda un .txt por archivo.
+    Devuelve el reporte del motor ({"results", "progress"}).
     """
-    archivos = [f for f in os.listdir(audio_dir) if f.lower().endswith('.wav')]
+    archivos = discover_audio(paths, recursive=recursive)
     if not archivos:
-        print(f"No se encontraron archivos .wav en {audio_dir}")
-        return
-    print(f"Se encontraron {len(archivos)} archivos .wav para transcribir con PIN {pin}.")
-    for archivo in archivos:
-        path_audio = os.path.join(audio_dir, archivo)
-        print(f"Subiendo {archivo} ...")
-        try:
-            with open(path_audio, 'rb') as f:
-                files = {'file': (archivo, f, 'audio/wav')}
-                data = {'pin': pin}
-                response = requests.post(endpoint, files=files, data=data)
-            if response.status_code == 200:
-                print(f"✅ Transcripción exitosa para {archivo}: {response.json()}")
-            else:
-                print(f"❌ Error en {archivo}: {response.status_code} {response.text}")
-        except Exception as e:
-            print(f"❌ Excepción en {archivo}: {e}")
+        print(f"No se encontraron archivos de audio en {', '.join(paths)}")
+        return {"results": [], "progress": {}}
+    print(f"Se encontraron {len(archivos)} archivos de audio.")
+    options = {"language": language} if language else {}
+    engine = BatchTranscriber(model_name=model_name, workers=workers, retries=retries,
+                              manifest_path=manifest_path, backend=backend, **options)
+    return engine.run(archivos, on_result=lambda entry: guardar_transcripcion(entry, output_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcripción por lotes, paralela y reanudable")
+    parser.add_argument("paths", nargs="+", help="Carpetas o archivos de audio")
+    parser.add_argument("--model", default=WHISPER_MODEL_NAME, help="Modelo Whisper (tiny, base, small, medium...)")
+    parser.add_argument("--backend", default=WHISPER_BACKEND, choices=BACKENDS,
+                        help="Backend de inferencia (torch-int8 / faster-whisper: int8 en CPU)")
+    parser.add_argument("--language", default=None, help="Idioma fijo (por ejemplo es); sin él se detecta")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto según núcleos)")
+    parser.add_argument("--output-dir", default=None, help="Carpeta para los .txt (por defecto junto al audio)")
+    parser.add_argument("--manifest", default=BATCH_MANIFEST_PATH, help="Manifiesto JSONL de archivos procesados")
+    parser.add_argument("--retries", type=int, default=BATCH_RETRIES, help="Reintentos por archivo")
+    parser.add_argument("--no-recursive", action="store_true", help="No entrar en subcarpetas")
+    parser.add_argument("--report", default=None, help="Guardar métricas de la corrida en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    report = batch_transcribe(args.paths, model_name=args.model, language=args.language, workers=args.workers,
+                              output_dir=args.output_dir, manifest_path=args.manifest, retries=args.retries,
+                              recursive=not args.no_recursive, backend=args.backend)
+    progress = report["progress"]
+    if progress:
+        print(f"✅ Transcritos {progress['done']}, saltados {progress['skipped']}, fallidos {progress['failed']} "
+              f"| {progress['files_per_min']} archivos/min | {progress['audio_hours_per_hour']} h audio/h")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(progress, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if progress.get("failed") else 0)
+
 
 if __name__ == "__main__":
-    AUDIO_DIR = "/Users/jorgeivancantumartinez/CascadeProjects/spectrum/transcripts"
-    PIN = "666"
-    batch_transcribe(AUDIO_DIR, PIN)
+    main()
@@ -1,12 +1,15 @@
 import sounddevice as sd
 import numpy as np
 import scipy.io.wavfile
-import requests
+import json
+import queue
+import threading
 import time
 import os
+from websockets.sync.client import connect
 
 SAMPLERATE = 16000  # Hz
-DURATION = 5        # segundos
+BLOQUE = 0.5        # segundos por mensaje enviado al servidor
 from datetime import datetime
 
 PIN = input("Introduce el PIN del PPL (interno): ")
@@ -14,50 +17,81 @@ PHONE_NUMBER = input("Introduce el número de teléfono al que se enlazará la l
 # Captura la fecha y hora exacta de inicio
 inicio_llamada = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-MAX_SILENT_FRAGMENTS = 6  # 6 fragmentos = 30 segundos de silencio
-silent_count = 0
-fragmentos = []  # Lista para acumular los fragmentos de audio
-silencios = []   # Lista de índices de fragmentos silenciosos consecutivos al final
+MAX_SILENCIO = 30   # segundos sin texto reconocido para terminar la grabación
+COLA_SILENCIO = 5   # segundos de silencio que se conservan al final del audio guardado
+fragmentos = []  # Bloques de audio grabados, para guardar la llamada completa
 fragmentos_respuestas = []  # Guarda las respuestas del backend para la transcripción y alertas
+cierre = {}
 
-while True:
-    print("🎙️ Grabando 5 segundos...")
-    audio = sd.rec(int(SAMPLERATE * DURATION), samplerate=SAMPLERATE, channels=1, dtype='int16')
-    sd.wait()
-    fragmentos.append(audio.copy())  # Guarda el fragmento en la lista
-    scipy.io.wavfile.write("fragmento_temp.wav", SAMPLERATE, audio)
-
-    try:
-        with open("fragmento_temp.wav", "rb") as f:
-            files = {"file": ("fragmento.wav", f, "audio/wav")}
-            data = {"pin": PIN}
-            response = requests.post("http://localhost:8000/stream/fragment", files=files, data=data, timeout=10)
-        respuesta = response.json()
-        fragmentos_respuestas.append(respuesta)  # Guarda la respuesta para la transcripción/alertas
-        print("📤 Enviado fragmento, respuesta:", respuesta)
-        # Si el texto está vacío o casi vacío, cuenta como silencio
-        if not respuesta.get("text", "").strip():
-            silent_count += 1
-            silencios.append(len(fragmentos)-1)  # Guarda el índice de este fragmento silencioso
-            print(f"🔇 Fragmento silencioso ({silent_count}/{MAX_SILENT_FRAGMENTS})")
-        else:
-            silent_count = 0
-            silencios = []  # Reinicia la lista si hay un fragmento con voz
-        if silent_count >= MAX_SILENT_FRAGMENTS:
-            print("🛑 Demasiados fragmentos silenciosos. Terminando grabación.")
+# Audio continuo por WebSocket: el micrófono nunca se detiene y el servidor devuelve
+# transcripciones parciales y alertas por el mismo socket
+WS_URL = f"ws://localhost:8000/ws/stream/{PIN}"
+bloques = queue.Queue()
+ultima_voz = time.monotonic()
+fin_voz = 0.0  # segundo de la llamada donde terminó el último texto confirmado
+sesion_cerrada = threading.Event()
+
+
+def capturar(indata, frames, tiempo, status):
+    if status:
+        print(f"⚠️ {status}")
+    bloques.put(indata.copy())
+
+
+def escuchar(ws):
+    """Mensajes del servidor: transcripción parcial/confirmada, alertas y cierre de sesión"""
+    global ultima_voz, fin_voz, cierre
+    for mensaje in ws:
+        respuesta = json.loads(mensaje)
+        tipo = respuesta.get("type")
+        if tipo == "session":
+            print(f"🔗 Sesión de transcripción abierta: {respuesta['session_id']}")
+        elif tipo == "transcript":
+            fragmentos_respuestas.append(respuesta)
+            confirmado = " ".join(seg["text"] for seg in respuesta.get("final", []))
+            if confirmado.strip() or respuesta.get("partial", "").strip():
+                ultima_voz = time.monotonic()
+            if respuesta.get("final"):
+                fin_voz = respuesta["final"][-1]["end"]
+            print("📝", confirmado, "| provisional:", respuesta.get("partial", ""))
+            if respuesta.get("alertas"):
+                print(f"🚨 ALERTA: {respuesta['alertas']}")
+        elif tipo == "busy":
+            print("⏳ Servidor saturado; el audio se transcribirá en la siguiente pasada")
+        elif tipo == "closed":
+            cierre = respuesta
+            print(f"🔒 Sesión cerrada: {len(cierre.get('segments', []))} segmentos")
             break
-    except Exception as e:
-        print(f"❌ Error al enviar fragmento: {e}")
-        break  # termina si no hay backend o hay error de red
+    sesion_cerrada.set()
 
-    time.sleep(1)
 
-# Al terminar, elimina 5 de los 6 últimos fragmentos silenciosos (si existen)
-if len(silencios) >= MAX_SILENT_FRAGMENTS:
-    # Conserva solo el último fragmento silencioso
-    for idx in silencios[:-1]:
-        fragmentos[idx] = None  # Marca para eliminar
-    fragmentos = [frag for frag in fragmentos if frag is not None]
+try:
+    with connect(WS_URL, max_size=None) as ws:
+        receptor = threading.Thread(target=escuchar, args=(ws,), daemon=True)
+        receptor.start()
+        print("🎙️ Grabando y transmitiendo en continuo...")
+        with sd.InputStream(samplerate=SAMPLERATE, channels=1, dtype='int16',
+                            blocksize=int(SAMPLERATE * BLOQUE), callback=capturar):
+            while True:
+                bloque = bloques.get()
+                fragmentos.append(bloque)
+                ws.send(bloque.tobytes())
+                if time.monotonic() - ultima_voz >= MAX_SILENCIO:
+                    print(f"🛑 {MAX_SILENCIO} segundos sin voz. Terminando grabación.")
+                    break
+        ws.send(json.dumps({"type": "close"}))
+        # El servidor decodifica el audio restante antes de responder con la transcripción completa
+        sesion_cerrada.wait(timeout=60)
+except KeyboardInterrupt:
+    print("🛑 Grabación detenida por el usuario.")
+except Exception as e:
+    print(f"❌ Error en la transmisión: {e}")
+
+# Al terminar, descarta el silencio final salvo los primeros COLA_SILENCIO segundos
+if fragmentos:
+    limite = int((fin_voz + COLA_SILENCIO) * SAMPLERATE) if fin_voz else None
+    audio_grabado = np.concatenate(fragmentos, axis=0)
+    fragmentos = [audio_grabado[:limite] if limite and limite < len(audio_grabado) else audio_grabado]
 
 # Une todos los fragmentos restantes en un solo array
 if fragmentos:
@@ -78,11 +112,13 @@ if fragmentos:
     os.replace(nombre_archivo, audio_destino)  # Mueve el archivo al directorio de audios
     ruta_audio_rel = os.path.relpath(audio_destino, start=os.path.dirname(__file__))
 
-    # Concatenar la transcripción y las alertas
-    transcripcion = " ".join([frag.get("text", "") for frag in getattr(globals(), 'fragmentos_respuestas', []) if frag.get("text", "")])
-    alertas = []
-    for frag in getattr(globals(), 'fragmentos_respuestas', []):
-        alertas.extend(frag.get("alertas", []))
+    # Transcripción completa de la sesión y alertas de todos los fragmentos
+    transcripcion = cierre.get("text") or " ".join(
+        seg["text"] for frag in fragmentos_respuestas for seg in frag.get("final", [])
+    )
+    alertas = list(cierre.get("alertas_llamada", []))
+    for frag in fragmentos_respuestas + [cierre]:
+        alertas.extend(a for a in frag.get("alertas", []) if a not in alertas)
     alertas_str = ", ".join(alertas)
 
     # Calcular duración total
@@ -90,7 +126,12 @@ if fragmentos:
 
     # Insertar en la base de datos
     db_path = os.path.join(os.path.dirname(__file__), '../transcripts.db')
-    conn = sqlite3.connect(db_path)
+    # Mismos PRAGMA que backend/core/database/sqlite_setup.py: WAL y espera ante bloqueos del
+    # backend en lugar de fallar con "database is locked"
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
     cur = conn.cursor()
     cur.execute("""
         INSERT INTO calls (pin_emitter, phone_number, date, duration, audio_path, transcription, alerts)
@@ -111,8 +152,4 @@ if fragmentos:
 else:
     print("⚠️ No se grabó audio útil para guardar.")
 
-# Limpieza: elimina el archivo temporal
-if os.path.exists("fragmento_temp.wav"):
-    os.remove("fragmento_temp.wav")
-
 print("✅ Grabación finalizada automáticamente.")
@@ -1,9 +1,10 @@
 import sys
 import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'backend')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-from db_call_details import Base, Call, CallDetails
-from api_calls_enriched import engine
+# Importar por el paquete backend: con backend/ en sys.path los modelos se registraban dos veces
+from backend.db_call_details import Base, Call, CallDetails
+from backend.api_calls_enriched import engine
 from datetime import datetime, timedelta
 import random
 from sqlalchemy.orm import sessionmaker